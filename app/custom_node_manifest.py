@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import os
+import json
+import logging
+import threading
+
+import folder_paths
+import comfyui_version
+
+MANIFEST_VERSION = 2
+IGNORED_DIR_NAMES = {"__pycache__", ".git", "node_modules"}
+# replaces the options of a recorded combo input that lists a model folder
+FOLDER_OPTIONS = "__folder__"
+
+
+def get_manifest_path() -> str:
+    return os.path.join(folder_paths.get_user_directory(), "custom_node_manifest.json")
+
+
+def module_fingerprint(module_path: str) -> list:
+    """
+    Returns a cheap fingerprint of a custom node module: the newest mtime and the number of
+    python files in it. Any edit, update or added file changes it.
+    """
+    if os.path.isfile(module_path):
+        st = os.stat(module_path)
+        return [st.st_mtime, st.st_size]
+
+    latest = 0.0
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(module_path):
+        dirnames[:] = [d for d in dirnames if d not in IGNORED_DIR_NAMES]
+        for file_name in filenames:
+            if file_name.endswith(".py"):
+                try:
+                    latest = max(latest, os.path.getmtime(os.path.join(dirpath, file_name)))
+                except OSError:
+                    continue
+                count += 1
+    return [latest, count]
+
+
+def folder_listings() -> dict[str, list[str]]:
+    """The file lists of the model folders, the folders without an extension filter would list too much."""
+    return {name: folder_paths.get_filename_list(name) for name, (_, extensions) in folder_paths.folder_names_and_paths.items() if len(extensions) > 0}
+
+
+def combo_inputs(info: dict):
+    """Yields the spec of every combo input of an object_info and the container and key of its options."""
+    for section in info.get("input", {}).values():
+        if not isinstance(section, dict):
+            continue
+        for spec in section.values():
+            if not isinstance(spec, list) or len(spec) == 0:
+                continue
+            if isinstance(spec[0], (list, dict)):
+                yield spec, spec, 0
+            elif spec[0] == "COMBO" and len(spec) > 1 and isinstance(spec[1], dict) and "options" in spec[1]:
+                yield spec, spec[1], "options"
+
+
+def record_folder_combos(info: dict, listings: dict[str, list[str]]) -> dict | None:
+    """
+    The object_info of a node as it is recorded: combo inputs that list a model folder only keep the
+    folder name so they get listed again when served. None when a combo looks computed in some other
+    way (an upload or an ambiguous folder listing), the node has to be imported to describe it then.
+    """
+    info = json.loads(json.dumps(info))
+    for spec, options, key in combo_inputs(info):
+        if len(spec) > 1 and isinstance(spec[1], dict) and any("upload" in k for k in spec[1]):
+            return None
+        folders = [name for name, files in listings.items() if files == options[key]]
+        if len(folders) == 1 and len(options[key]) > 0:
+            options[key] = {FOLDER_OPTIONS: folders[0]}
+        elif len(folders) > 0:
+            return None
+    return info
+
+
+def fill_folder_combos(info: dict) -> dict:
+    """The recorded object_info of a node with the current files of the folders its combos list."""
+    info = json.loads(json.dumps(info))
+    for spec, options, key in combo_inputs(info):
+        if isinstance(options[key], dict) and FOLDER_OPTIONS in options[key]:
+            options[key] = folder_paths.get_filename_list(options[key][FOLDER_OPTIONS])
+    return info
+
+
+class CustomNodeManifest:
+    """
+    Persistent record of what each custom node module registered the last time it was imported:
+    node names, display names, directories and the object_info of the nodes. Used by
+    --lazy-custom-nodes to register and describe the nodes of a module without importing it.
+
+    Modules that register server routes or prompt handlers are marked eager because those
+    can't be added once the server is running.
+    """
+    def __init__(self, path: str | None = None):
+        self.path = path if path is not None else get_manifest_path()
+        self.lock = threading.Lock()
+        self.modules: dict[str, dict] = {}
+        self.dirty = False
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable custom node manifest {self.path}: {e}")
+            return
+
+        if data.get("version") != MANIFEST_VERSION or data.get("comfyui_version") != comfyui_version.__version__:
+            logging.info("Custom node manifest was written by another ComfyUI version, rebuilding it.")
+            self.dirty = True
+            return
+        self.modules = data.get("modules", {})
+
+    def save(self) -> None:
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {"version": MANIFEST_VERSION, "comfyui_version": comfyui_version.__version__, "modules": self.modules}
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Failed to write custom node manifest {self.path}: {e}")
+
+    def get(self, module_path: str) -> dict | None:
+        """Returns the entry for module_path if the module did not change since it was recorded."""
+        entry = self.modules.get(module_path)
+        if entry is None:
+            return None
+        if entry.get("fingerprint") != module_fingerprint(module_path):
+            return None
+        return entry
+
+    def set(self, module_path: str, module_name: str, module_dir: str, node_names: list[str], display_names: dict[str, str], web_directory: str | None, eager: bool) -> None:
+        with self.lock:
+            self.modules[module_path] = {
+                "fingerprint": module_fingerprint(module_path),
+                "module_name": module_name,
+                "module_dir": module_dir,
+                "node_names": node_names,
+                "display_names": display_names,
+                "web_directory": web_directory,
+                "eager": eager,
+            }
+            self.dirty = True
+
+    def node_info(self, module_path: str, node_name: str) -> dict | None:
+        """The recorded object_info of a node, the combos that list a model folder list it again."""
+        entry = self.modules.get(module_path)
+        if entry is None:
+            return None
+        info = entry.get("node_info", {}).get(node_name)
+        if info is None:
+            return None
+        return fill_folder_combos(info)
+
+    def set_node_info(self, infos: dict[str, dict], listings: dict[str, list[str]] | None = None) -> None:
+        """
+        Records the object_info of the nodes of every module whose nodes are all in infos. Modules with a
+        node that can't be recorded lose their recorded info.
+        """
+        if listings is None:
+            listings = folder_listings()
+        with self.lock:
+            for entry in self.modules.values():
+                if len(entry["node_names"]) == 0 or any(name not in infos for name in entry["node_names"]):
+                    continue
+                node_info = {name: record_folder_combos(infos[name], listings) for name in entry["node_names"]}
+                if any(info is None for info in node_info.values()):
+                    if entry.pop("node_info", None) is not None:
+                        self.dirty = True
+                elif entry.get("node_info") != node_info:
+                    entry["node_info"] = node_info
+                    self.dirty = True
+
+    def prune(self, module_paths: list[str]) -> None:
+        """Drops the entries of modules that are not in module_paths anymore."""
+        with self.lock:
+            for module_path in list(self.modules.keys()):
+                if module_path not in module_paths:
+                    self.modules.pop(module_path)
+                    self.dirty = True
+
+    def remove(self, module_path: str) -> None:
+        with self.lock:
+            if self.modules.pop(module_path, None) is not None:
+                self.dirty = True
@@ -0,0 +1,76 @@
+from __future__ import annotations
+import asyncio
+import collections
+import logging
+
+import aiohttp
+from aiohttp import web
+
+# messages queued for one client before it is considered too slow
+MAX_PENDING_MESSAGES = 256
+
+
+async def send_socket_catch_exception(function, message):
+    try:
+        await function(message)
+    except (aiohttp.ClientError, aiohttp.ClientPayloadError, ConnectionResetError, BrokenPipeError, ConnectionError) as err:
+        logging.warning("send error: {}".format(err))
+
+
+class WebSocketClient:
+    """
+    Outbound queue of one websocket client, drained by its own task so a slow client only delays itself.
+
+    Messages are put already serialized so a broadcast serializes them once for every client. A message
+    put with a coalesce key replaces the queued message with the same key since it supersedes it (progress,
+    status, previews). When the queue is full the oldest coalescable message is dropped, a client whose queue
+    is full of messages that can't be dropped is disconnected, it gets the current state when reconnecting.
+    """
+    def __init__(self, ws: web.WebSocketResponse, max_pending: int = MAX_PENDING_MESSAGES):
+        self.ws = ws
+        self.max_pending = max_pending
+        self.pending = collections.deque()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.send_loop())
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self.pending.clear()
+
+    def put(self, message: str | bytes, coalesce_key=None):
+        if coalesce_key is not None:
+            for entry in self.pending:
+                if entry[0] == coalesce_key:
+                    # moved to the end to keep its order with the messages queued since
+                    self.pending.remove(entry)
+                    break
+
+        if len(self.pending) >= self.max_pending:
+            droppable = next((entry for entry in self.pending if entry[0] is not None), None)
+            if droppable is None:
+                logging.warning("websocket client too slow, disconnecting it")
+                self.close()
+                asyncio.ensure_future(self.ws.close())
+                return
+            self.pending.remove(droppable)
+            self.dropped += 1
+
+        self.pending.append((coalesce_key, message))
+        self.ready.set()
+
+    async def send_loop(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            while len(self.pending) > 0:
+                _, message = self.pending.popleft()
+                if isinstance(message, str):
+                    await send_socket_catch_exception(self.ws.send_str, message)
+                else:
+                    await send_socket_catch_exception(self.ws.send_bytes, message)
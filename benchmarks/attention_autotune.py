@@ -0,0 +1,75 @@
+"""
+Benchmarks the attention backends on the attention shapes of common models, records the fastest one
+of each in the attention autotune table used by --attention-autotune and prints the table.
+
+Takes the same arguments as main.py, for example:
+
+    python benchmarks/attention_autotune.py --user-directory /path/to/user
+"""
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import comfy.options
+comfy.options.enable_args_parsing()
+
+import folder_paths
+from comfy.cli_args import args
+from app.logger import setup_logger
+# makes the attention module import every optional backend
+args.attention_autotune = True
+
+import torch
+import comfy.model_management
+import comfy.attention_autotune
+import comfy.ldm.modules.attention
+
+# name, batch, heads, query length, key length, head dim, masked
+SHAPES = [
+    ("SD1.5 512x512 self", 2, 8, 4096, 4096, 40, False),
+    ("SD1.5 512x512 cross", 2, 8, 4096, 77, 40, False),
+    ("SDXL 1024x1024 self", 2, 10, 4096, 4096, 64, False),
+    ("SDXL 1024x1024 cross", 2, 10, 4096, 77, 64, False),
+    ("Flux 1024x1024", 1, 24, 4608, 4608, 128, False),
+    ("T5 512 tokens", 1, 64, 512, 512, 64, True),
+    ("Wan 832x480x33", 1, 40, 17160, 17160, 128, False),
+]
+# the bigger shapes take too long on the CPU
+MAX_CPU_ELEMENTS = 4096 * 4096
+
+
+def main():
+    setup_logger(log_level=args.verbose, use_stdout=args.log_stdout)
+    if args.user_directory:
+        folder_paths.set_user_directory(os.path.abspath(args.user_directory))
+    tuner = comfy.attention_autotune.attention_tuner
+    tuner.set_path(os.path.join(folder_paths.get_user_directory(), "attention_autotune.json"))
+
+    device = comfy.model_management.get_torch_device()
+    dtype = torch.float16 if comfy.model_management.should_use_fp16(device) else torch.float32
+    backends = comfy.ldm.modules.attention.autotune_backends(device)
+    logging.info("Device: {}, dtype: {}, backends: {}".format(comfy.model_management.get_torch_device_name(device), dtype, ", ".join(backends)))
+
+    for name, batch, heads, q_len, k_len, dim_head, masked in SHAPES:
+        if device.type == "cpu" and q_len * k_len > MAX_CPU_ELEMENTS:
+            continue
+        q = torch.randn(batch, q_len, heads * dim_head, device=device, dtype=dtype)
+        k = torch.randn(batch, k_len, heads * dim_head, device=device, dtype=dtype)
+        v = torch.randn(batch, k_len, heads * dim_head, device=device, dtype=dtype)
+        mask = torch.zeros(batch, q_len, k_len, device=device, dtype=dtype) if masked else None
+        winner = tuner.tune(backends, q, k, v, heads, mask=mask)
+        logging.info("{}: {}".format(name, winner))
+        del q, k, v, mask
+        comfy.model_management.soft_empty_cache()
+
+    names = list(backends)
+    lines = ["{:<60} {:<10} {}".format("signature", "backend", " ".join("{:>10}".format(n) for n in names))]
+    for signature, backend, timings in tuner.table():
+        lines.append("{:<60} {:<10} {}".format(signature, backend, " ".join("{:>10}".format("{:.3f}ms".format(timings[n] * 1000) if n in timings else "-") for n in names)))
+    logging.info("Attention autotune table:\n{}".format("\n".join(lines)))
+
+
+if __name__ == "__main__":
+    main()
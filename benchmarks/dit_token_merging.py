@@ -0,0 +1,140 @@
+"""
+Times token merging (ToMe) and HyperTile on the attention of the Flux, SD3 and Wan DiT blocks and measures
+how far the output moves from the unpatched model.
+
+The models have the width of the released models but only a few blocks with random weights, so the
+error is the error of those blocks and not an image quality score. On the cpu the models and the
+resolutions are scaled down to keep the run short.
+
+Takes the same arguments as main.py, for example:
+
+    python benchmarks/dit_token_merging.py --cpu
+"""
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import comfy.options
+comfy.options.enable_args_parsing()
+
+from comfy.cli_args import args
+from app.logger import setup_logger
+
+import torch
+import comfy.ops
+import comfy.model_management
+import comfy.model_patcher
+from comfy.attention_autotune import synchronize
+from comfy.ldm.flux.model import Flux
+from comfy.ldm.modules.diffusionmodules.mmdit import OpenAISignatureMMDITWrapper
+from comfy.ldm.wan.model import WanModel
+from comfy_extras.nodes_hypertile import HyperTile
+from comfy_extras.nodes_tomesd import TomePatchModel
+
+REPEATS = 3
+# name, ToMe ratio or HyperTile tile size in pixels
+METHODS = [
+    ("ToMe 0.3", "tome", 0.3),
+    ("ToMe 0.5", "tome", 0.5),
+    ("HyperTile 512", "hypertile", 512),
+    ("HyperTile 256", "hypertile", 256),
+]
+
+
+def flux(scale, **kwargs):
+    return Flux(in_channels=16, out_channels=16, vec_in_dim=768, context_in_dim=4096, hidden_size=3072 // scale, mlp_ratio=4.0, num_heads=24 // scale,
+                depth=2, depth_single_blocks=4, axes_dim=[16, 56, 56], theta=10000, patch_size=2, qkv_bias=True, guidance_embed=False, **kwargs)
+
+
+def sd3(scale, **kwargs):
+    hidden_size = 1536 // scale
+    return OpenAISignatureMMDITWrapper(patch_size=2, in_channels=16, depth=24 // scale, num_blocks=4, num_patches=36864, pos_embed_max_size=192, adm_in_channels=2048,
+                                       context_embedder_config={"target": "torch.nn.Linear", "params": {"in_features": 4096, "out_features": hidden_size}}, **kwargs)
+
+
+def wan(scale, **kwargs):
+    return WanModel(dim=1536 // scale, ffn_dim=8960 // scale, text_dim=4096, num_heads=12 // scale, num_layers=4, **kwargs)
+
+
+# name, model, latent shape, inputs after the latent and the timestep: context and y
+ARCHITECTURES = [
+    ("Flux 1024x1024", flux, (1, 16, 128, 128), lambda b: (torch.randn(b, 256, 4096), torch.randn(b, 768))),
+    ("SD3 1024x1024", sd3, (1, 16, 128, 128), lambda b: (torch.randn(b, 333, 4096), torch.randn(b, 2048))),
+    ("Wan 832x480x33", wan, (1, 16, 9, 60, 104), lambda b: (torch.randn(b, 512, 4096),)),
+]
+
+
+def init_weights(model):
+    torch.manual_seed(0)
+    for name, p in model.named_parameters():
+        if p.ndim >= 2:
+            torch.nn.init.normal_(p, std=p[0].numel() ** -0.5)
+        elif name.endswith("bias"):
+            torch.nn.init.zeros_(p)
+        else:
+            torch.nn.init.ones_(p)
+    return model
+
+
+def timed(function, device):
+    # the first run allocates the memory
+    function()
+    synchronize(device)
+    best = float("inf")
+    for _ in range(REPEATS):
+        # both methods pick their tokens with the torch rng
+        torch.manual_seed(0)
+        start = time.perf_counter()
+        out = function()
+        synchronize(device)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    setup_logger(log_level=args.verbose, use_stdout=args.log_stdout)
+    device = comfy.model_management.get_torch_device()
+    dtype = comfy.model_management.unet_dtype(device=device, supported_dtypes=[torch.bfloat16, torch.float16, torch.float32])
+    logging.info("Device: {} {}".format(comfy.model_management.get_torch_device_name(device), dtype))
+    # a quarter of the width and half the resolution on the cpu
+    scale = 4 if device.type == "cpu" else 1
+
+    patcher = comfy.model_patcher.ModelPatcher(torch.nn.Module(), device, device)
+    patched = {}
+    for name, method, value in METHODS:
+        if method == "tome":
+            patched[name] = TomePatchModel().patch(patcher, value)[0]
+        else:
+            patched[name] = HyperTile().patch(patcher, value, 2, 0, False)[0]
+
+    lines = ["{:<18} {:<14} {:>10} {:>8} {:>10} {:>8}".format("model", "method", "time", "speedup", "rel error", "cosine")]
+    for name, architecture, shape, extra_inputs in ARCHITECTURES:
+        if scale != 1:
+            shape = shape[:-2] + (shape[-2] // 2, shape[-1] // 2)
+        model = init_weights(architecture(scale, operations=comfy.ops.disable_weight_init, device=device, dtype=dtype))
+        inputs = [i.to(device=device, dtype=dtype) for i in (torch.randn(shape), torch.tensor([0.5])) + extra_inputs(shape[0])]
+
+        with torch.no_grad():
+            base_time, base = timed(lambda model=model, inputs=inputs: model(*inputs), device)
+            lines.append("{:<18} {:<14} {:>9.3f}s {:>8} {:>10} {:>8}".format(name, "none", base_time, "", "", ""))
+            logging.info(lines[-1])
+            base = base.float().flatten()
+            for method, m in patched.items():
+                transformer_options = m.model_options["transformer_options"]
+                method_time, out = timed(lambda model=model, inputs=inputs, transformer_options=transformer_options: model(*inputs, transformer_options=transformer_options), device)
+                out = out.float().flatten()
+                error = ((out - base).norm() / base.norm()).item()
+                cosine = torch.nn.functional.cosine_similarity(out, base, dim=0).item()
+                lines.append("{:<18} {:<14} {:>9.3f}s {:>7.2f}x {:>10.4f} {:>8.4f}".format(name, method, method_time, base_time / method_time, error, cosine))
+                logging.info(lines[-1])
+                del out
+        del model, inputs, base
+        comfy.model_management.soft_empty_cache()
+    logging.info("DiT token merging and tiled attention, error of the output relative to the unpatched model:\n{}".format("\n".join(lines)))
+
+
+if __name__ == "__main__":
+    main()
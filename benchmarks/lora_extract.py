@@ -0,0 +1,93 @@
+"""
+Compares the full and the randomized svd of the lora extraction on weight differences with the shapes of
+common models: time of the sequential and of the parallel extraction and error of the extracted lora
+relative to the weight difference.
+
+Takes the same arguments as main.py, for example:
+
+    python benchmarks/lora_extract.py --cpu
+"""
+import os
+import sys
+import time
+import logging
+import concurrent.futures
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import comfy.options
+comfy.options.enable_args_parsing()
+
+from comfy.cli_args import args
+from app.logger import setup_logger
+
+import torch
+import comfy.model_management
+from comfy.attention_autotune import synchronize
+from comfy_extras.nodes_lora_extract import SVDType, MAX_WORKERS, extract_lora
+
+# name, weight shape, number of layers
+LAYERS = [
+    ("SDXL attention", (640, 640), 16),
+    ("SDXL feed forward", (5120, 1280), 4),
+    ("SDXL conv 3x3", (320, 320, 3, 3), 4),
+    ("Flux attention", (3072, 3072), 8),
+    ("Flux mlp", (12288, 3072), 4),
+]
+RANKS = [16, 64]
+# fine tunes mostly change a few directions of a weight
+DIFF_RANK = 128
+DIFF_NOISE = 0.05
+
+
+def weight_diff(shape, generator, device):
+    out_dim = shape[0]
+    in_dim = torch.Size(shape[1:]).numel()
+    rank = min(DIFF_RANK, out_dim, in_dim)
+    scale = torch.linspace(1.0, 0.01, rank, device=device)
+    diff = (torch.randn(out_dim, rank, generator=generator, device=device) * scale) @ torch.randn(rank, in_dim, generator=generator, device=device)
+    diff += DIFF_NOISE * torch.randn(out_dim, in_dim, generator=generator, device=device)
+    return diff.reshape(shape) / in_dim ** 0.5
+
+
+def relative_error(diff, up, down):
+    diff = diff.flatten(start_dim=1).float()
+    return (torch.linalg.norm(diff - up.flatten(start_dim=1) @ down.flatten(start_dim=1)) / torch.linalg.norm(diff)).item()
+
+
+def run(diffs, rank, svd_type, executor=None):
+    comfy.model_management.soft_empty_cache()
+    synchronize(diffs[0].device)
+    start = time.perf_counter()
+    if executor is None:
+        out = [extract_lora(d, rank, svd_type) for d in diffs]
+    else:
+        out = list(executor.map(lambda d: extract_lora(d, rank, svd_type), diffs))
+    synchronize(diffs[0].device)
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(relative_error(d, u, v) for d, (u, v) in zip(diffs, out)) / len(diffs)
+
+
+def main():
+    setup_logger(log_level=args.verbose, use_stdout=args.log_stdout)
+    device = comfy.model_management.get_torch_device()
+    logging.info("Device: {}, workers: {}".format(comfy.model_management.get_torch_device_name(device), MAX_WORKERS))
+    generator = torch.Generator(device=device).manual_seed(0)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+    lines = ["{:<20} {:>5} {:>12} {:>12} {:>12} {:>12} {:>12}".format("layer", "rank", "full", "randomized", "parallel", "full err", "rand err")]
+    for name, shape, count in LAYERS:
+        diffs = [weight_diff(shape, generator, device) for _ in range(count)]
+        for rank in RANKS:
+            full_time, full_error = run(diffs, rank, SVDType.FULL)
+            randomized_time, randomized_error = run(diffs, rank, SVDType.RANDOMIZED)
+            parallel_time, _ = run(diffs, rank, SVDType.RANDOMIZED, executor)
+            lines.append("{:<20} {:>5} {:>11.3f}s {:>11.3f}s {:>11.3f}s {:>12.5f} {:>12.5f}".format(name, rank, full_time, randomized_time, parallel_time, full_error, randomized_error))
+            logging.info(lines[-1])
+        del diffs
+    executor.shutdown()
+    logging.info("Lora extraction of {} layers:\n{}".format(sum(c for _, _, c in LAYERS), "\n".join(lines)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Times the stochastic rounding of patched weights to float8 against a plain round to nearest cast on
+the weight shapes of Flux and checks the rounding is unbiased.
+
+Takes the same arguments as main.py, for example:
+
+    python benchmarks/stochastic_rounding.py --cpu
+"""
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import comfy.options
+comfy.options.enable_args_parsing()
+
+from comfy.cli_args import args
+from app.logger import setup_logger
+
+import torch
+import comfy.float
+import comfy.model_management
+from comfy.attention_autotune import synchronize
+
+# name, weight shape, number of weights in the model
+WEIGHTS = [
+    ("Flux attention qkv", (9216, 3072), 19),
+    ("Flux mlp", (12288, 3072), 76),
+    ("Flux single block", (21504, 3072), 38),
+]
+REPEATS = 3
+
+
+def timed(function, device):
+    synchronize(device)
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        out = function()
+        synchronize(device)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    setup_logger(log_level=args.verbose, use_stdout=args.log_stdout)
+    device = comfy.model_management.get_torch_device()
+    logging.info("Device: {}".format(comfy.model_management.get_torch_device_name(device)))
+
+    lines = ["{:<20} {:<14} {:>12} {:>12} {:>14} {:>14} {:>12}".format("weight", "dtype", "nearest", "stochastic", "nearest bias", "stoch bias", "model")]
+    for name, shape, count in WEIGHTS:
+        weight = torch.randn(shape, device=device) * 0.02
+        for dtype in (torch.float8_e4m3fn, torch.float8_e5m2):
+            nearest_time, nearest = timed(lambda weight=weight, dtype=dtype: weight.to(dtype), device)
+            stochastic_time, stochastic = timed(lambda weight=weight, dtype=dtype: comfy.float.stochastic_rounding(weight, dtype, seed=0), device)
+            # average difference from the weight, relative to its average magnitude
+            scale = weight.abs().mean().item()
+            nearest_bias = (nearest.float() - weight).mean().item() / scale
+            stochastic_bias = (stochastic.float() - weight).mean().item() / scale
+            lines.append("{:<20} {:<14} {:>11.4f}s {:>11.4f}s {:>14.2e} {:>14.2e} {:>11.2f}s".format(name, str(dtype).split(".")[-1], nearest_time, stochastic_time, nearest_bias, stochastic_bias, stochastic_time * count))
+            logging.info(lines[-1])
+            del nearest, stochastic
+        del weight
+        comfy.model_management.soft_empty_cache()
+    logging.info("Rounding to float8, model is the stochastic rounding time of every weight of that shape in the model:\n{}".format("\n".join(lines)))
+
+
+if __name__ == "__main__":
+    main()
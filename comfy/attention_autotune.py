@@ -0,0 +1,197 @@
+"""
+Per shape choice of the attention backend.
+
+The fastest attention kernel depends on the sequence lengths, the head dim, the dtype and on the
+presence of a mask. The first time a shape signature is seen every available backend is timed on
+the actual inputs and the fastest one is used for that signature from then on. Only backends that
+give the result of the reference backend within the precision of the dtype are considered, so a
+lossy kernel never wins on speed alone. The winners are persisted so the benchmark only runs once
+per shape and device.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import logging
+import functools
+import threading
+
+import torch
+
+CACHE_VERSION = 1
+BENCHMARK_REPEATS = 3
+DEFAULT_BACKEND = "default"
+# relative error a backend may have against the reference, in epsilons of the dtype
+ACCURACY_EPS = 4
+MIN_ACCURACY_TOLERANCE = 1e-4
+
+
+def shape_bucket(n: int) -> int:
+    """Rounds up to a power of two so nearby sequence lengths share their tuning."""
+    return 1 << max(0, (n - 1).bit_length())
+
+
+# every attention call looks up its signature so the name is only queried once per device
+@functools.cache
+def device_name(device: torch.device) -> str:
+    if device.type == "cuda":
+        return torch.cuda.get_device_name(device)
+    return device.type
+
+
+def relative_error(out: torch.Tensor, reference: torch.Tensor) -> float:
+    return (torch.linalg.vector_norm(out.float() - reference) / torch.linalg.vector_norm(reference).clamp(min=1e-12)).item()
+
+
+def is_compiling() -> bool:
+    compiler = getattr(torch, "compiler", None)
+    return compiler is not None and hasattr(compiler, "is_compiling") and compiler.is_compiling()
+
+
+def synchronize(device: torch.device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    elif device.type == "xpu":
+        torch.xpu.synchronize(device)
+    elif device.type == "mps":
+        torch.mps.synchronize()
+
+
+class AttentionAutotuner:
+    """
+    Maps a shape signature to the name of the fastest attention backend for it. Without a path the
+    table only lives in memory. While torch.compile traces, signatures are not looked up and the
+    default backend is used.
+    """
+    def __init__(self, path: str | None = None):
+        self.lock = threading.Lock()
+        self.path = None
+        self.entries: dict[str, str] = {}
+        # signature -> {backend: seconds} of the benchmarks run by this process
+        self.timings: dict[str, dict[str, float]] = {}
+        # number of benchmarks run by this process
+        self.tuned = 0
+        self.file_mtime = None
+        if path is not None:
+            self.set_path(path)
+
+    def set_path(self, path: str | None) -> None:
+        with self.lock:
+            self.path = path
+            self.file_mtime = None
+            self.reload()
+
+    def reload(self) -> None:
+        """Picks up entries written by other processes. Must be called with the lock held."""
+        if self.path is None:
+            return
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self.file_mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable attention autotune table {self.path}: {e}")
+            return
+        self.file_mtime = mtime
+        if data.get("version") == CACHE_VERSION:
+            self.entries.update(data.get("entries", {}))
+
+    def save(self) -> None:
+        """Must be called with the lock held."""
+        if self.path is None:
+            return
+        data = {"version": CACHE_VERSION, "entries": self.entries}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self.file_mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            logging.warning(f"Failed to write attention autotune table {self.path}: {e}")
+
+    def signature(self, q, k, heads, mask=None, skip_reshape=False) -> str:
+        if skip_reshape:
+            b, heads, q_len, dim_head = q.shape
+            k_len = k.shape[2]
+        else:
+            b, q_len, dim_head = q.shape
+            dim_head //= heads
+            k_len = k.shape[1]
+        return "{}|{}|bh{}|q{}|k{}|d{}|{}".format(device_name(q.device), str(q.dtype).split(".")[-1], shape_bucket(b * heads),
+                                                 shape_bucket(q_len), shape_bucket(k_len), dim_head, "mask" if mask is not None else "nomask")
+
+    def benchmark(self, backends: dict, q, k, v, heads, mask=None, **kwargs) -> dict[str, float]:
+        """
+        Average seconds per call of every backend that runs on these inputs and gives the result of the
+        reference, the first backend that works, within the tolerance of the dtype.
+        """
+        timings = {}
+        reference = None
+        tolerance = max(ACCURACY_EPS * torch.finfo(q.dtype).eps, MIN_ACCURACY_TOLERANCE)
+        for name, backend in backends.items():
+            try:
+                out = backend(q, k, v, heads, mask=mask, **kwargs)
+                if not torch.isfinite(out).all():
+                    logging.debug("Attention backend {} gave non finite values".format(name))
+                    continue
+                if reference is None:
+                    reference = out.float()
+                else:
+                    error = relative_error(out, reference)
+                    if error > tolerance:
+                        logging.info("Attention backend {} is not used, its relative error {:.2e} is over {:.2e}".format(name, error, tolerance))
+                        continue
+                del out
+                synchronize(q.device)
+                start = time.perf_counter()
+                for _ in range(BENCHMARK_REPEATS):
+                    backend(q, k, v, heads, mask=mask, **kwargs)
+                synchronize(q.device)
+                timings[name] = (time.perf_counter() - start) / BENCHMARK_REPEATS
+            except Exception as e:
+                logging.debug("Attention backend {} failed: {}".format(name, e))
+        return timings
+
+    def select(self, backends: dict, q, k, v, heads, mask=None, skip_reshape=False, **kwargs) -> str | None:
+        """Name of the backend to use for these inputs, None to use the default one."""
+        if is_compiling():
+            return None
+        signature = self.signature(q, k, heads, mask=mask, skip_reshape=skip_reshape)
+        name = self.entries.get(signature)
+        if name in backends:
+            return name
+        if name == DEFAULT_BACKEND:
+            return None
+        return self.tune(backends, q, k, v, heads, mask=mask, skip_reshape=skip_reshape, **kwargs)
+
+    def tune(self, backends: dict, q, k, v, heads, mask=None, skip_reshape=False, **kwargs) -> str | None:
+        """Benchmarks the backends on these inputs and records the fastest one for their signature."""
+        signature = self.signature(q, k, heads, mask=mask, skip_reshape=skip_reshape)
+        timings = self.benchmark(backends, q, k, v, heads, mask=mask, skip_reshape=skip_reshape, **kwargs)
+        self.tuned += 1
+        # when nothing works the default backend is used without benchmarking again
+        name = min(timings, key=timings.get) if len(timings) > 0 else DEFAULT_BACKEND
+        logging.info("Attention autotune {}: using {} ({})".format(signature, name, ", ".join("{} {:.3f}ms".format(n, t * 1000) for n, t in timings.items())))
+        with self.lock:
+            self.reload()
+            self.entries[signature] = name
+            self.timings[signature] = timings
+            self.save()
+        return name if name != DEFAULT_BACKEND else None
+
+    def table(self) -> list[tuple[str, str, dict[str, float]]]:
+        """(signature, backend, timings) of every known signature, timings are empty for the ones tuned by another process."""
+        with self.lock:
+            self.reload()
+            return [(s, self.entries[s], self.timings.get(s, {})) for s in sorted(self.entries)]
+
+
+attention_tuner = AttentionAutotuner()
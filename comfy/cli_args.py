@@ -96,6 +96,7 @@ class LatentPreviewMethod(enum.Enum):
 parser.add_argument("--preview-method", type=LatentPreviewMethod, default=LatentPreviewMethod.NoPreviews, help="Default preview method for sampler nodes.", action=EnumAction)
 
 parser.add_argument("--preview-size", type=int, default=512, help="Sets the maximum preview size for sampler nodes.")
+parser.add_argument("--preview-rate", type=float, default=10.0, help="Sets the maximum number of latent previews sent per second by sampler nodes, 0 for no limit.")
 
 cache_group = parser.add_mutually_exclusive_group()
 cache_group.add_argument("--cache-classic", action="store_true", help="Use the old style (aggressive) caching.")
@@ -107,6 +108,7 @@ attn_group.add_argument("--use-quad-cross-attention", action="store_true", help=
 attn_group.add_argument("--use-pytorch-cross-attention", action="store_true", help="Use the new pytorch 2.0 cross attention function.")
 attn_group.add_argument("--use-sage-attention", action="store_true", help="Use sage attention.")
 attn_group.add_argument("--use-flash-attention", action="store_true", help="Use FlashAttention.")
+attn_group.add_argument("--attention-autotune", action="store_true", help="Benchmark the available attention backends the first time each shape is seen and use the fastest one for it. The results are kept in attention_autotune.json in the user directory.")
 
 parser.add_argument("--disable-xformers", action="store_true", help="Disable xformers.")
 
@@ -142,7 +144,15 @@ parser.add_argument("--quick-test-for-ci", action="store_true", help="Quick test
 parser.add_argument("--windows-standalone-build", action="store_true", help="Windows standalone build: Enable convenient things that most people using the standalone windows build will probably enjoy (like auto opening the page on startup).")
 
 parser.add_argument("--disable-metadata", action="store_true", help="Disable saving prompt metadata in files.")
+parser.add_argument("--output-write-workers", type=int, default=4, metavar="N", help="Encode and write the images of output nodes with N background threads. The results of a prompt are published once its files are written. 0 writes them on the execution thread.")
+parser.add_argument("--history-database", type=str, default=None, metavar="PATH", help="Keep the prompt history in this SQLite database so it survives restarts. By default it is kept in a temporary database that is deleted on exit.")
+parser.add_argument("--queue-model-affinity", type=int, default=0, metavar="N", help="Let a queued prompt that uses the same checkpoint or diffusion model as the last started one run before the prompt that is next, which avoids swapping models. A prompt can be overtaken at most N times, 0 keeps the queue order.")
+parser.add_argument("--queue-client-weights", type=str, default=None, metavar="PATH", help="JSON file of {\"client_id\": weight} giving clients a bigger (or smaller) share of the queue while several clients have prompts queued, the default weight is 1. API clients set their client_id in the prompt request.")
+parser.add_argument("--max-queued-per-client", type=int, default=0, metavar="N", help="Reject prompts from a client that already has N prompts queued, 0 for no limit.")
+parser.add_argument("--model-prefetch-budget", type=float, default=0, metavar="GB", help="While a prompt runs, read up to this many GB of the model files used by the next queued prompts into the OS file cache, at most half of the available RAM. Off (0) by default.")
 parser.add_argument("--disable-all-custom-nodes", action="store_true", help="Disable loading all custom nodes.")
+parser.add_argument("--custom-node-import-workers", type=int, default=1, metavar="N", help="Import custom node modules and run their prestartup scripts with N parallel threads. Modules that fail to import in parallel are retried serially.")
+parser.add_argument("--lazy-custom-nodes", action="store_true", help="Register custom nodes from a cached manifest and only import their module when one of its nodes is first used. Modules that add server routes are always imported at startup.")
 
 parser.add_argument("--multi-user", action="store_true", help="Enables per-user storage.")
 
@@ -31,10 +31,7 @@ import comfy.latent_formats
 
 import comfy.cldm.cldm
 import comfy.t2i_adapter.adapter
-import comfy.ldm.cascade.controlnet
 import comfy.cldm.mmdit
-import comfy.ldm.hydit.controlnet
-import comfy.ldm.flux.controlnet
 import comfy.cldm.dit_embedder
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -59,6 +56,47 @@ def broadcast_image_to(tensor, target_batch_size, batched_number):
     else:
         return torch.cat([tensor] * batched_number, dim=0)
 
+def clone_control(control):
+    out = {}
+    cloned = {}
+    for k in control:
+        o = []
+        for x in control[k]:
+            if x is not None:
+                if id(x) not in cloned: #keep tensors shared between outputs shared, control_merge depends on it
+                    cloned[id(x)] = x.clone()
+                x = cloned[id(x)]
+            o.append(x)
+        out[k] = o
+    return out
+
+def split_control(control, chunks):
+    out = [{} for _ in range(chunks)]
+    split = {}
+    for k in control:
+        for o in out:
+            o[k] = []
+        for x in control[k]:
+            if x is None:
+                for o in out:
+                    o[k].append(None)
+                continue
+            if id(x) not in split:
+                split[id(x)] = x.chunk(chunks)
+            for i, o in enumerate(out):
+                o[k].append(split[id(x)][i])
+    return out
+
+def same_extra_args(a, b):
+    if a.keys() != b.keys():
+        return False
+    for k in a:
+        if a[k] is b[k]:
+            continue
+        if torch.is_tensor(a[k]) or torch.is_tensor(b[k]) or a[k] != b[k]:
+            return False
+    return True
+
 class StrengthType(Enum):
     CONSTANT = 1
     LINEAR_UP = 2
@@ -84,6 +122,10 @@ class ControlBase:
         self.extra_concat = None
         self.extra_hooks: HookGroup = None
         self.preprocess_image = lambda a: a
+        self.cache_sigma_window = 0.0
+        self.cached_controls = []
+        self.cache_sigma = None
+        self.cache_index = 0
 
     def set_cond_hint(self, cond_hint, strength=1.0, timestep_percent_range=(0.0, 1.0), vae=None, extra_concat=[]):
         self.cond_hint_original = cond_hint
@@ -107,6 +149,51 @@ class ControlBase:
         self.previous_controlnet = controlnet
         return self
 
+    def set_cache_sigma_window(self, window):
+        """
+        Reuse the output of the control model in the following steps while the sigma is within window
+        (a fraction of the sigma) of the one it was computed at. 0 runs the control model every step.
+        """
+        self.cache_sigma_window = window
+        return self
+
+    def is_active(self, t):
+        if self.timestep_range is not None:
+            if t[0] > self.timestep_range[0] or t[0] < self.timestep_range[1]:
+                return False
+        return True
+
+    def cached_control(self, x_noisy, t):
+        """
+        Returns the control output of a previous step that can be reused for this call or None.
+        Must be called once per call of the control model, one step can have several (one per cond chunk).
+        """
+        if self.cache_sigma_window <= 0:
+            return None
+        sigma = float(t[0])
+        if sigma != self.cache_sigma:
+            self.cache_sigma = sigma
+            self.cache_index = 0
+        index = self.cache_index
+        self.cache_index += 1
+
+        if index >= len(self.cached_controls):
+            return None
+        cached_sigma, shape, control = self.cached_controls[index]
+        if shape != x_noisy.shape or sigma > cached_sigma or sigma < cached_sigma * (1.0 - self.cache_sigma_window):
+            return None
+        return control
+
+    def store_control(self, x_noisy, control):
+        if self.cache_sigma_window <= 0:
+            return
+        index = self.cache_index - 1
+        entry = (self.cache_sigma, x_noisy.shape, control)
+        if index < len(self.cached_controls):
+            self.cached_controls[index] = entry
+        else:
+            self.cached_controls.append(entry)
+
     def cleanup(self):
         if self.previous_controlnet is not None:
             self.previous_controlnet.cleanup()
@@ -114,6 +201,8 @@ class ControlBase:
         self.cond_hint = None
         self.extra_concat = None
         self.timestep_range = None
+        self.cached_controls = []
+        self.cache_sigma = None
 
     def get_models(self):
         out = []
@@ -145,6 +234,7 @@ class ControlBase:
         c.extra_concat_orig = self.extra_concat_orig.copy()
         c.extra_hooks = self.extra_hooks.clone() if self.extra_hooks else None
         c.preprocess_image = self.preprocess_image
+        c.cache_sigma_window = self.cache_sigma_window
 
     def inference_memory_requirements(self, dtype):
         if self.previous_controlnet is not None:
@@ -213,22 +303,41 @@ class ControlNet(ControlBase):
         self.strength_type = strength_type
         self.concat_mask = concat_mask
         self.preprocess_image = preprocess_image
+        self.pending_control = None
 
     def get_control(self, x_noisy, t, cond, batched_number, transformer_options):
+        if self.previous_controlnet is not None and self.pending_control is None:
+            run_controlnets_batched(self, x_noisy, t, cond, batched_number)
+
         control_prev = None
         if self.previous_controlnet is not None:
             control_prev = self.previous_controlnet.get_control(x_noisy, t, cond, batched_number, transformer_options)
 
-        if self.timestep_range is not None:
-            if t[0] > self.timestep_range[0] or t[0] < self.timestep_range[1]:
-                if control_prev is not None:
-                    return control_prev
-                else:
-                    return None
+        if not self.is_active(t):
+            if control_prev is not None:
+                return control_prev
+            else:
+                return None
+
+        control = self.pending_control
+        self.pending_control = None
+        if control is None:
+            control = self.cached_control(x_noisy, t)
+            if control is None:
+                control = self.control_model(**self.control_inputs(x_noisy, t, cond, batched_number))
+                self.store_control(x_noisy, control)
+
+        if self.cache_sigma_window > 0: #control_merge modifies the tensors in place
+            control = clone_control(control)
+        return self.control_merge(control, control_prev, output_dtype=None)
 
-        dtype = self.control_model.dtype
+    def control_dtype(self):
         if self.manual_cast_dtype is not None:
-            dtype = self.manual_cast_dtype
+            return self.manual_cast_dtype
+        return self.control_model.dtype
+
+    def control_inputs(self, x_noisy, t, cond, batched_number):
+        dtype = self.control_dtype()
 
         if self.cond_hint is None or x_noisy.shape[2] * self.compression_ratio != self.cond_hint.shape[2] or x_noisy.shape[3] * self.compression_ratio != self.cond_hint.shape[3]:
             if self.cond_hint is not None:
@@ -270,8 +379,7 @@ class ControlNet(ControlBase):
         timestep = self.model_sampling_current.timestep(t)
         x_noisy = self.model_sampling_current.calculate_input(t, x_noisy)
 
-        control = self.control_model(x=x_noisy.to(dtype), hint=self.cond_hint, timesteps=timestep.to(dtype), context=context.to(dtype), **extra)
-        return self.control_merge(control, control_prev, output_dtype=None)
+        return dict(x=x_noisy.to(dtype), hint=self.cond_hint, timesteps=timestep.to(dtype), context=context.to(dtype), **extra)
 
     def copy(self):
         c = ControlNet(None, global_average_pooling=self.global_average_pooling, load_device=self.load_device, manual_cast_dtype=self.manual_cast_dtype)
@@ -291,8 +399,51 @@ class ControlNet(ControlBase):
 
     def cleanup(self):
         self.model_sampling_current = None
+        self.pending_control = None
         super().cleanup()
 
+def run_controlnets_batched(controlnet, x_noisy, t, cond, batched_number):
+    """
+    Runs the control models of a chain of controlnets for this call ahead of the chain's get_control calls,
+    controlnets that use the same control model with different hints are run as one batch. The outputs are
+    left in pending_control for get_control to pick up.
+    """
+    groups = []
+    c = controlnet
+    while c is not None:
+        if isinstance(c, ControlNet) and c.pending_control is None and c.is_active(t):
+            control = c.cached_control(x_noisy, t)
+            if control is not None:
+                c.pending_control = control
+            else:
+                for group in groups:
+                    first = group[0]
+                    if first.control_model is c.control_model and first.control_dtype() == c.control_dtype() and same_extra_args(first.extra_args, c.extra_args):
+                        group.append(c)
+                        break
+                else:
+                    groups.append([c])
+        c = c.previous_controlnet
+
+    for group in groups:
+        inputs = [c.control_inputs(x_noisy, t, cond, batched_number) for c in group]
+        if len(group) == 1:
+            outputs = [group[0].control_model(**inputs[0])]
+        else:
+            batched = {}
+            for k in inputs[0]:
+                v = inputs[0][k]
+                if k == "hint":
+                    v = torch.cat([comfy.utils.repeat_to_batch_size(i[k], x_noisy.shape[0]) for i in inputs])
+                elif torch.is_tensor(v) and v.ndim > 0 and v.shape[0] == x_noisy.shape[0]:
+                    v = torch.cat([v] * len(group))
+                batched[k] = v
+            outputs = split_control(group[0].control_model(**batched), len(group))
+
+        for c, control in zip(group, outputs):
+            c.store_control(x_noisy, control)
+            c.pending_control = control
+
 class ControlLoraOps:
     class Linear(torch.nn.Module, comfy.ops.CastWeightBiasOp):
         def __init__(self, in_features: int, out_features: int, bias: bool = True,
@@ -539,6 +690,7 @@ def load_controlnet_sd35(sd, model_options={}):
 
 
 def load_controlnet_hunyuandit(controlnet_data, model_options={}):
+    import comfy.ldm.hydit.controlnet
     model_config, operations, load_device, unet_dtype, manual_cast_dtype, offload_device = controlnet_config(controlnet_data, model_options=model_options)
 
     control_model = comfy.ldm.hydit.controlnet.HunYuanControlNet(operations=operations, device=offload_device, dtype=unet_dtype)
@@ -550,6 +702,7 @@ def load_controlnet_hunyuandit(controlnet_data, model_options={}):
     return control
 
 def load_controlnet_flux_xlabs_mistoline(sd, mistoline=False, model_options={}):
+    import comfy.ldm.flux.controlnet
     model_config, operations, load_device, unet_dtype, manual_cast_dtype, offload_device = controlnet_config(sd, model_options=model_options)
     control_model = comfy.ldm.flux.controlnet.ControlNetFlux(mistoline=mistoline, operations=operations, device=offload_device, dtype=unet_dtype, **model_config.unet_config)
     control_model = controlnet_load_state_dict(control_model, sd)
@@ -558,6 +711,7 @@ def load_controlnet_flux_xlabs_mistoline(sd, mistoline=False, model_options={}):
     return control
 
 def load_controlnet_flux_instantx(sd, model_options={}):
+    import comfy.ldm.flux.controlnet
     new_sd = comfy.model_detection.convert_diffusers_mmdit(sd, "")
     model_config, operations, load_device, unet_dtype, manual_cast_dtype, offload_device = controlnet_config(new_sd, model_options=model_options)
     for k in sd:
@@ -805,6 +959,7 @@ class T2IAdapter(ControlBase):
         return c
 
 def load_t2i_adapter(t2i_data, model_options={}): #TODO: model_options
+    import comfy.ldm.cascade.controlnet
     compression_ratio = 8
     upscale_algorithm = 'nearest-exact'
 
@@ -1,49 +1,31 @@
+import math
 import torch
 
-def calc_mantissa(abs_x, exponent, normal_mask, MANTISSA_BITS, EXPONENT_BIAS, generator=None):
-    mantissa_scaled = torch.where(
-        normal_mask,
-        (abs_x / (2.0 ** (exponent - EXPONENT_BIAS)) - 1.0) * (2**MANTISSA_BITS),
-        (abs_x / (2.0 ** (-EXPONENT_BIAS + 1 - MANTISSA_BITS)))
-    )
+# elements rounded at once, bounds the memory of the temporary tensors
+STOCHASTIC_ROUNDING_CHUNK = 4096 * 4096
 
-    mantissa_scaled += torch.rand(mantissa_scaled.size(), dtype=mantissa_scaled.dtype, layout=mantissa_scaled.layout, device=mantissa_scaled.device, generator=generator)
-    return mantissa_scaled.floor() / (2**MANTISSA_BITS)
-
-#Not 100% sure about this
 def manual_stochastic_round_to_float8(x, dtype, generator=None):
-    if dtype == torch.float8_e4m3fn:
-        EXPONENT_BITS, MANTISSA_BITS, EXPONENT_BIAS = 4, 3, 7
-    elif dtype == torch.float8_e5m2:
-        EXPONENT_BITS, MANTISSA_BITS, EXPONENT_BIAS = 5, 2, 15
-    else:
+    """
+    Rounds x to the float8 dtype, up or down with a probability proportional to how close the value is.
+    Random bits are added to the float32 bits below the float8 mantissa before they get truncated.
+    """
+    if dtype != torch.float8_e4m3fn and dtype != torch.float8_e5m2:
         raise ValueError("Unsupported dtype")
 
-    x = x.half()
-    sign = torch.sign(x)
-    abs_x = x.abs()
-    sign = torch.where(abs_x == 0, 0, sign)
-
-    # Combine exponent calculation and clamping
-    exponent = torch.clamp(
-        torch.floor(torch.log2(abs_x)) + EXPONENT_BIAS,
-        0, 2**EXPONENT_BITS - 1
-    )
-
-    # Combine mantissa calculation and rounding
-    normal_mask = ~(exponent == 0)
-
-    abs_x[:] = calc_mantissa(abs_x, exponent, normal_mask, MANTISSA_BITS, EXPONENT_BIAS, generator=generator)
+    info = torch.finfo(dtype)
+    dropped_bits = 23 - round(-math.log2(info.eps))
+    abs_x = x.float().abs().clamp_(max=info.max)
+    # float8 subnormals have the spacing of the smallest exponent, offsetting them by the smallest normal
+    # number puts them in that exponent where the float32 bits line up the same way
+    offset = (abs_x < info.smallest_normal).float().mul_(info.smallest_normal)
+    abs_x += offset
 
-    sign *= torch.where(
-        normal_mask,
-        (2.0 ** (exponent - EXPONENT_BIAS)) * (1.0 + abs_x),
-        (2.0 ** (-EXPONENT_BIAS + 1)) * abs_x
-    )
+    bits = abs_x.view(torch.int32)
+    bits += torch.randint(0, 1 << dropped_bits, bits.shape, dtype=torch.int32, device=bits.device, generator=generator)
+    bits &= -(1 << dropped_bits)
 
-    inf = torch.finfo(dtype)
-    torch.clamp(sign, min=inf.min, max=inf.max, out=sign)
-    return sign
+    abs_x -= offset
+    return torch.copysign(abs_x, x, out=abs_x).to(dtype)
 
 
 
@@ -57,11 +39,11 @@ def stochastic_rounding(value, dtype, seed=0):
     if dtype == torch.float8_e4m3fn or dtype == torch.float8_e5m2:
         generator = torch.Generator(device=value.device)
         generator.manual_seed(seed)
-        output = torch.empty_like(value, dtype=dtype)
-        num_slices = max(1, (value.numel() / (4096 * 4096)))
-        slice_size = max(1, round(value.shape[0] / num_slices))
-        for i in range(0, value.shape[0], slice_size):
-            output[i:i+slice_size].copy_(manual_stochastic_round_to_float8(value[i:i+slice_size], dtype, generator=generator))
+        output = torch.empty(value.shape, dtype=dtype, device=value.device)
+        value = value.reshape(-1)
+        output_flat = output.view(-1)
+        for i in range(0, value.numel(), STOCHASTIC_ROUNDING_CHUNK):
+            output_flat[i:i + STOCHASTIC_ROUNDING_CHUNK] = manual_stochastic_round_to_float8(value[i:i + STOCHASTIC_ROUNDING_CHUNK], dtype, generator=generator)
         return output
 
     return value.to(dtype=dtype)
@@ -1,5 +1,6 @@
 import torch
 import comfy.ops
+from comfy.ldm.modules.attention import optimized_attention
 
 def pad_to_patch_size(img, patch_size=(2, 2), padding_mode="circular"):
     if padding_mode == "circular" and (torch.jit.is_tracing() or torch.jit.is_scripting()):
@@ -28,3 +29,23 @@ def rms_norm(x, weight=None, eps=1e-6):
             return r
         else:
             return r * comfy.ops.cast_to(weight, dtype=x.dtype, device=x.device)
+
+
+def has_attention_patches(transformer_options):
+    patches = transformer_options.get("patches", {})
+    return "dit_attn_patch" in patches or "dit_attn_output_patch" in patches
+
+def attention_with_patches(q, k, v, heads, mask=None, transformer_options={}):
+    """
+    optimized_attention of q, k and v of shape [B, L, heads * dim_head] that lets the dit_attn_patch patches change
+    q, k and v and the dit_attn_output_patch patches change the output before the output projection. The last
+    prod(transformer_options["token_grid"]) tokens are the image tokens, they are laid out row by row. The patches
+    don't run when there is an attention mask.
+    """
+    patches = transformer_options.get("patches", {}) if mask is None else {}
+    for p in patches.get("dit_attn_patch", []):
+        q, k, v = p(q, k, v, transformer_options)
+    out = optimized_attention(q, k, v, heads, mask=mask)
+    for p in patches.get("dit_attn_output_patch", []):
+        out = p(out, transformer_options)
+    return out
@@ -4,9 +4,10 @@ from torch import Tensor
 
 from comfy.ldm.modules.attention import optimized_attention
 import comfy.model_management
+import comfy.ldm.common_dit
 
 
-def attention(q: Tensor, k: Tensor, v: Tensor, pe: Tensor, mask=None) -> Tensor:
+def attention(q: Tensor, k: Tensor, v: Tensor, pe: Tensor, mask=None, transformer_options={}) -> Tensor:
     q_shape = q.shape
     k_shape = k.shape
 
@@ -17,6 +18,9 @@ def attention(q: Tensor, k: Tensor, v: Tensor, pe: Tensor, mask=None) -> Tensor:
         k = (pe[..., 0] * k[..., 0] + pe[..., 1] * k[..., 1]).reshape(*k_shape).type_as(v)
 
     heads = q.shape[1]
+    if mask is None and comfy.ldm.common_dit.has_attention_patches(transformer_options):
+        q, k, v = [t.transpose(1, 2).flatten(2) for t in (q, k, v)]
+        return comfy.ldm.common_dit.attention_with_patches(q, k, v, heads, transformer_options=transformer_options)
     x = optimized_attention(q, k, v, heads, skip_reshape=True, mask=mask)
     return x
 
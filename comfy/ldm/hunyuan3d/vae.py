@@ -79,6 +79,81 @@ class VanillaVolumeDecoder:
         return grid_logits
 
 
+class HierarchicalVolumeDecoder:
+    """
+    Coarse to fine volume decoding. The occupancy is first decoded on a grid 2 ** levels times coarser than
+    octree_resolution, then every level halves the cell size but only decodes the new points of the cells the
+    surface at mc_level goes through and of their neighbors, the points of the other cells are interpolated.
+    The result has the same shape as the one of VanillaVolumeDecoder and the same values around the surface.
+    """
+    @torch.no_grad()
+    def __call__(
+        self,
+        latents: torch.FloatTensor,
+        geo_decoder: Callable,
+        bounds: Union[Tuple[float], List[float], float] = 1.01,
+        num_chunks: int = 10000,
+        octree_resolution: int = None,
+        levels: int = 2,
+        mc_level: float = 0.0,
+        enable_pbar: bool = True,
+        **kwargs,
+    ):
+        device = latents.device
+        dtype = latents.dtype
+        batch_size = latents.shape[0]
+
+        if isinstance(bounds, float):
+            bounds = [-bounds, -bounds, -bounds, bounds, bounds, bounds]
+
+        # every level must split the cells of the previous one in two
+        while levels > 0 and octree_resolution % (2 ** levels) != 0:
+            levels -= 1
+
+        # same coordinates as generate_dense_grid_points
+        axes = [torch.from_numpy(np.linspace(bounds[i], bounds[i + 3], int(octree_resolution) + 1, dtype=np.float32)).to(device, dtype=dtype) for i in range(3)]
+
+        def decode_points(indices):
+            logits = []
+            for start in tqdm(range(0, indices.shape[0], num_chunks), desc="Volume Decoding", disable=not enable_pbar):
+                chunk = indices[start: start + num_chunks]
+                chunk_queries = torch.stack([axes[i][chunk[:, i]] for i in range(3)], dim=-1)
+                chunk_queries = repeat(chunk_queries, "p c -> b p c", b=batch_size)
+                logits.append(geo_decoder(queries=chunk_queries, latents=latents).reshape(batch_size, -1))
+            return torch.cat(logits, dim=1).float()
+
+        step = 2 ** levels
+        size = octree_resolution // step + 1
+        indices = torch.stack(torch.meshgrid(*[torch.arange(size, device=device)] * 3, indexing="ij"), dim=-1).reshape(-1, 3)
+        grid_logits = decode_points(indices * step).view(batch_size, size, size, size)
+
+        for _ in range(levels):
+            step //= 2
+            # cells with corners on both sides of the surface in any volume of the batch, grown by one cell
+            # so the thin parts the coarse grid only partly sees are refined too
+            coarse = grid_logits.unsqueeze(1)
+            corners_max = F.max_pool3d(coarse, 2, stride=1)
+            corners_min = -F.max_pool3d(-coarse, 2, stride=1)
+            surface = ((corners_min <= mc_level) & (corners_max >= mc_level)).any(dim=0, keepdim=True).float()
+            surface = F.max_pool3d(surface, 3, stride=1, padding=1)
+
+            size = size * 2 - 1
+            fine = F.interpolate(coarse, size=(size, size, size), mode="trilinear", align_corners=True).squeeze(1)
+            fine[:, ::2, ::2, ::2] = grid_logits
+            grid_logits = fine
+
+            # corners of the fine cells of the refined cells, the ones with an odd index are new
+            refine = F.interpolate(surface, scale_factor=2, mode="nearest")
+            refine = F.max_pool3d(F.pad(refine, (1, 1, 1, 1, 1, 1)), 2, stride=1)[0, 0] > 0
+            odd = torch.arange(size, device=device) % 2 == 1
+            refine &= odd[:, None, None] | odd[None, :, None] | odd[None, None, :]
+            indices = refine.nonzero()
+            if indices.shape[0] > 0:
+                grid_logits[:, indices[:, 0], indices[:, 1], indices[:, 2]] = decode_points(indices * step)
+
+        return grid_logits
+
+
 class FourierEmbedder(nn.Module):
     """The sin/cosine positional embedding. Given an input tensor `x` of shape [n_batch, ..., c_dim], it converts
     each feature dimension of `x[..., i]` into:
@@ -569,6 +644,7 @@ class ShapeVAE(nn.Module):
         )
 
         self.volume_decoder = VanillaVolumeDecoder()
+        self.hierarchical_volume_decoder = HierarchicalVolumeDecoder()
         self.scale_factor = scale_factor
 
     def decode(self, latents, **kwargs):
@@ -579,8 +655,13 @@ class ShapeVAE(nn.Module):
         num_chunks = kwargs.get("num_chunks", 8000)
         octree_resolution = kwargs.get("octree_resolution", 256)
         enable_pbar = kwargs.get("enable_pbar", True)
+        octree_levels = kwargs.get("octree_levels", 0)
 
-        grid_logits = self.volume_decoder(latents, self.geo_decoder, bounds=bounds, num_chunks=num_chunks, octree_resolution=octree_resolution, enable_pbar=enable_pbar)
+        if octree_levels > 0:
+            grid_logits = self.hierarchical_volume_decoder(latents, self.geo_decoder, bounds=bounds, num_chunks=num_chunks, octree_resolution=octree_resolution,
+                                                           levels=octree_levels, mc_level=kwargs.get("mc_level", 0.0), enable_pbar=enable_pbar)
+        else:
+            grid_logits = self.volume_decoder(latents, self.geo_decoder, bounds=bounds, num_chunks=num_chunks, octree_resolution=octree_resolution, enable_pbar=enable_pbar)
         return grid_logits.movedim(-2, -1)
 
     def encode(self, x):
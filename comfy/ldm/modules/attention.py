@@ -17,6 +17,9 @@ if model_management.xformers_enabled():
     import xformers
     import xformers.ops
 
+from comfy.cli_args import args
+import comfy.attention_autotune
+
 if model_management.sage_attention_enabled():
     try:
         from sageattention import sageattn
@@ -24,14 +27,16 @@ if model_management.sage_attention_enabled():
         logging.error(f"\n\nTo use the `--use-sage-attention` feature, the `sageattention` package must be installed first.\ncommand:\n\t{sys.executable} -m pip install sageattention")
         exit(-1)
 
-if model_management.flash_attention_enabled():
+FLASH_ATTENTION_IS_AVAILABLE = False
+if model_management.flash_attention_enabled() or args.attention_autotune:
     try:
         from flash_attn import flash_attn_func
+        FLASH_ATTENTION_IS_AVAILABLE = True
     except ModuleNotFoundError:
-        logging.error(f"\n\nTo use the `--use-flash-attention` feature, the `flash-attn` package must be installed first.\ncommand:\n\t{sys.executable} -m pip install flash-attn")
-        exit(-1)
+        if model_management.flash_attention_enabled():
+            logging.error(f"\n\nTo use the `--use-flash-attention` feature, the `flash-attn` package must be installed first.\ncommand:\n\t{sys.executable} -m pip install flash-attn")
+            exit(-1)
 
-from comfy.cli_args import args
 import comfy.ops
 ops = comfy.ops.disable_weight_init
 
@@ -592,6 +597,28 @@ else:
         logging.info("Using sub quadratic optimization for attention, if you have memory or speed issues try using: --use-split-cross-attention")
         optimized_attention = attention_sub_quad
 
+
+def autotune_backends(device):
+    # the first backend is the reference the others have to match, the lossy sage attention is never tuned
+    backends = {"pytorch": attention_pytorch, "sub_quad": attention_sub_quad, "split": attention_split}
+    if device.type == "cuda":
+        if model_management.xformers_enabled():
+            backends["xformers"] = attention_xformers
+        if FLASH_ATTENTION_IS_AVAILABLE:
+            backends["flash"] = attention_flash
+    return backends
+
+AUTOTUNE_DEFAULT = optimized_attention
+
+def attention_autotune(q, k, v, heads, mask=None, attn_precision=None, skip_reshape=False, skip_output_reshape=False):
+    backends = autotune_backends(q.device)
+    name = comfy.attention_autotune.attention_tuner.select(backends, q, k, v, heads, mask=mask, attn_precision=attn_precision, skip_reshape=skip_reshape, skip_output_reshape=skip_output_reshape)
+    return backends.get(name, AUTOTUNE_DEFAULT)(q, k, v, heads, mask=mask, attn_precision=attn_precision, skip_reshape=skip_reshape, skip_output_reshape=skip_output_reshape)
+
+if args.attention_autotune:
+    logging.info("Using attention autotuning")
+    optimized_attention = attention_autotune
+
 optimized_attention_masked = optimized_attention
 
 def optimized_attention_for_device(device, mask=False, small_input=False):
@@ -602,6 +629,8 @@ def optimized_attention_for_device(device, mask=False, small_input=False):
             return attention_basic
 
     if device == torch.device("cpu"):
+        if args.attention_autotune:
+            return attention_autotune
         return attention_sub_quad
 
     if mask:
@@ -604,7 +604,7 @@ def block_mixing(*args, use_checkpoint=True, **kwargs):
         return _block_mixing(*args, **kwargs)
 
 
-def _block_mixing(context, x, context_block, x_block, c):
+def _block_mixing(context, x, context_block, x_block, c, transformer_options={}):
     context_qkv, context_intermediates = context_block.pre_attention(context, c)
 
     if x_block.x_block_self_attn:
@@ -614,12 +614,13 @@ def _block_mixing(context, x, context_block, x_block, c):
 
     o = []
     for t in range(3):
-        o.append(torch.cat((context_qkv[t], x_qkv[t]), dim=1))
+        o.append(torch.cat((context_qkv[t], x_qkv[t]), dim=1).flatten(2))
     qkv = tuple(o)
 
-    attn = optimized_attention(
+    attn = comfy.ldm.common_dit.attention_with_patches(
         qkv[0], qkv[1], qkv[2],
         heads=x_block.attn.num_heads,
+        transformer_options=transformer_options,
     )
     context_attn, x_attn = (
         attn[:, : context_qkv[0].shape[1]],
@@ -632,9 +633,10 @@ def _block_mixing(context, x, context_block, x_block, c):
     else:
         context = None
     if x_block.x_block_self_attn:
-        attn2 = optimized_attention(
-                x_qkv2[0], x_qkv2[1], x_qkv2[2],
+        attn2 = comfy.ldm.common_dit.attention_with_patches(
+                x_qkv2[0], x_qkv2[1], x_qkv2[2].flatten(2),
                 heads=x_block.attn2.num_heads,
+                transformer_options=transformer_options,
             )
         x = x_block.post_attention_x(x_attn, attn2, *x_intermediates)
     else:
@@ -956,7 +958,7 @@ class MMDiT(nn.Module):
             if ("double_block", i) in blocks_replace:
                 def block_wrap(args):
                     out = {}
-                    out["txt"], out["img"] = self.joint_blocks[i](args["txt"], args["img"], c=args["vec"])
+                    out["txt"], out["img"] = self.joint_blocks[i](args["txt"], args["img"], c=args["vec"], transformer_options=transformer_options)
                     return out
 
                 out = blocks_replace[("double_block", i)]({"img": x, "txt": context, "vec": c_mod}, {"original_block": block_wrap})
@@ -968,6 +970,7 @@ class MMDiT(nn.Module):
                     x,
                     c=c_mod,
                     use_checkpoint=self.use_checkpoint,
+                    transformer_options=transformer_options,
                 )
             if control is not None:
                 control_o = control.get("output")
@@ -999,6 +1002,9 @@ class MMDiT(nn.Module):
             context = self.context_processor(context)
 
         hw = x.shape[-2:]
+        transformer_options = transformer_options.copy()
+        transformer_options["original_shape"] = list(x.shape)
+        transformer_options["token_grid"] = tuple((i + self.patch_size - 1) // self.patch_size for i in hw)
         x = self.x_embedder(x) + comfy.ops.cast_to_input(self.cropped_pos_embed(hw, device=x.device), x)
         c = self.t_embedder(t, dtype=x.dtype)  # (N, D)
         if y is not None and self.y_embedder is not None:
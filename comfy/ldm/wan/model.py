@@ -52,7 +52,7 @@ class WanSelfAttention(nn.Module):
         self.norm_q = RMSNorm(dim, eps=eps, elementwise_affine=True, device=operation_settings.get("device"), dtype=operation_settings.get("dtype")) if qk_norm else nn.Identity()
         self.norm_k = RMSNorm(dim, eps=eps, elementwise_affine=True, device=operation_settings.get("device"), dtype=operation_settings.get("dtype")) if qk_norm else nn.Identity()
 
-    def forward(self, x, freqs):
+    def forward(self, x, freqs, transformer_options={}):
         r"""
         Args:
             x(Tensor): Shape [B, L, num_heads, C / num_heads]
@@ -70,11 +70,12 @@ class WanSelfAttention(nn.Module):
         q, k, v = qkv_fn(x)
         q, k = apply_rope(q, k, freqs)
 
-        x = optimized_attention(
+        x = comfy.ldm.common_dit.attention_with_patches(
             q.view(b, s, n * d),
             k.view(b, s, n * d),
             v,
             heads=self.num_heads,
+            transformer_options=transformer_options,
         )
 
         x = self.o(x)
@@ -193,6 +194,7 @@ class WanAttentionBlock(nn.Module):
         e,
         freqs,
         context,
+        transformer_options={},
     ):
         r"""
         Args:
@@ -208,7 +210,7 @@ class WanAttentionBlock(nn.Module):
         # self-attention
         y = self.self_attn(
             self.norm1(x) * (1 + e[1]) + e[0],
-            freqs)
+            freqs, transformer_options=transformer_options)
 
         x = x + y * e[2]
 
@@ -407,9 +409,13 @@ class WanModel(torch.nn.Module):
             List[Tensor]:
                 List of denoised video tensors with original input shapes [C_out, F, H / 8, W / 8]
         """
+        transformer_options = transformer_options.copy()
+        transformer_options["original_shape"] = list(x.shape)
+
         # embeddings
         x = self.patch_embedding(x.float()).to(x.dtype)
         grid_sizes = x.shape[2:]
+        transformer_options["token_grid"] = tuple(grid_sizes)
         x = x.flatten(2).transpose(1, 2)
 
         # time embeddings
@@ -430,12 +436,12 @@ class WanModel(torch.nn.Module):
             if ("double_block", i) in blocks_replace:
                 def block_wrap(args):
                     out = {}
-                    out["img"] = block(args["img"], context=args["txt"], e=args["vec"], freqs=args["pe"])
+                    out["img"] = block(args["img"], context=args["txt"], e=args["vec"], freqs=args["pe"], transformer_options=transformer_options)
                     return out
                 out = blocks_replace[("double_block", i)]({"img": x, "txt": context, "vec": e0, "pe": freqs}, {"original_block": block_wrap})
                 x = out["img"]
             else:
-                x = block(x, e=e0, freqs=freqs, context=context)
+                x = block(x, e=e0, freqs=freqs, context=context, transformer_options=transformer_options)
 
         # head
         x = self.head(x, e)
@@ -523,27 +523,23 @@ class WanVAE(nn.Module):
         self.clear_cache()
         return mu
 
-    def decode(self, z):
+    def decode_stream(self, z):
+        # z: [b,c,t,h,w], yields the frames decoded from each latent frame,
+        # the causal conv cache is carried from one latent frame to the next
         self.clear_cache()
-        # z: [b,c,t,h,w]
-
-        iter_ = z.shape[2]
-        x = self.conv2(z)
-        for i in range(iter_):
-            self._conv_idx = [0]
-            if i == 0:
-                out = self.decoder(
-                    x[:, :, i:i + 1, :, :],
-                    feat_cache=self._feat_map,
-                    feat_idx=self._conv_idx)
-            else:
-                out_ = self.decoder(
+        try:
+            x = self.conv2(z)
+            for i in range(z.shape[2]):
+                self._conv_idx = [0]
+                yield self.decoder(
                     x[:, :, i:i + 1, :, :],
                     feat_cache=self._feat_map,
                     feat_idx=self._conv_idx)
-                out = torch.cat([out, out_], 2)
-        self.clear_cache()
-        return out
+        finally:
+            self.clear_cache()
+
+    def decode(self, z):
+        return torch.cat(list(self.decode_stream(z)), 2)
 
     def reparameterize(self, mu, log_var):
         std = torch.exp(0.5 * log_var)
@@ -461,6 +461,40 @@ def pad_tensor_to_shape(tensor: torch.Tensor, new_shape: list[int]) -> torch.Ten
 
     return padded_tensor
 
+def is_linear_patch(patch) -> bool:
+    """
+    True if what the patch adds to a weight is proportional to its strength and doesn't depend on the weight,
+    so it can be calculated once and rescaled.
+    """
+    strength_model, v, function = patch[2], patch[1], patch[4]
+    if strength_model != 1.0 or function is not None or isinstance(v, list):
+        return False
+    if len(v) == 1:
+        return True
+    patch_type, v = v
+    if patch_type == "diff":
+        return not (len(v) > 1 and v[1]['pad_weight'])
+    if patch_type == "lora":
+        return v[4] is None and v[5] is None
+    if patch_type == "lokr":
+        return v[8] is None
+    if patch_type == "loha":
+        return v[7] is None
+    return False
+
+def changes_shape(patch) -> bool:
+    """True if applying the patch can change the shape of the weight."""
+    v = patch[1]
+    if isinstance(v, list) or len(v) == 1:
+        return False
+    patch_type, v = v
+    if patch_type == "diff":
+        return len(v) > 1 and v[1]['pad_weight']
+    if patch_type == "lora":
+        return v[5] is not None
+    return False
+
+
 def calculate_weight(patches, weight, key, intermediate_dtype=torch.float32, original_weights=None):
     for p in patches:
         strength = p[0]
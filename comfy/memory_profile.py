@@ -0,0 +1,172 @@
+"""
+Measured inference memory of the diffusion models.
+
+The first time a model runs on a CUDA device with an input shape that wasn't seen before, the peak
+memory allocated during the call is recorded per model, dtype, attention backend, resolution and
+batch size. memory_required then estimates the memory of a shape from these measurements instead of
+a hand tuned formula, the profiles are persisted so they are reused by the next runs.
+"""
+from __future__ import annotations
+
+import os
+import json
+import math
+import logging
+import threading
+import contextlib
+from typing import Optional
+
+import torch
+
+import comfy.attention_autotune
+
+CACHE_VERSION = 1
+# measured batch sizes kept per resolution
+MAX_BATCH_POINTS = 8
+
+
+def resolution_key(resolution) -> str:
+    return "x".join(str(int(r)) for r in resolution)
+
+
+def batch_estimate(points: dict[str, int], batch: int) -> float:
+    """Memory of a batch size from the measurements of other batch sizes of the same resolution, never below what was measured for a smaller batch."""
+    measured = sorted((int(b), m) for b, m in points.items())
+    for i, (b, m) in enumerate(measured):
+        if b == batch:
+            return m
+        if b > batch:
+            if i == 0:
+                return m
+            b0, m0 = measured[i - 1]
+            return m0 + (m - m0) * (batch - b0) / (b - b0)
+    # bigger than every measurement, a proportional estimate is an upper bound of the linear one
+    b, m = measured[-1]
+    return m * batch / b
+
+
+class MemoryProfiles:
+    """
+    Peak memory measurements keyed by a model key then by resolution then by batch size. Without a
+    path the profiles only live in memory.
+    """
+    def __init__(self, path: str | None = None):
+        self.lock = threading.Lock()
+        self.path = None
+        self.entries: dict[str, dict[str, dict[str, int]]] = {}
+        self.file_mtime = None
+        if path is not None:
+            self.set_path(path)
+
+    def set_path(self, path: str | None) -> None:
+        with self.lock:
+            self.path = path
+            self.file_mtime = None
+            self.reload()
+
+    def reload(self) -> None:
+        """Picks up entries written by other processes. Must be called with the lock held."""
+        if self.path is None:
+            return
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self.file_mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable memory profiles {self.path}: {e}")
+            return
+        self.file_mtime = mtime
+        if data.get("version") == CACHE_VERSION:
+            for key, resolutions in data.get("entries", {}).items():
+                for resolution, points in resolutions.items():
+                    known = self.entries.setdefault(key, {}).setdefault(resolution, {})
+                    for batch, memory in points.items():
+                        known[batch] = max(known.get(batch, 0), memory)
+
+    def save(self) -> None:
+        """Must be called with the lock held."""
+        if self.path is None:
+            return
+        data = {"version": CACHE_VERSION, "entries": self.entries}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self.file_mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            logging.warning(f"Failed to write memory profiles {self.path}: {e}")
+
+    def is_measured(self, key: str, input_shape) -> bool:
+        points = self.entries.get(key, {}).get(resolution_key(input_shape[2:]), {})
+        return str(int(input_shape[0])) in points or len(points) >= MAX_BATCH_POINTS
+
+    def record(self, key: str, input_shape, memory: int) -> None:
+        with self.lock:
+            self.reload()
+            points = self.entries.setdefault(key, {}).setdefault(resolution_key(input_shape[2:]), {})
+            batch = str(int(input_shape[0]))
+            points[batch] = max(points.get(batch, 0), int(memory))
+            self.save()
+
+    def estimate(self, key: str, input_shape) -> Optional[float]:
+        """
+        Estimated memory of running the model on input_shape, None when there is nothing to estimate it from.
+        Unmeasured resolutions are interpolated on their area between the closest measured ones, a measured
+        bigger resolution alone gives an upper bound.
+        """
+        batch = int(input_shape[0])
+        resolution = input_shape[2:]
+        with self.lock:
+            profiles = self.entries.get(key)
+            if profiles is None:
+                return None
+            points = profiles.get(resolution_key(resolution))
+            if points:
+                return batch_estimate(points, batch)
+
+            area = math.prod(resolution)
+            below = above = None
+            for r, p in profiles.items():
+                dims = [int(d) for d in r.split("x")]
+                if len(dims) != len(resolution) or len(p) == 0:
+                    continue
+                a = math.prod(dims)
+                if a < area and (below is None or a > below[0]):
+                    below = (a, p)
+                if a > area and (above is None or a < above[0]):
+                    above = (a, p)
+
+            if above is None:
+                return None
+            high = batch_estimate(above[1], batch)
+            if below is None:
+                return high
+            low = batch_estimate(below[1], batch)
+            return low + (high - low) * (area - below[0]) / (above[0] - below[0])
+
+    @contextlib.contextmanager
+    def measure(self, key: str, input_shape, device: torch.device):
+        """Records the peak memory allocated in the block when this shape wasn't measured yet, only CUDA devices report it."""
+        if device.type != "cuda" or self.is_measured(key, input_shape):
+            yield
+            return
+        tuned = comfy.attention_autotune.attention_tuner.tuned
+        torch.cuda.synchronize(device)
+        start = torch.cuda.memory_allocated(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        yield
+        # the attention benchmarks run every backend, the peak isn't the one of a normal run
+        if comfy.attention_autotune.attention_tuner.tuned != tuned:
+            return
+        torch.cuda.synchronize(device)
+        self.record(key, input_shape, torch.cuda.max_memory_allocated(device) - start)
+
+
+memory_profiles = MemoryProfiles()
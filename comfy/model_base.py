@@ -19,26 +19,14 @@
 import torch
 import logging
 from comfy.ldm.modules.diffusionmodules.openaimodel import UNetModel, Timestep
-from comfy.ldm.cascade.stage_c import StageC
-from comfy.ldm.cascade.stage_b import StageB
 from comfy.ldm.modules.encoders.noise_aug_modules import CLIPEmbeddingNoiseAugmentation
 from comfy.ldm.modules.diffusionmodules.upscaling import ImageConcatWithNoiseAugmentation
 from comfy.ldm.modules.diffusionmodules.mmdit import OpenAISignatureMMDITWrapper
-import comfy.ldm.genmo.joint_model.asymm_models_joint
-import comfy.ldm.aura.mmdit
-import comfy.ldm.pixart.pixartms
-import comfy.ldm.hydit.models
-import comfy.ldm.audio.dit
-import comfy.ldm.audio.embedders
-import comfy.ldm.flux.model
-import comfy.ldm.lightricks.model
-import comfy.ldm.hunyuan_video.model
-import comfy.ldm.cosmos.model
-import comfy.ldm.lumina.model
-import comfy.ldm.wan.model
-import comfy.ldm.hunyuan3d.model
 
 import comfy.model_management
+import comfy.memory_profile
+import comfy.cli_args
+import comfy.ldm.modules.attention
 import comfy.patcher_extension
 import comfy.conds
 import comfy.ops
@@ -167,7 +155,8 @@ class BaseModel(torch.nn.Module):
             extra_conds[o] = extra
 
         t = self.process_timestep(t, x=x, **extra_conds)
-        model_output = self.diffusion_model(xc, t, context=context, control=control, transformer_options=transformer_options, **extra_conds).float()
+        with comfy.memory_profile.memory_profiles.measure(self.memory_profile_key(), x.shape, x.device):
+            model_output = self.diffusion_model(xc, t, context=context, control=control, transformer_options=transformer_options, **extra_conds).float()
         return self.model_sampling.calculate_denoised(sigma, model_output, x)
 
     def process_timestep(self, timestep, **kwargs):
@@ -283,7 +272,7 @@ class BaseModel(torch.nn.Module):
     def process_latent_out(self, latent):
         return self.latent_format.process_out(latent)
 
-    def state_dict_for_saving(self, clip_state_dict=None, vae_state_dict=None, clip_vision_state_dict=None):
+    def state_dict_for_saving(self, clip_state_dict=None, vae_state_dict=None, clip_vision_state_dict=None, unet_state_dict=None):
         extra_sds = []
         if clip_state_dict is not None:
             extra_sds.append(self.model_config.process_clip_state_dict_for_saving(clip_state_dict))
@@ -292,7 +281,8 @@ class BaseModel(torch.nn.Module):
         if clip_vision_state_dict is not None:
             extra_sds.append(self.model_config.process_clip_vision_state_dict_for_saving(clip_vision_state_dict))
 
-        unet_state_dict = self.diffusion_model.state_dict()
+        if unet_state_dict is None:
+            unet_state_dict = self.diffusion_model.state_dict()
 
         if self.model_config.scaled_fp8 is not None:
             unet_state_dict["scaled_fp8"] = torch.tensor([], dtype=self.model_config.scaled_fp8)
@@ -322,7 +312,27 @@ class BaseModel(torch.nn.Module):
     def scale_latent_inpaint(self, sigma, noise, latent_image, **kwargs):
         return self.model_sampling.noise_scaling(sigma.reshape([sigma.shape[0]] + [1] * (len(noise.shape) - 1)), noise, latent_image)
 
+    def memory_profile_key(self):
+        dtype = self.get_dtype()
+        if self.manual_cast_dtype is not None:
+            dtype = self.manual_cast_dtype
+        # one config class can cover models of very different sizes, like Wan 1.3B and 14B
+        parameters = getattr(self, "memory_profile_parameters", None)
+        if parameters is None:
+            diffusion_model = getattr(self, "diffusion_model", None)
+            parameters = self.memory_profile_parameters = 0 if diffusion_model is None else sum(p.numel() for p in diffusion_model.parameters())
+        # the tuner picks a backend per attention shape, so a profile measured with it covers its picks
+        if comfy.cli_args.args.attention_autotune:
+            attention = "autotune"
+        else:
+            attention = comfy.ldm.modules.attention.optimized_attention.__name__
+        return "{}|{}|{}|{}".format(type(self.model_config).__name__, str(dtype).split(".")[-1], attention, parameters)
+
     def memory_required(self, input_shape):
+        measured = comfy.memory_profile.memory_profiles.estimate(self.memory_profile_key(), input_shape)
+        if measured is not None:
+            return measured
+
         if comfy.model_management.xformers_enabled() or comfy.model_management.pytorch_attention_flash_attention():
             dtype = self.get_dtype()
             if self.manual_cast_dtype is not None:
@@ -621,6 +631,7 @@ class Lotus(BaseModel):
 
 class StableCascade_C(BaseModel):
     def __init__(self, model_config, model_type=ModelType.STABLE_CASCADE, device=None):
+        from comfy.ldm.cascade.stage_c import StageC
         super().__init__(model_config, model_type, device=device, unet_model=StageC)
         self.diffusion_model.eval().requires_grad_(False)
 
@@ -650,6 +661,7 @@ class StableCascade_C(BaseModel):
 
 class StableCascade_B(BaseModel):
     def __init__(self, model_config, model_type=ModelType.STABLE_CASCADE, device=None):
+        from comfy.ldm.cascade.stage_b import StageB
         super().__init__(model_config, model_type, device=device, unet_model=StageB)
         self.diffusion_model.eval().requires_grad_(False)
 
@@ -686,6 +698,7 @@ class SD3(BaseModel):
 
 class AuraFlow(BaseModel):
     def __init__(self, model_config, model_type=ModelType.FLOW, device=None):
+        import comfy.ldm.aura.mmdit
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.aura.mmdit.MMDiT)
 
     def extra_conds(self, **kwargs):
@@ -698,6 +711,8 @@ class AuraFlow(BaseModel):
 
 class StableAudio1(BaseModel):
     def __init__(self, model_config, seconds_start_embedder_weights, seconds_total_embedder_weights, model_type=ModelType.V_PREDICTION_CONTINUOUS, device=None):
+        import comfy.ldm.audio.dit
+        import comfy.ldm.audio.embedders
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.audio.dit.AudioDiffusionTransformer)
         self.seconds_start_embedder = comfy.ldm.audio.embedders.NumberConditioner(768, min_val=0, max_val=512)
         self.seconds_total_embedder = comfy.ldm.audio.embedders.NumberConditioner(768, min_val=0, max_val=512)
@@ -725,8 +740,8 @@ class StableAudio1(BaseModel):
             out['c_crossattn'] = comfy.conds.CONDRegular(cross_attn)
         return out
 
-    def state_dict_for_saving(self, clip_state_dict=None, vae_state_dict=None, clip_vision_state_dict=None):
-        sd = super().state_dict_for_saving(clip_state_dict=clip_state_dict, vae_state_dict=vae_state_dict, clip_vision_state_dict=clip_vision_state_dict)
+    def state_dict_for_saving(self, clip_state_dict=None, vae_state_dict=None, clip_vision_state_dict=None, unet_state_dict=None):
+        sd = super().state_dict_for_saving(clip_state_dict=clip_state_dict, vae_state_dict=vae_state_dict, clip_vision_state_dict=clip_vision_state_dict, unet_state_dict=unet_state_dict)
         d = {"conditioner.conditioners.seconds_start.": self.seconds_start_embedder.state_dict(), "conditioner.conditioners.seconds_total.": self.seconds_total_embedder.state_dict()}
         for k in d:
             s = d[k]
@@ -737,6 +752,7 @@ class StableAudio1(BaseModel):
 
 class HunyuanDiT(BaseModel):
     def __init__(self, model_config, model_type=ModelType.V_PREDICTION, device=None):
+        import comfy.ldm.hydit.models
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.hydit.models.HunYuanDiT)
 
     def extra_conds(self, **kwargs):
@@ -767,6 +783,7 @@ class HunyuanDiT(BaseModel):
 
 class PixArt(BaseModel):
     def __init__(self, model_config, model_type=ModelType.EPS, device=None):
+        import comfy.ldm.pixart.pixartms
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.pixart.pixartms.PixArtMS)
 
     def extra_conds(self, **kwargs):
@@ -786,6 +803,7 @@ class PixArt(BaseModel):
 
 class Flux(BaseModel):
     def __init__(self, model_config, model_type=ModelType.FLUX, device=None):
+        import comfy.ldm.flux.model
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.flux.model.Flux)
 
     def concat_cond(self, **kwargs):
@@ -851,6 +869,7 @@ class Flux(BaseModel):
 
 class GenmoMochi(BaseModel):
     def __init__(self, model_config, model_type=ModelType.FLOW, device=None):
+        import comfy.ldm.genmo.joint_model.asymm_models_joint
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.genmo.joint_model.asymm_models_joint.AsymmDiTJoint)
 
     def extra_conds(self, **kwargs):
@@ -866,6 +885,7 @@ class GenmoMochi(BaseModel):
 
 class LTXV(BaseModel):
     def __init__(self, model_config, model_type=ModelType.FLUX, device=None):
+        import comfy.ldm.lightricks.model
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.lightricks.model.LTXVModel) #TODO
 
     def extra_conds(self, **kwargs):
@@ -899,6 +919,7 @@ class LTXV(BaseModel):
 
 class HunyuanVideo(BaseModel):
     def __init__(self, model_config, model_type=ModelType.FLOW, device=None):
+        import comfy.ldm.hunyuan_video.model
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.hunyuan_video.model.HunyuanVideo)
 
     def encode_adm(self, **kwargs):
@@ -944,6 +965,7 @@ class HunyuanVideoSkyreelsI2V(HunyuanVideo):
 
 class CosmosVideo(BaseModel):
     def __init__(self, model_config, model_type=ModelType.EDM, image_to_video=False, device=None):
+        import comfy.ldm.cosmos.model
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.cosmos.model.GeneralDIT)
         self.image_to_video = image_to_video
         if self.image_to_video:
@@ -971,6 +993,7 @@ class CosmosVideo(BaseModel):
 
 class Lumina2(BaseModel):
     def __init__(self, model_config, model_type=ModelType.FLOW, device=None):
+        import comfy.ldm.lumina.model
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.lumina.model.NextDiT)
 
     def extra_conds(self, **kwargs):
@@ -987,6 +1010,7 @@ class Lumina2(BaseModel):
 
 class WAN21(BaseModel):
     def __init__(self, model_config, model_type=ModelType.FLOW, image_to_video=False, device=None):
+        import comfy.ldm.wan.model
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.wan.model.WanModel)
         self.image_to_video = image_to_video
 
@@ -1034,6 +1058,7 @@ class WAN21(BaseModel):
 
 class Hunyuan3Dv2(BaseModel):
     def __init__(self, model_config, model_type=ModelType.FLOW, device=None):
+        import comfy.ldm.hunyuan3d.model
         super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.hunyuan3d.model.Hunyuan3Dv2)
 
     def extra_conds(self, **kwargs):
@@ -1,4 +1,5 @@
 import json
+import comfy.model_detection_cache
 import comfy.supported_models
 import comfy.supported_models_base
 import comfy.utils
@@ -472,13 +473,29 @@ def model_config_from_unet_config(unet_config, state_dict=None):
     logging.error("no match {}".format(unet_config))
     return None
 
-def model_config_from_unet(state_dict, unet_key_prefix, use_base_if_no_match=False, metadata=None):
-    unet_config = detect_unet_config(state_dict, unet_key_prefix, metadata=metadata)
-    if unet_config is None:
-        return None
-    model_config = model_config_from_unet_config(unet_config, state_dict)
-    if model_config is None and use_base_if_no_match:
-        model_config = comfy.supported_models_base.BASE(unet_config)
+def model_config_from_name(name, unet_config):
+    for model_config in comfy.supported_models.models:
+        if model_config.__name__ == name:
+            return model_config(unet_config)
+    return None
+
+def model_config_from_unet(state_dict, unet_key_prefix, use_base_if_no_match=False, metadata=None, cache_key=None):
+    #cache_key identifies the file the state dict was loaded from, see comfy.model_detection_cache
+    cache_kind = "unet:{}".format(unet_key_prefix)
+    model_config = None
+    cached = comfy.model_detection_cache.detection_cache.get(cache_key, cache_kind)
+    if cached is not None:
+        model_config = model_config_from_name(cached["model_config"], cached["unet_config"])
+
+    if model_config is None:
+        unet_config = detect_unet_config(state_dict, unet_key_prefix, metadata=metadata)
+        if unet_config is None:
+            return None
+        model_config = model_config_from_unet_config(unet_config, state_dict)
+        if model_config is not None:
+            comfy.model_detection_cache.detection_cache.set(cache_key, cache_kind, {"model_config": type(model_config).__name__, "unet_config": unet_config})
+        elif use_base_if_no_match:
+            model_config = comfy.supported_models_base.BASE(unet_config)
 
     scaled_fp8_key = "{}scaled_fp8".format(unet_key_prefix)
     if scaled_fp8_key in state_dict:
@@ -0,0 +1,155 @@
+"""
+Persistent cache of model detection results.
+
+Detecting the architecture of a checkpoint scans the keys and shapes of its state dict. For
+safetensors files everything the detection looks at is described by the header, so the result
+is stored keyed by a hash of the header and reused on the next load of the same file, by any
+process that shares the cache file. The detection code can change between versions so the file
+is dropped when it was written by another ComfyUI version.
+"""
+from __future__ import annotations
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+import torch
+
+import comfy.utils
+import comfyui_version
+
+CACHE_VERSION = 1
+
+
+def encode_value(value):
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_value(v) for v in value]}
+    if isinstance(value, list):
+        return [encode_value(v) for v in value]
+    if isinstance(value, dict):
+        return {k: encode_value(v) for k, v in value.items()}
+    if isinstance(value, torch.dtype):
+        return {"__dtype__": str(value).split(".")[-1]}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError("can't cache value of type {}".format(type(value)))
+
+
+def decode_value(value):
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    if isinstance(value, dict):
+        if "__tuple__" in value:
+            return tuple(decode_value(v) for v in value["__tuple__"])
+        if "__dtype__" in value:
+            return getattr(torch, value["__dtype__"])
+        return {k: decode_value(v) for k, v in value.items()}
+    return value
+
+
+class ModelDetectionCache:
+    """
+    Maps the header hash of a safetensors file to what was detected from it. Without a path
+    the cache only lives in memory.
+    """
+    def __init__(self, path: str | None = None):
+        self.lock = threading.Lock()
+        self.path = None
+        self.entries: dict[str, dict] = {}
+        self.file_mtime = None
+        self.file_keys: dict[str, tuple] = {}
+        if path is not None:
+            self.set_path(path)
+
+    def set_path(self, path: str | None) -> None:
+        with self.lock:
+            self.path = path
+            self.file_mtime = None
+            self.reload()
+
+    def reload(self) -> None:
+        """Picks up entries written by other processes. Must be called with the lock held."""
+        if self.path is None:
+            return
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self.file_mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable model detection cache {self.path}: {e}")
+            return
+        self.file_mtime = mtime
+        if data.get("version") != CACHE_VERSION or data.get("comfyui_version") != comfyui_version.__version__:
+            logging.info("Model detection cache was written by another ComfyUI version, ignoring it.")
+            return
+        self.entries.update(data.get("entries", {}))
+
+    def file_key(self, file_path: str) -> str | None:
+        """Returns the cache key of a safetensors file or None if the file can't be cached."""
+        if not (file_path.lower().endswith(".safetensors") or file_path.lower().endswith(".sft")):
+            return None
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        stamp = (st.st_size, st.st_mtime_ns)
+        known = self.file_keys.get(file_path)
+        if known is not None and known[0] == stamp:
+            return known[1]
+
+        try:
+            header = comfy.utils.safetensors_header(file_path)
+        except (OSError, ValueError):
+            return None
+        if header is None:
+            return None
+        key = hashlib.sha256(header).hexdigest()
+        self.file_keys[file_path] = (stamp, key)
+        return key
+
+    def get(self, key: str | None, kind: str) -> dict | None:
+        if key is None:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.reload()
+                entry = self.entries.get(key)
+        if entry is None or kind not in entry:
+            return None
+        return decode_value(entry[kind])
+
+    def set(self, key: str | None, kind: str, value: dict) -> None:
+        if key is None:
+            return
+        try:
+            value = encode_value(value)
+        except TypeError as e:
+            logging.debug(f"Not caching model detection result: {e}")
+            return
+
+        with self.lock:
+            self.reload()
+            self.entries.setdefault(key, {})[kind] = value
+            if self.path is None:
+                return
+            data = {"version": CACHE_VERSION, "comfyui_version": comfyui_version.__version__, "entries": self.entries}
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+                self.file_mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                logging.warning(f"Failed to write model detection cache {self.path}: {e}")
+
+
+detection_cache = ModelDetectionCache()
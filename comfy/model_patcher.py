@@ -198,6 +198,75 @@ class MemoryCounter:
     def decrement(self, used: int):
         self.value -= used
 
+# fraction of the model size the hook deltas of a model patcher can take
+HOOK_DELTA_CACHE_RATIO = 0.25
+
+class HookDeltaCache:
+    '''
+    LRU cache of the weight deltas of hooks, keyed by (hook_ref, weight key). A delta is what the patches of one hook
+    add to a weight at strength 1.0, so a keyframe changing the strength of a hook only rescales it.
+
+    Bounded by max_bytes if set, the least recently used deltas are evicted to make room.
+    '''
+    def __init__(self, max_bytes: int=None):
+        self.max_bytes = max_bytes
+        self.deltas: collections.OrderedDict[tuple, torch.Tensor] = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def get(self, key: tuple):
+        delta = self.deltas.get(key, None)
+        if delta is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.deltas.move_to_end(key)
+        return delta
+
+    def put(self, key: tuple, delta: torch.Tensor):
+        delta_size = delta.nelement() * delta.element_size()
+        self.remove(key)
+        if self.max_bytes is not None and delta_size > self.max_bytes:
+            self.rejected += 1
+            return False
+        while len(self.deltas) > 0 and self.max_bytes is not None and self.size + delta_size > self.max_bytes:
+            self.pop(next(iter(self.deltas)))
+            self.evictions += 1
+        self.deltas[key] = delta
+        self.size += delta_size
+        return True
+
+    def pop(self, key: tuple):
+        delta = self.deltas.pop(key)
+        delta_size = delta.nelement() * delta.element_size()
+        self.size -= delta_size
+        return delta_size
+
+    def remove(self, key: tuple):
+        if key in self.deltas:
+            self.pop(key)
+
+    def remove_hook(self, hook_ref):
+        for key in [k for k in self.deltas if k[0] == hook_ref]:
+            self.pop(key)
+
+    def clear(self):
+        self.deltas.clear()
+        self.size = 0
+
+    def copy(self):
+        n = HookDeltaCache(self.max_bytes)
+        n.deltas = self.deltas.copy()
+        n.size = self.size
+        return n
+
+    def stats(self):
+        return {"entries": len(self.deltas), "bytes": self.size, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "rejected": self.rejected}
+
 class ModelPatcher:
     def __init__(self, model, load_device, offload_device, size=0, weight_inplace_update=False):
         self.size = size
@@ -235,6 +304,7 @@ class ModelPatcher:
         self.hook_patches_backup: dict[comfy.hooks._HookRef] = None
         self.hook_backup: dict[str, tuple[torch.Tensor, torch.device]] = {}
         self.cached_hook_patches: dict[comfy.hooks.HookGroup, dict[str, torch.Tensor]] = {}
+        self.hook_delta_cache = HookDeltaCache()
         self.current_hooks: Optional[comfy.hooks.HookGroup] = None
         self.forced_hooks: Optional[comfy.hooks.HookGroup] = None  # NOTE: only used for CLIP at this time
         self.is_clip = False
@@ -312,6 +382,7 @@ class ModelPatcher:
             n.cached_hook_patches[group] = {}
             for k in self.cached_hook_patches[group]:
                 n.cached_hook_patches[group][k] = self.cached_hook_patches[group][k]
+        n.hook_delta_cache = self.hook_delta_cache.copy()
         n.hook_backup = self.hook_backup
         n.current_hooks = self.current_hooks.clone() if self.current_hooks else self.current_hooks
         n.forced_hooks = self.forced_hooks.clone() if self.forced_hooks else self.forced_hooks
@@ -531,6 +602,48 @@ class ModelPatcher:
                 p[k] = [(weight, convert_func)]
         return p
 
+    def patched_weight(self, key, device=None):
+        """The weight of key with the patches applied, calculated on device without patching the model."""
+        weight, set_func, convert_func = get_key_weight(self.model, key)
+        bk = self.backup.get(key, None)
+        hbk = self.hook_backup.get(key, None)
+        if bk is not None:
+            weight = bk.weight
+        if hbk is not None:
+            weight = hbk[0]
+        if key not in self.patches:
+            return weight
+
+        if device is None:
+            device = self.load_device
+        temp_weight = comfy.model_management.cast_to_device(weight, device, torch.float32, copy=True)
+        if convert_func is not None:
+            temp_weight = convert_func(temp_weight, inplace=True)
+
+        out_weight = comfy.lora.calculate_weight(self.patches[key], temp_weight, key)
+        if set_func is None:
+            return comfy.float.stochastic_rounding(out_weight, weight.dtype, seed=string_to_seed(key))
+        # set functions store the weight they convert in the model so it gets put back right away
+        current = comfy.utils.get_attr(self.model, key)
+        set_func(out_weight, inplace_update=False, seed=string_to_seed(key))
+        return comfy.utils.set_attr(self.model, key, current).data
+
+    def lazy_state_dict(self, filter_prefix=None, device=None):
+        """
+        State dict of the model with the patches applied. Patched weights are LazyTensors that calculate one weight at
+        a time on device when loaded, so it can be saved without patching the whole model.
+        """
+        sd = self.model_state_dict(filter_prefix=filter_prefix)
+        for k in sd:
+            if k not in self.patches:
+                if k in self.hook_backup:
+                    sd[k] = self.hook_backup[k][0]
+            elif any(comfy.lora.changes_shape(p) for p in self.patches[k]):
+                sd[k] = self.patched_weight(k, device).to(self.offload_device)
+            else:
+                sd[k] = comfy.utils.LazyTensor(sd[k].shape, sd[k].dtype, lambda k=k: self.patched_weight(k, device))
+        return sd
+
     def model_state_dict(self, filter_prefix=None):
         with self.use_ejected():
             sd = self.model.state_dict()
@@ -1060,6 +1173,7 @@ class ModelPatcher:
                     current_patches.append((strength_patch, patches[k], strength_model, offset, function))
                     current_hook_patches[key] = current_patches
             self.hook_patches[hook.hook_ref] = current_hook_patches
+            self.hook_delta_cache.remove_hook(hook.hook_ref)
             # since should care about these patches too to determine if same model, reroll patches_uuid
             self.patches_uuid = uuid.uuid4()
             return list(p)
@@ -1101,6 +1215,7 @@ class ModelPatcher:
                     # TODO: minimum_counter should have a minimum that conforms to loaded model requirements
                     memory_counter = MemoryCounter(initial=comfy.model_management.get_free_memory(self.load_device),
                                                 minimum=comfy.model_management.minimum_inference_memory()*2)
+                    self.hook_delta_cache.max_bytes = int(self.model_size() * HOOK_DELTA_CACHE_RATIO)
                 # if have cached weights for hooks, use it
                 cached_weights = self.cached_hook_patches.get(hooks, None)
                 if cached_weights is not None:
@@ -1112,18 +1227,20 @@ class ModelPatcher:
                         self.patch_cached_hook_weights(cached_weights=cached_weights, key=key, memory_counter=memory_counter)
                         model_sd_keys_set.remove(key)
                     self.unpatch_hooks(model_sd_keys_set)
+                    # the weights served from the hook delta cache are not cached as full weights
+                    relevant_patches = {k: v for k, v in self.get_combined_hook_patches(hooks=hooks).items() if k not in cached_weights}
                 else:
                     self.unpatch_hooks()
                     relevant_patches = self.get_combined_hook_patches(hooks=hooks)
-                    original_weights = None
-                    if len(relevant_patches) > 0:
-                        original_weights = self.get_key_patches()
-                    for key in relevant_patches:
-                        if key not in model_sd_keys:
-                            logging.warning(f"Cached hook would not patch. Key does not exist in model: {key}")
-                            continue
-                        self.patch_hook_weight_to_device(hooks=hooks, combined_patches=relevant_patches, key=key, original_weights=original_weights,
-                                                            memory_counter=memory_counter)
+                original_weights = None
+                if len(relevant_patches) > 0:
+                    original_weights = self.get_key_patches()
+                for key in relevant_patches:
+                    if key not in model_sd_keys:
+                        logging.warning(f"Cached hook would not patch. Key does not exist in model: {key}")
+                        continue
+                    self.patch_hook_weight_to_device(hooks=hooks, combined_patches=relevant_patches, key=key, original_weights=original_weights,
+                                                        memory_counter=memory_counter)
             else:
                 self.unpatch_hooks()
             self.current_hooks = hooks
@@ -1141,6 +1258,9 @@ class ModelPatcher:
 
     def clear_cached_hook_weights(self):
         self.cached_hook_patches.clear()
+        if len(self.hook_delta_cache.deltas) > 0:
+            logging.debug("Hook delta cache: {}".format(self.hook_delta_cache.stats()))
+        self.hook_delta_cache.clear()
         self.patch_hooks(None)
 
     def patch_hook_weight_to_device(self, hooks: comfy.hooks.HookGroup, combined_patches: dict, key: str, original_weights: dict, memory_counter: MemoryCounter):
@@ -1161,16 +1281,21 @@ class ModelPatcher:
         if convert_func is not None:
             temp_weight = convert_func(temp_weight, inplace=True)
 
-        out_weight = comfy.lora.calculate_weight(combined_patches[key],
-                                                 temp_weight,
-                                                 key, original_weights=original_weights)
+        out_weight = None
+        from_delta_cache = False
+        if self.hook_mode == comfy.hooks.EnumHookMode.MaxSpeed and set_func is None:
+            out_weight, from_delta_cache = self.calculate_hook_weight_from_deltas(hooks, key, temp_weight, weight.dtype, original_weights)
+        if out_weight is None:
+            out_weight = comfy.lora.calculate_weight(combined_patches[key],
+                                                     temp_weight,
+                                                     key, original_weights=original_weights)
         del original_weights[key]
         if set_func is None:
             out_weight = comfy.float.stochastic_rounding(out_weight, weight.dtype, seed=string_to_seed(key))
             comfy.utils.copy_to_param(self.model, key, out_weight)
         else:
             set_func(out_weight, inplace_update=True, seed=string_to_seed(key))
-        if self.hook_mode == comfy.hooks.EnumHookMode.MaxSpeed:
+        if self.hook_mode == comfy.hooks.EnumHookMode.MaxSpeed and not from_delta_cache:
             # TODO: disable caching if not enough system RAM to do so
             target_device = self.offload_device
             used = memory_counter.use(weight)
@@ -1182,6 +1307,39 @@ class ModelPatcher:
         del out_weight
         del weight
 
+    def calculate_hook_weight_from_deltas(self, hooks: comfy.hooks.HookGroup, key: str, weight: torch.Tensor, weight_dtype: torch.dtype,
+                                          original_weights: dict):
+        '''
+        Hooked weight as the original weight plus the delta of every hook scaled by its current strength, deltas are
+        calculated once and kept in hook_delta_cache on the offload device. Returns the weight and whether all its
+        deltas are in the cache, or None if a patch is not linear in its strength.
+        '''
+        hook_patches = []
+        for hook in hooks.hooks:
+            patches = self.hook_patches.get(hook.hook_ref, {}).get(key, None)
+            if patches is None:
+                continue
+            if not all(comfy.lora.is_linear_patch(p) for p in patches):
+                return None, False
+            hook_patches.append((hook, patches))
+
+        deltas = []
+        cached = True
+        for hook, patches in hook_patches:
+            if hook.strength == 0.0:
+                continue
+            delta = self.hook_delta_cache.get((hook.hook_ref, key))
+            if delta is None:
+                delta = comfy.lora.calculate_weight(patches, weight.clone(), key, original_weights=original_weights)
+                delta -= weight
+                # kept in the dtype of the weight, fp8 would lose too much precision
+                delta = delta.to(device=self.offload_device, dtype=torch.bfloat16 if comfy.model_management.dtype_size(weight_dtype) < 2 else weight_dtype)
+                cached = self.hook_delta_cache.put((hook.hook_ref, key), delta) and cached
+            deltas.append((hook.strength, delta))
+        for strength, delta in deltas:
+            weight.add_(delta.to(weight.device), alpha=strength)
+        return weight, cached
+
     def unpatch_hooks(self, whitelist_keys_set: set[str]=None) -> None:
         with self.use_ejected():
             if len(self.hook_backup) == 0:
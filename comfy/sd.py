@@ -7,18 +7,11 @@ import logging
 from comfy import model_management
 from comfy.utils import ProgressBar
 from .ldm.models.autoencoder import AutoencoderKL, AutoencodingEngine
-from .ldm.cascade.stage_a import StageA
-from .ldm.cascade.stage_c_coder import StageC_coder
-from .ldm.audio.autoencoder import AudioOobleckVAE
-import comfy.ldm.genmo.vae.model
-import comfy.ldm.lightricks.vae.causal_video_autoencoder
-import comfy.ldm.cosmos.vae
-import comfy.ldm.wan.vae
-import comfy.ldm.hunyuan3d.vae
 import yaml
 import math
 
 import comfy.utils
+import comfy.model_detection_cache
 
 from . import clip_vision
 from . import gligen
@@ -27,20 +20,6 @@ from . import model_detection
 
 from . import sd1_clip
 from . import sdxl_clip
-import comfy.text_encoders.sd2_clip
-import comfy.text_encoders.sd3_clip
-import comfy.text_encoders.sa_t5
-import comfy.text_encoders.aura_t5
-import comfy.text_encoders.pixart_t5
-import comfy.text_encoders.hydit
-import comfy.text_encoders.flux
-import comfy.text_encoders.long_clipl
-import comfy.text_encoders.genmo
-import comfy.text_encoders.lt
-import comfy.text_encoders.hunyuan_video
-import comfy.text_encoders.cosmos
-import comfy.text_encoders.lumina2
-import comfy.text_encoders.wan
 
 import comfy.model_patcher
 import comfy.lora
@@ -49,8 +28,6 @@ import comfy.hooks
 import comfy.t2i_adapter.adapter
 import comfy.taesd.taesd
 
-import comfy.ldm.flux.redux
-
 def load_lora_for_models(model, clip, lora, strength_model, strength_clip):
     key_map = {}
     if model is not None:
@@ -282,6 +259,7 @@ class VAE:
                 self.latent_channels = sd["taesd_decoder.1.weight"].shape[1]
                 self.first_stage_model = comfy.taesd.taesd.TAESD(latent_channels=self.latent_channels)
             elif "vquantizer.codebook.weight" in sd: #VQGan: stage a of stable cascade
+                from .ldm.cascade.stage_a import StageA
                 self.first_stage_model = StageA()
                 self.downscale_ratio = 4
                 self.upscale_ratio = 4
@@ -291,6 +269,7 @@ class VAE:
                 self.process_input = lambda image: image
                 self.process_output = lambda image: image
             elif "backbone.1.0.block.0.1.num_batches_tracked" in sd: #effnet: encoder for stage c latent of stable cascade
+                from .ldm.cascade.stage_c_coder import StageC_coder
                 self.first_stage_model = StageC_coder()
                 self.downscale_ratio = 32
                 self.latent_channels = 16
@@ -299,6 +278,7 @@ class VAE:
                     new_sd["encoder.{}".format(k)] = sd[k]
                 sd = new_sd
             elif "blocks.11.num_batches_tracked" in sd: #previewer: decoder for stage c latent of stable cascade
+                from .ldm.cascade.stage_c_coder import StageC_coder
                 self.first_stage_model = StageC_coder()
                 self.latent_channels = 16
                 new_sd = {}
@@ -306,6 +286,7 @@ class VAE:
                     new_sd["previewer.{}".format(k)] = sd[k]
                 sd = new_sd
             elif "encoder.backbone.1.0.block.0.1.num_batches_tracked" in sd: #combined effnet and previewer for stable cascade
+                from .ldm.cascade.stage_c_coder import StageC_coder
                 self.first_stage_model = StageC_coder()
                 self.downscale_ratio = 32
                 self.latent_channels = 16
@@ -326,6 +307,7 @@ class VAE:
                                                                 encoder_config={'target': "comfy.ldm.modules.diffusionmodules.model.Encoder", 'params': ddconfig},
                                                                 decoder_config={'target': "comfy.ldm.modules.diffusionmodules.model.Decoder", 'params': ddconfig})
             elif "decoder.layers.1.layers.0.beta" in sd:
+                from .ldm.audio.autoencoder import AudioOobleckVAE
                 self.first_stage_model = AudioOobleckVAE()
                 self.memory_used_encode = lambda shape, dtype: (1000 * shape[2]) * model_management.dtype_size(dtype)
                 self.memory_used_decode = lambda shape, dtype: (1000 * shape[2] * 2048) * model_management.dtype_size(dtype)
@@ -342,7 +324,8 @@ class VAE:
                     sd = comfy.utils.state_dict_prefix_replace(sd, {"": "decoder."})
                 if "layers.4.layers.1.attn_block.attn.qkv.weight" in sd:
                     sd = comfy.utils.state_dict_prefix_replace(sd, {"": "encoder."})
-                self.first_stage_model = comfy.ldm.genmo.vae.model.VideoVAE()
+                from .ldm.genmo.vae.model import VideoVAE
+                self.first_stage_model = VideoVAE()
                 self.latent_channels = 12
                 self.latent_dim = 3
                 self.memory_used_decode = lambda shape, dtype: (1000 * shape[2] * shape[3] * shape[4] * (6 * 8 * 8)) * model_management.dtype_size(dtype)
@@ -364,7 +347,8 @@ class VAE:
                 vae_config = None
                 if metadata is not None and "config" in metadata:
                     vae_config = json.loads(metadata["config"]).get("vae", None)
-                self.first_stage_model = comfy.ldm.lightricks.vae.causal_video_autoencoder.VideoVAE(version=version, config=vae_config)
+                from .ldm.lightricks.vae.causal_video_autoencoder import VideoVAE
+                self.first_stage_model = VideoVAE(version=version, config=vae_config)
                 self.latent_channels = 128
                 self.latent_dim = 3
                 self.memory_used_decode = lambda shape, dtype: (900 * shape[2] * shape[3] * shape[4] * (8 * 8 * 8)) * model_management.dtype_size(dtype)
@@ -396,7 +380,8 @@ class VAE:
                 self.latent_dim = 3
                 self.latent_channels = 16
                 ddconfig = {'z_channels': 16, 'latent_channels': self.latent_channels, 'z_factor': 1, 'resolution': 1024, 'in_channels': 3, 'out_channels': 3, 'channels': 128, 'channels_mult': [2, 4, 4], 'num_res_blocks': 2, 'attn_resolutions': [32], 'dropout': 0.0, 'patch_size': 4, 'num_groups': 1, 'temporal_compression': 8, 'spacial_compression': 8}
-                self.first_stage_model = comfy.ldm.cosmos.vae.CausalContinuousVideoTokenizer(**ddconfig)
+                from .ldm.cosmos.vae import CausalContinuousVideoTokenizer
+                self.first_stage_model = CausalContinuousVideoTokenizer(**ddconfig)
                 #TODO: these values are a bit off because this is not a standard VAE
                 self.memory_used_decode = lambda shape, dtype: (50 * shape[2] * shape[3] * shape[4] * (8 * 8 * 8)) * model_management.dtype_size(dtype)
                 self.memory_used_encode = lambda shape, dtype: (50 * (round((shape[2] + 7) / 8) * 8) * shape[3] * shape[4]) * model_management.dtype_size(dtype)
@@ -409,7 +394,8 @@ class VAE:
                 self.latent_dim = 3
                 self.latent_channels = 16
                 ddconfig = {"dim": 96, "z_dim": self.latent_channels, "dim_mult": [1, 2, 4, 4], "num_res_blocks": 2, "attn_scales": [], "temperal_downsample": [False, True, True], "dropout": 0.0}
-                self.first_stage_model = comfy.ldm.wan.vae.WanVAE(**ddconfig)
+                from .ldm.wan.vae import WanVAE
+                self.first_stage_model = WanVAE(**ddconfig)
                 self.working_dtypes = [torch.bfloat16, torch.float16, torch.float32]
                 self.memory_used_encode = lambda shape, dtype: 6000 * shape[3] * shape[4] * model_management.dtype_size(dtype)
                 self.memory_used_decode = lambda shape, dtype: 7000 * shape[3] * shape[4] * (8 * 8) * model_management.dtype_size(dtype)
@@ -422,7 +408,8 @@ class VAE:
                 self.memory_used_encode = lambda shape, dtype: (1000 * shape[2]) * model_management.dtype_size(dtype)  # TODO
                 self.memory_used_decode = lambda shape, dtype: (1024 * 1024 * 1024 * 2.0) * model_management.dtype_size(dtype)  # TODO
                 ddconfig = {"embed_dim": 64, "num_freqs": 8, "include_pi": False, "heads": 16, "width": 1024, "num_decoder_layers": 16, "qkv_bias": False, "qk_norm": True, "geo_decoder_mlp_expand_ratio": mlp_expand, "geo_decoder_downsample_ratio": downsample_ratio, "geo_decoder_ln_post": ln_post}
-                self.first_stage_model = comfy.ldm.hunyuan3d.vae.ShapeVAE(**ddconfig)
+                from .ldm.hunyuan3d.vae import ShapeVAE
+                self.first_stage_model = ShapeVAE(**ddconfig)
                 self.working_dtypes = [torch.float16, torch.bfloat16, torch.float32]
             else:
                 logging.warning("WARNING: No VAE weights detected, VAE not initalized.")
@@ -570,6 +557,44 @@ class VAE:
             output = self.decode_tiled_3d(samples, **args)
         return output.movedim(1, -1)
 
+    def decode_stream(self, samples_in, tile_t=None, overlap_t=1, vae_options={}):
+        """
+        Decodes video latents into IMAGE chunks of [frames, height, width, channels] that are yielded in frame order
+        as soon as they are final, so the whole decoded clip is never held in memory. VAEs with a decode_stream method
+        carry their causal conv cache from one latent frame to the next. Others are decoded in windows of tile_t latent
+        frames blended over overlap_t frames, tile_t is sized from the free memory if not given. Running out of memory
+        only retries the current window with spatial tiling.
+        """
+        self.throw_exception_if_invalid()
+        if self.latent_dim != 3 or samples_in.ndim != 5:
+            yield self.decode(samples_in, vae_options=vae_options)
+            return
+
+        streaming = hasattr(self.first_stage_model, "decode_stream")
+        frame_memory = self.memory_used_decode((1,) + tuple(samples_in.shape[1:2]) + (1,) + tuple(samples_in.shape[3:]), self.vae_dtype)
+        model_management.load_models_gpu([self.patcher], memory_required=frame_memory * (1 if streaming else max(2, overlap_t + 1)))
+        if tile_t is None:
+            tile_t = int(model_management.get_free_memory(self.device) / frame_memory)
+        tile_t = max(overlap_t + 1, tile_t)
+
+        def decode_window(samples):
+            try:
+                return self.process_output(self.first_stage_model.decode(samples.to(self.vae_dtype).to(self.device), **vae_options).to(self.output_device).float())
+            except model_management.OOM_EXCEPTION:
+                logging.warning("Warning: Ran out of memory when VAE decoding a chunk, retrying it with tiled VAE decoding.")
+                tile = 256 // self.spacial_compression_decode()
+                overlap = tile // 4
+                return self.decode_tiled_3d(samples, tile_x=tile, tile_y=tile, overlap=(1, overlap, overlap))
+
+        for b in range(samples_in.shape[0]):
+            samples = samples_in[b:b + 1]
+            if streaming:
+                chunks = (self.process_output(out.to(self.output_device).float()) for out in self.first_stage_model.decode_stream(samples.to(self.vae_dtype).to(self.device), **vae_options))
+            else:
+                chunks = comfy.utils.tiled_scale_temporal(samples, decode_window, tile_t, overlap_t, self.upscale_ratio[0], self.upscale_index_formula[0], output_device=self.output_device)
+            for out in chunks:
+                yield out[0].movedim(0, -1)
+
     def encode(self, pixel_samples):
         self.throw_exception_if_invalid()
         pixel_samples = self.vae_encode_crop_pixels(pixel_samples)
@@ -680,7 +705,8 @@ def load_style_model(ckpt_path):
     if "style_embedding" in keys:
         model = comfy.t2i_adapter.adapter.StyleAdapter(width=1024, context_dim=768, num_head=8, n_layes=3, num_token=8)
     elif "redux_down.weight" in keys:
-        model = comfy.ldm.flux.redux.ReduxImageEncoder()
+        from .ldm.flux.redux import ReduxImageEncoder
+        model = ReduxImageEncoder()
     else:
         raise Exception("invalid style model {}".format(ckpt_path))
     model.load_state_dict(model_data)
@@ -745,6 +771,7 @@ def detect_te_model(sd):
 
 
 def t5xxl_detect(clip_data):
+    import comfy.text_encoders.sd3_clip
     weight_name = "encoder.block.23.layer.1.DenseReluDense.wi_1.weight"
     weight_name_old = "encoder.block.23.layer.1.DenseReluDense.wi.weight"
 
@@ -755,6 +782,7 @@ def t5xxl_detect(clip_data):
     return {}
 
 def llama_detect(clip_data):
+    import comfy.text_encoders.hunyuan_video
     weight_name = "model.layers.0.self_attn.k_proj.weight"
 
     for sd in clip_data:
@@ -764,6 +792,20 @@ def llama_detect(clip_data):
     return {}
 
 def load_text_encoder_state_dicts(state_dicts=[], embedding_directory=None, clip_type=CLIPType.STABLE_DIFFUSION, model_options={}):
+    import comfy.text_encoders.sd3_clip
+    import comfy.text_encoders.sd2_clip
+    import comfy.text_encoders.lt
+    import comfy.text_encoders.pixart_t5
+    import comfy.text_encoders.wan
+    import comfy.text_encoders.genmo
+    import comfy.text_encoders.cosmos
+    import comfy.text_encoders.aura_t5
+    import comfy.text_encoders.sa_t5
+    import comfy.text_encoders.lumina2
+    import comfy.text_encoders.hydit
+    import comfy.text_encoders.flux
+    import comfy.text_encoders.hunyuan_video
+    import comfy.text_encoders.long_clipl
     clip_data = state_dicts
 
     class EmptyClass:
@@ -900,12 +942,13 @@ def load_checkpoint(config_path=None, ckpt_path=None, output_vae=True, output_cl
 
 def load_checkpoint_guess_config(ckpt_path, output_vae=True, output_clip=True, output_clipvision=False, embedding_directory=None, output_model=True, model_options={}, te_model_options={}):
     sd, metadata = comfy.utils.load_torch_file(ckpt_path, return_metadata=True)
-    out = load_state_dict_guess_config(sd, output_vae, output_clip, output_clipvision, embedding_directory, output_model, model_options, te_model_options=te_model_options, metadata=metadata)
+    cache_key = comfy.model_detection_cache.detection_cache.file_key(ckpt_path)
+    out = load_state_dict_guess_config(sd, output_vae, output_clip, output_clipvision, embedding_directory, output_model, model_options, te_model_options=te_model_options, metadata=metadata, cache_key=cache_key)
     if out is None:
         raise RuntimeError("ERROR: Could not detect model type of: {}".format(ckpt_path))
     return out
 
-def load_state_dict_guess_config(sd, output_vae=True, output_clip=True, output_clipvision=False, embedding_directory=None, output_model=True, model_options={}, te_model_options={}, metadata=None):
+def load_state_dict_guess_config(sd, output_vae=True, output_clip=True, output_clipvision=False, embedding_directory=None, output_model=True, model_options={}, te_model_options={}, metadata=None, cache_key=None):
     clip = None
     clipvision = None
     vae = None
@@ -917,10 +960,10 @@ def load_state_dict_guess_config(sd, output_vae=True, output_clip=True, output_c
     weight_dtype = comfy.utils.weight_dtype(sd, diffusion_model_prefix)
     load_device = model_management.get_torch_device()
 
-    model_config = model_detection.model_config_from_unet(sd, diffusion_model_prefix, metadata=metadata)
+    model_config = model_detection.model_config_from_unet(sd, diffusion_model_prefix, metadata=metadata, cache_key=cache_key)
     if model_config is None:
         logging.warning("Warning, This is not a checkpoint file, trying to load it as a diffusion model only.")
-        diffusion_model = load_diffusion_model_state_dict(sd, model_options={})
+        diffusion_model = load_diffusion_model_state_dict(sd, model_options={}, cache_key=cache_key)
         if diffusion_model is None:
             return None
         return (diffusion_model, None, VAE(sd={}), None)  # The VAE object is there to throw an exception if it's actually used'
@@ -986,7 +1029,7 @@ def load_state_dict_guess_config(sd, output_vae=True, output_clip=True, output_c
     return (model_patcher, clip, vae, clipvision)
 
 
-def load_diffusion_model_state_dict(sd, model_options={}): #load unet in diffusers or regular format
+def load_diffusion_model_state_dict(sd, model_options={}, cache_key=None): #load unet in diffusers or regular format
     dtype = model_options.get("dtype", None)
 
     #Allow loading unets from checkpoint files
@@ -999,7 +1042,7 @@ def load_diffusion_model_state_dict(sd, model_options={}): #load unet in diffuse
     weight_dtype = comfy.utils.weight_dtype(sd)
 
     load_device = model_management.get_torch_device()
-    model_config = model_detection.model_config_from_unet(sd, "")
+    model_config = model_detection.model_config_from_unet(sd, "", cache_key=cache_key)
 
     if model_config is not None:
         new_sd = sd
@@ -1050,7 +1093,8 @@ def load_diffusion_model_state_dict(sd, model_options={}): #load unet in diffuse
 
 def load_diffusion_model(unet_path, model_options={}):
     sd = comfy.utils.load_torch_file(unet_path)
-    model = load_diffusion_model_state_dict(sd, model_options=model_options)
+    cache_key = comfy.model_detection_cache.detection_cache.file_key(unet_path)
+    model = load_diffusion_model_state_dict(sd, model_options=model_options, cache_key=cache_key)
     if model is None:
         logging.error("ERROR UNSUPPORTED UNET {}".format(unet_path))
         raise RuntimeError("ERROR: Could not detect model type of: {}".format(unet_path))
@@ -1066,23 +1110,23 @@ def load_unet_state_dict(sd, dtype=None):
 
 def save_checkpoint(output_path, model, clip=None, vae=None, clip_vision=None, metadata=None, extra_keys={}):
     clip_sd = None
-    load_models = [model]
     if clip is not None:
-        load_models.append(clip.load_model())
-        clip_sd = clip.get_sd()
+        # some text encoders merge weights when converted for saving so their patched weights are calculated first
+        clip_sd = {}
+        for k, v in clip.patcher.lazy_state_dict().items():
+            if isinstance(v, comfy.utils.LazyTensor):
+                v = v.load().to(clip.patcher.offload_device)
+            clip_sd[k] = v
+        clip_sd.update(clip.tokenizer.state_dict())
     vae_sd = None
     if vae is not None:
         vae_sd = vae.get_sd()
 
-    model_management.load_models_gpu(load_models, force_patch_weights=True)
     clip_vision_sd = clip_vision.get_sd() if clip_vision is not None else None
-    sd = model.model.state_dict_for_saving(clip_sd, vae_sd, clip_vision_sd)
+    # the patched diffusion model weights are calculated one at a time while the file gets written
+    unet_sd = comfy.utils.state_dict_prefix_replace(model.lazy_state_dict("diffusion_model."), {"diffusion_model.": ""}, filter_keys=True)
+    sd = model.model.state_dict_for_saving(clip_sd, vae_sd, clip_vision_sd, unet_state_dict=unet_sd)
     for k in extra_keys:
         sd[k] = extra_keys[k]
 
-    for k in sd:
-        t = sd[k]
-        if not t.is_contiguous():
-            sd[k] = t.contiguous()
-
-    comfy.utils.save_torch_file(sd, output_path, metadata=metadata)
+    comfy.utils.save_torch_file_streaming(sd, output_path, metadata=metadata)
@@ -4,19 +4,6 @@ from . import utils
 
 from . import sd1_clip
 from . import sdxl_clip
-import comfy.text_encoders.sd2_clip
-import comfy.text_encoders.sd3_clip
-import comfy.text_encoders.sa_t5
-import comfy.text_encoders.aura_t5
-import comfy.text_encoders.pixart_t5
-import comfy.text_encoders.hydit
-import comfy.text_encoders.flux
-import comfy.text_encoders.genmo
-import comfy.text_encoders.lt
-import comfy.text_encoders.hunyuan_video
-import comfy.text_encoders.cosmos
-import comfy.text_encoders.lumina2
-import comfy.text_encoders.wan
 
 from . import supported_models_base
 from . import latent_formats
@@ -111,6 +98,7 @@ class SD20(supported_models_base.BASE):
         return state_dict
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.sd2_clip
         return supported_models_base.ClipTarget(comfy.text_encoders.sd2_clip.SD2Tokenizer, comfy.text_encoders.sd2_clip.SD2ClipModel)
 
 class SD21UnclipL(SD20):
@@ -544,6 +532,7 @@ class SD3(supported_models_base.BASE):
         return out
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.sd3_clip
         clip_l = False
         clip_g = False
         t5 = False
@@ -587,6 +576,7 @@ class StableAudio(supported_models_base.BASE):
         return utils.state_dict_prefix_replace(state_dict, replace_prefix)
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.sa_t5
         return supported_models_base.ClipTarget(comfy.text_encoders.sa_t5.SAT5Tokenizer, comfy.text_encoders.sa_t5.SAT5Model)
 
 class AuraFlow(supported_models_base.BASE):
@@ -610,6 +600,7 @@ class AuraFlow(supported_models_base.BASE):
         return out
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.aura_t5
         return supported_models_base.ClipTarget(comfy.text_encoders.aura_t5.AuraT5Tokenizer, comfy.text_encoders.aura_t5.AuraT5Model)
 
 class PixArtAlpha(supported_models_base.BASE):
@@ -637,6 +628,7 @@ class PixArtAlpha(supported_models_base.BASE):
         return out.eval()
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.pixart_t5
         return supported_models_base.ClipTarget(comfy.text_encoders.pixart_t5.PixArtTokenizer, comfy.text_encoders.pixart_t5.PixArtT5XXL)
 
 class PixArtSigma(PixArtAlpha):
@@ -671,6 +663,7 @@ class HunyuanDiT(supported_models_base.BASE):
         return out
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.hydit
         return supported_models_base.ClipTarget(comfy.text_encoders.hydit.HyditTokenizer, comfy.text_encoders.hydit.HyditModel)
 
 class HunyuanDiT1(HunyuanDiT):
@@ -709,6 +702,8 @@ class Flux(supported_models_base.BASE):
         return out
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.sd3_clip
+        import comfy.text_encoders.flux
         pref = self.text_encoder_key_prefix[0]
         t5_detect = comfy.text_encoders.sd3_clip.t5_xxl_detect(state_dict, "{}t5xxl.transformer.".format(pref))
         return supported_models_base.ClipTarget(comfy.text_encoders.flux.FluxTokenizer, comfy.text_encoders.flux.flux_clip(**t5_detect))
@@ -762,6 +757,8 @@ class GenmoMochi(supported_models_base.BASE):
         return out
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.sd3_clip
+        import comfy.text_encoders.genmo
         pref = self.text_encoder_key_prefix[0]
         t5_detect = comfy.text_encoders.sd3_clip.t5_xxl_detect(state_dict, "{}t5xxl.transformer.".format(pref))
         return supported_models_base.ClipTarget(comfy.text_encoders.genmo.MochiT5Tokenizer, comfy.text_encoders.genmo.mochi_te(**t5_detect))
@@ -790,6 +787,8 @@ class LTXV(supported_models_base.BASE):
         return out
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.sd3_clip
+        import comfy.text_encoders.lt
         pref = self.text_encoder_key_prefix[0]
         t5_detect = comfy.text_encoders.sd3_clip.t5_xxl_detect(state_dict, "{}t5xxl.transformer.".format(pref))
         return supported_models_base.ClipTarget(comfy.text_encoders.lt.LTXVT5Tokenizer, comfy.text_encoders.lt.ltxv_te(**t5_detect))
@@ -838,6 +837,7 @@ class HunyuanVideo(supported_models_base.BASE):
         return utils.state_dict_prefix_replace(state_dict, replace_prefix)
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.hunyuan_video
         pref = self.text_encoder_key_prefix[0]
         hunyuan_detect = comfy.text_encoders.hunyuan_video.llama_detect(state_dict, "{}llama.transformer.".format(pref))
         return supported_models_base.ClipTarget(comfy.text_encoders.hunyuan_video.HunyuanVideoTokenizer, comfy.text_encoders.hunyuan_video.hunyuan_video_clip(**hunyuan_detect))
@@ -889,6 +889,8 @@ class CosmosT2V(supported_models_base.BASE):
         return out
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.sd3_clip
+        import comfy.text_encoders.cosmos
         pref = self.text_encoder_key_prefix[0]
         t5_detect = comfy.text_encoders.sd3_clip.t5_xxl_detect(state_dict, "{}t5xxl.transformer.".format(pref))
         return supported_models_base.ClipTarget(comfy.text_encoders.cosmos.CosmosT5Tokenizer, comfy.text_encoders.cosmos.te(**t5_detect))
@@ -928,6 +930,8 @@ class Lumina2(supported_models_base.BASE):
         return out
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.hunyuan_video
+        import comfy.text_encoders.lumina2
         pref = self.text_encoder_key_prefix[0]
         hunyuan_detect = comfy.text_encoders.hunyuan_video.llama_detect(state_dict, "{}gemma2_2b.transformer.".format(pref))
         return supported_models_base.ClipTarget(comfy.text_encoders.lumina2.LuminaTokenizer, comfy.text_encoders.lumina2.te(**hunyuan_detect))
@@ -961,6 +965,8 @@ class WAN21_T2V(supported_models_base.BASE):
         return out
 
     def clip_target(self, state_dict={}):
+        import comfy.text_encoders.sd3_clip
+        import comfy.text_encoders.wan
         pref = self.text_encoder_key_prefix[0]
         t5_detect = comfy.text_encoders.sd3_clip.t5_xxl_detect(state_dict, "{}umt5xxl.transformer.".format(pref))
         return supported_models_base.ClipTarget(comfy.text_encoders.wan.WanT5Tokenizer, comfy.text_encoders.wan.te(**t5_detect))
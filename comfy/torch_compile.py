@@ -0,0 +1,179 @@
+"""
+Compiled diffusion models of the TorchCompileModel node.
+
+The torch.compile wrappers are kept by model, patches and backend so every clone of a model patcher
+reuses the graphs already compiled for it. The inputs can be padded to a few bucketed batch sizes and
+resolutions so the graphs are compiled for static shapes once per bucket instead of once per shape.
+The compiled artifacts are persisted next to the inductor cache, a restart only loads them.
+"""
+from __future__ import annotations
+
+import os
+import time
+import logging
+import threading
+import weakref
+
+import torch
+
+from comfy.attention_autotune import shape_bucket
+
+# resolutions are padded to a multiple of this many latent pixels
+RESOLUTION_MULTIPLE = 16
+ARTIFACTS_FILE = "cache_artifacts.bin"
+
+
+def bucket_resolution(size: int) -> int:
+    return -(-size // RESOLUTION_MULTIPLE) * RESOLUTION_MULTIPLE
+
+
+def compiled_graphs() -> int:
+    """Number of graphs torch.compile compiled in this process."""
+    import torch._dynamo.utils
+    return torch._dynamo.utils.counters["stats"]["unique_graphs"]
+
+
+def model_fingerprint(model: torch.nn.Module) -> str:
+    dtype = next((p.dtype for p in model.parameters()), None)
+    return "{}|{}|{}".format(type(model).__name__, dtype, id(model))
+
+
+class CompiledModels:
+    """
+    torch.compile wrappers and their compile statistics keyed by model fingerprint, patch fingerprint and
+    backend. A wrapper only lives as long as a model patcher uses it. Without a path nothing is persisted.
+    """
+    def __init__(self, path: str | None = None):
+        self.lock = threading.Lock()
+        self.path = path
+        self.loaded = False
+        self.models = weakref.WeakValueDictionary()
+        self.stats: dict[str, dict[str, float]] = {}
+
+    def set_path(self, path: str | None) -> None:
+        with self.lock:
+            self.path = path
+            self.loaded = False
+
+    def load(self) -> None:
+        """Points the inductor cache to the path and loads the persisted artifacts. Must be called with the lock held."""
+        if self.loaded or self.path is None:
+            return
+        self.loaded = True
+        if "TORCHINDUCTOR_CACHE_DIR" not in os.environ:
+            os.environ["TORCHINDUCTOR_CACHE_DIR"] = os.path.join(self.path, "inductor")
+        artifacts_path = os.path.join(self.path, ARTIFACTS_FILE)
+        if not hasattr(torch.compiler, "load_cache_artifacts") or not os.path.exists(artifacts_path):
+            return
+        try:
+            with open(artifacts_path, "rb") as f:
+                torch.compiler.load_cache_artifacts(f.read())
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable torch compile artifacts {artifacts_path}: {e}")
+
+    def save(self) -> None:
+        """Must be called with the lock held."""
+        if self.path is None or not hasattr(torch.compiler, "save_cache_artifacts"):
+            return
+        try:
+            artifacts = torch.compiler.save_cache_artifacts()
+            if artifacts is None:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            artifacts_path = os.path.join(self.path, ARTIFACTS_FILE)
+            tmp_path = "{}.{}.tmp".format(artifacts_path, os.getpid())
+            with open(tmp_path, "wb") as f:
+                f.write(artifacts[0])
+            os.replace(tmp_path, artifacts_path)
+        except Exception as e:
+            logging.warning(f"Failed to write torch compile artifacts to {self.path}: {e}")
+
+    def get(self, model_patcher, backend: str, dynamic: bool | None = None) -> tuple[str, torch.nn.Module]:
+        """The key and the compiled diffusion model of the model patcher."""
+        diffusion_model = model_patcher.get_model_object("diffusion_model")
+        key = "{}|{}|{}|{}".format(model_fingerprint(diffusion_model), model_patcher.patches_uuid, backend, "dynamic" if dynamic is None else "static")
+        with self.lock:
+            self.load()
+            compiled = self.models.get(key)
+            if compiled is None:
+                compiled = torch.compile(model=diffusion_model, backend=backend, dynamic=dynamic)
+                self.models[key] = compiled
+            return key, compiled
+
+    def record(self, key: str, seconds: float, graphs: int) -> None:
+        """Counts a call of a compiled model, graphs is how many it compiled."""
+        with self.lock:
+            stats = self.stats.setdefault(key, {"calls": 0, "hits": 0, "compiles": 0, "compile_time": 0.0})
+            stats["calls"] += 1
+            if graphs == 0:
+                stats["hits"] += 1
+                return
+            stats["compiles"] += graphs
+            stats["compile_time"] += seconds
+            self.save()
+        totals = self.statistics()
+        logging.info("torch.compile: compiled {} graph(s) in {:.1f}s, {} compiles taking {:.1f}s and {} hits in {} calls so far".format(graphs, seconds, totals["compiles"], totals["compile_time"], totals["hits"], totals["calls"]))
+
+    def statistics(self) -> dict[str, float]:
+        with self.lock:
+            totals = {"models": len(self.stats), "calls": 0, "hits": 0, "compiles": 0, "compile_time": 0.0}
+            for stats in self.stats.values():
+                for k in stats:
+                    totals[k] += stats[k]
+            return totals
+
+
+def pad_batch(tensor: torch.Tensor, batch: int) -> torch.Tensor:
+    """Pads the batch with copies of the last entry."""
+    return torch.cat([tensor, tensor[-1:].expand(batch - tensor.shape[0], *tensor.shape[1:])])
+
+
+class CompiledModelWrapper:
+    """
+    APPLY_MODEL wrapper that records the compile statistics and pads the inputs to the bucketed shapes. Tensors
+    with the batch size of x get their batch padded, tensors with the resolution of x get their resolution
+    padded by repeating the last row and column, the output is cropped back.
+    """
+    def __init__(self, key: str, batch_buckets: bool = False, resolution_buckets: bool = False, models: CompiledModels | None = None):
+        self.key = key
+        self.batch_buckets = batch_buckets
+        self.resolution_buckets = resolution_buckets
+        self.models = models if models is not None else compiled_models
+
+    def __call__(self, executor, x, t, c_concat=None, c_crossattn=None, control=None, transformer_options={}, **kwargs):
+        batch = x.shape[0]
+        resolution = tuple(x.shape[-2:])
+        padded_batch = shape_bucket(batch) if self.batch_buckets else batch
+        padded_resolution = resolution
+        # controlnet residuals have resolutions of their own
+        if self.resolution_buckets and control is None and x.ndim >= 4:
+            padded_resolution = tuple(bucket_resolution(r) for r in resolution)
+
+        def pad(value):
+            if not torch.is_tensor(value) or value.ndim == 0:
+                return value
+            if padded_resolution != resolution and value.ndim == x.ndim and tuple(value.shape[-2:]) == resolution:
+                padding = (0, padded_resolution[1] - resolution[1], 0, padded_resolution[0] - resolution[0])
+                value = torch.nn.functional.pad(value.flatten(1, -3), padding, mode="replicate").unflatten(1, value.shape[1:-2])
+            if padded_batch != batch and value.shape[0] == batch:
+                value = pad_batch(value, padded_batch)
+            return value
+
+        if padded_batch != batch or padded_resolution != resolution:
+            x, t, c_concat, c_crossattn = pad(x), pad(t), pad(c_concat), pad(c_crossattn)
+            if control is not None:
+                control = {k: [pad(c) for c in v] for k, v in control.items()}
+            kwargs = {k: pad(v) for k, v in kwargs.items()}
+
+        graphs = compiled_graphs()
+        start = time.perf_counter()
+        out = executor(x, t, c_concat, c_crossattn, control, transformer_options, **kwargs)
+        self.models.record(self.key, time.perf_counter() - start, compiled_graphs() - graphs)
+        if padded_batch != batch:
+            out = out[:batch]
+        if padded_resolution != resolution:
+            out = out[..., :resolution[0], :resolution[1]]
+        return out
+
+
+compiled_models = CompiledModels()
@@ -19,6 +19,7 @@
 
 import torch
 import math
+import json
 import struct
 import comfy.checkpoint_pickle
 import safetensors.torch
@@ -26,6 +27,8 @@ import numpy as np
 from PIL import Image
 import logging
 import itertools
+import queue
+import threading
 from torch.nn.functional import interpolate
 from einops import rearrange
 
@@ -91,6 +94,63 @@ def save_torch_file(sd, ckpt, metadata=None):
     else:
         safetensors.torch.save_file(sd, ckpt)
 
+# in the order of the safetensors dtypes, files list the tensors from the last one
+SAFETENSORS_DTYPES = {torch.bool: "BOOL", torch.uint8: "U8", torch.int8: "I8"}
+if hasattr(torch, "float8_e4m3fn"):
+    SAFETENSORS_DTYPES[torch.float8_e5m2] = "F8_E5M2"
+    SAFETENSORS_DTYPES[torch.float8_e4m3fn] = "F8_E4M3"
+SAFETENSORS_DTYPES.update({
+    torch.int16: "I16",
+    torch.float16: "F16",
+    torch.bfloat16: "BF16",
+    torch.int32: "I32",
+    torch.float32: "F32",
+    torch.float64: "F64",
+    torch.int64: "I64",
+})
+
+class LazyTensor:
+    """A tensor of a known shape and dtype that is only calculated by load() when it gets used."""
+    def __init__(self, shape, dtype, load):
+        self.shape = torch.Size(shape)
+        self.dtype = dtype
+        self.load = load
+
+def save_torch_file_streaming(sd, ckpt, metadata=None):
+    """
+    Writes the same safetensors file as save_torch_file one tensor at a time. The values of sd can be LazyTensors,
+    they are loaded right before being written so only one of them is ever in memory.
+    """
+    element_sizes = {dtype: torch.tensor([], dtype=dtype).element_size() for dtype in SAFETENSORS_DTYPES}
+    # same order as safetensors, the biggest elements come first so every tensor stays aligned
+    dtype_order = {dtype: i for i, dtype in enumerate(SAFETENSORS_DTYPES)}
+    keys = sorted(sd.keys(), key=lambda k: (-dtype_order[sd[k].dtype], k))
+    header = {}
+    if metadata is not None:
+        header["__metadata__"] = metadata
+    offset = 0
+    for k in keys:
+        t = sd[k]
+        size = math.prod(t.shape) * element_sizes[t.dtype]
+        header[k] = {"dtype": SAFETENSORS_DTYPES[t.dtype], "shape": list(t.shape), "data_offsets": [offset, offset + size]}
+        offset += size
+    header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header += b" " * (-len(header) % 8)
+
+    with open(ckpt, "wb") as f:
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for k in keys:
+            t = sd[k]
+            if isinstance(t, LazyTensor):
+                lazy = t
+                t = lazy.load()
+                if t.shape != lazy.shape or t.dtype != lazy.dtype:
+                    raise ValueError("Tensor {} was loaded as {} {} instead of {} {}".format(k, t.dtype, list(t.shape), lazy.dtype, list(lazy.shape)))
+            t = t.detach().to("cpu").contiguous()
+            f.write(t.reshape(-1).view(torch.uint8).numpy())
+            del t
+
 def calculate_parameters(sd, prefix=""):
     params = 0
     for k in sd.keys():
@@ -978,9 +1038,140 @@ def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_am
         output[b:b+1] = out/out_div
     return output
 
+@torch.inference_mode()
+def tiled_scale_temporal(samples, function, tile_t, overlap_t, upscale_amount, index_formula=None, output_device="cpu", pbar=None):
+    """
+    Streaming version of tiled_scale_multidim for tiles along the time dimension (dim 2) only: function is called on
+    windows of tile_t frames overlapping by overlap_t and the blended output frames are yielded as soon as no later
+    window touches them.
+    """
+    if index_formula is None:
+        index_formula = upscale_amount
+
+    def scale(up, val):
+        if callable(up):
+            return up(val)
+        else:
+            return up * val
+
+    length = samples.shape[2]
+    feather = round(scale(upscale_amount, overlap_t))
+    positions = list(range(0, length - overlap_t, tile_t - overlap_t)) if length > tile_t else [0]
+
+    out = None
+    out_div = None
+    out_start = 0
+    for i, pos in enumerate(positions):
+        ps = function(samples.narrow(2, pos, min(tile_t, length - pos))).to(output_device)
+        mask = torch.ones([1, 1, ps.shape[2]] + [1] * (ps.ndim - 3), device=output_device)
+        if feather < mask.shape[2]:
+            for t in range(feather):
+                a = (t + 1) / feather
+                mask.narrow(2, t, 1).mul_(a)
+                mask.narrow(2, mask.shape[2] - 1 - t, 1).mul_(a)
+
+        start = round(scale(index_formula, pos)) - out_start
+        end = start + ps.shape[2]
+        if out is None:
+            out = torch.zeros(ps.shape[:2] + (0,) + ps.shape[3:], device=output_device)
+            out_div = torch.zeros(mask.shape[:2] + (0,) + mask.shape[3:], device=output_device)
+        if end > out.shape[2]:
+            out = torch.cat((out, torch.zeros(out.shape[:2] + (end - out.shape[2],) + out.shape[3:], device=output_device)), dim=2)
+            out_div = torch.cat((out_div, torch.zeros(out_div.shape[:2] + (end - out_div.shape[2],) + out_div.shape[3:], device=output_device)), dim=2)
+        out.narrow(2, start, ps.shape[2]).add_(ps * mask)
+        out_div.narrow(2, start, ps.shape[2]).add_(mask)
+
+        if pbar is not None:
+            pbar.update(1)
+
+        if i + 1 < len(positions):
+            done = round(scale(index_formula, positions[i + 1])) - out_start
+        else:
+            done = out.shape[2]
+        if done > 0:
+            yield out[:, :, :done] / out_div[:, :, :done]
+            out = out[:, :, done:]
+            out_div = out_div[:, :, done:]
+            out_start += done
+
 def tiled_scale(samples, function, tile_x=64, tile_y=64, overlap = 8, upscale_amount = 4, out_channels = 3, output_device="cpu", pbar = None):
     return tiled_scale_multidim(samples, function, (tile_y, tile_x), overlap=overlap, upscale_amount=upscale_amount, out_channels=out_channels, output_device=output_device, pbar=pbar)
 
+@torch.inference_mode()
+def tiled_scale_batched(samples, function, tile_x=64, tile_y=64, overlap=8, upscale_amount=4, out_channels=3, output_device="cpu", tiles_per_batch=1, device=None, non_blocking=False, pbar=None):
+    """
+    tiled_scale that calls function on batches of up to tiles_per_batch same sized tiles taken from all the images
+    in samples. If device is set the tiles are copied to it, the copy of the next batch is queued before function
+    runs on the current one.
+    """
+    def tile_positions(size, tile):
+        if size <= tile:
+            return [(0, size)]
+        positions = []
+        for it in range(0, size - overlap, tile - overlap):
+            pos = max(0, min(size - overlap, it))
+            positions.append((pos, min(tile, size - pos)))
+        return positions
+
+    ys = tile_positions(samples.shape[2], tile_y)
+    xs = tile_positions(samples.shape[3], tile_x)
+    single_tile = len(ys) == 1 and len(xs) == 1
+
+    groups = {}
+    for b in range(samples.shape[0]):
+        for y, h in ys:
+            for x, w in xs:
+                groups.setdefault((h, w), []).append((b, y, x))
+    batches = [(size, tiles[i:i + tiles_per_batch]) for size, tiles in groups.items() for i in range(0, len(tiles), tiles_per_batch)]
+
+    def load(batch):
+        (h, w), tiles = batch
+        s_in = torch.stack([samples[b, :, y:y + h, x:x + w] for b, y, x in tiles])
+        if device is not None:
+            # tiles that are already on a device (--gpu-only) can't be pinned
+            if non_blocking and s_in.device.type == "cpu":
+                s_in = s_in.pin_memory()
+            s_in = s_in.to(device, non_blocking=non_blocking)
+        return s_in
+
+    def feather_mask(shape):
+        mask = torch.ones(shape, device=output_device)
+        if single_tile:
+            return mask
+        feather = round(overlap * upscale_amount)
+        for d in range(len(shape)):
+            if feather >= shape[d]:
+                continue
+            for t in range(feather):
+                a = (t + 1) / feather
+                mask.narrow(d, t, 1).mul_(a)
+                mask.narrow(d, shape[d] - 1 - t, 1).mul_(a)
+        return mask
+
+    output = torch.zeros([samples.shape[0], out_channels, round(samples.shape[2] * upscale_amount), round(samples.shape[3] * upscale_amount)], device=output_device)
+    output_div = torch.zeros([samples.shape[0], 1] + list(output.shape[2:]), device=output_device)
+    masks = {}
+
+    next_in = load(batches[0])
+    for i in range(len(batches)):
+        s_in = next_in
+        if i + 1 < len(batches):
+            next_in = load(batches[i + 1])
+        ps = function(s_in).to(output_device)
+
+        mask = masks.get(ps.shape[2:])
+        if mask is None:
+            mask = masks[ps.shape[2:]] = feather_mask(ps.shape[2:])
+
+        for j, (b, y, x) in enumerate(batches[i][1]):
+            y, x = round(y * upscale_amount), round(x * upscale_amount)
+            output[b, :, y:y + mask.shape[0], x:x + mask.shape[1]].add_(ps[j] * mask)
+            output_div[b, :, y:y + mask.shape[0], x:x + mask.shape[1]].add_(mask)
+
+        if pbar is not None:
+            pbar.update(len(batches[i][1]))
+    return output / output_div
+
 PROGRESS_BAR_ENABLED = True
 def set_progress_bar_enabled(enabled):
     global PROGRESS_BAR_ENABLED
@@ -1071,3 +1262,48 @@ def upscale_dit_mask(mask: torch.Tensor, img_size_in, img_size_out):
             dim=1
         )
         return out
+
+def images_to_uint8(images, chunk_size=16):
+    """
+    Yields IMAGE frames as uint8 numpy arrays of at most chunk_size frames, converted on the device the frames are on.
+    images is either an IMAGE tensor or an iterable of them (like the chunks of a streaming decode), so only
+    one chunk is ever held as float.
+    """
+    if torch.is_tensor(images):
+        images = [images]
+    for chunk in images:
+        for i in range(0, chunk.shape[0], chunk_size):
+            yield (255. * chunk[i:i + chunk_size]).clamp(0, 255).to(torch.uint8).cpu().numpy()
+
+def consume_in_background(items, consume, max_pending=2):
+    """
+    Calls consume(item) for every item on a worker thread while this thread produces the next ones.
+    At most max_pending items are queued, an exception raised by consume is re-raised here.
+    """
+    pending = queue.Queue(maxsize=max_pending)
+    errors = []
+    done = object()
+
+    def worker():
+        while True:
+            item = pending.get()
+            if item is done:
+                return
+            if len(errors) == 0:
+                try:
+                    consume(item)
+                except Exception as e:
+                    errors.append(e)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    try:
+        for item in items:
+            if len(errors) > 0:
+                break
+            pending.put(item)
+    finally:
+        pending.put(done)
+        thread.join()
+    if len(errors) > 0:
+        raise errors[0]
@@ -0,0 +1,108 @@
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+from typing import Optional
+
+
+class HistoryStore:
+    """
+    Prompt history kept in an SQLite database instead of in memory, ordered from oldest to newest.
+
+    With an empty path the database is a private temporary file that SQLite deletes when it is closed,
+    so the history is gone on restart like before. Every field of an entry is stored as its own JSON
+    column, pages and projections only load and decode the fields that are asked for.
+    """
+    FIELDS = ("prompt", "outputs", "status", "meta")
+
+    def __init__(self, path: str = "", max_items: Optional[int] = None):
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        if path != "":
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS history (seq INTEGER PRIMARY KEY AUTOINCREMENT, prompt_id TEXT UNIQUE NOT NULL, {}, extra TEXT)".format(
+            ", ".join("{} TEXT".format(f) for f in self.FIELDS)))
+        self.db.commit()
+
+    def add(self, prompt_id: str, entry: dict):
+        # default=str so an output a node made unserializable by mistake doesn't lose the whole entry
+        values = [json.dumps(entry[f], default=str) if f in entry else None for f in self.FIELDS]
+        extra = {k: v for k, v in entry.items() if k not in self.FIELDS}
+        with self.lock:
+            # replacing an entry moves it to the end
+            self.db.execute("DELETE FROM history WHERE prompt_id = ?", (prompt_id,))
+            self.db.execute("INSERT INTO history (prompt_id, {}, extra) VALUES (?, {}, ?)".format(", ".join(self.FIELDS), ", ".join("?" * len(self.FIELDS))),
+                            [prompt_id] + values + [json.dumps(extra, default=str)])
+            if self.max_items is not None:
+                self.db.execute("DELETE FROM history WHERE seq <= (SELECT seq FROM history ORDER BY seq DESC LIMIT 1 OFFSET ?)", (self.max_items,))
+            self.db.commit()
+
+    def columns(self, fields):
+        if fields is None:
+            return list(self.FIELDS) + ["extra"]
+        columns = [f for f in self.FIELDS if f in fields]
+        if any(f not in self.FIELDS for f in fields):
+            columns.append("extra")
+        return columns
+
+    def decode(self, columns, row, fields):
+        entry = {}
+        for column, value in zip(columns, row):
+            if value is None:
+                continue
+            value = json.loads(value)
+            if column == "extra":
+                entry.update({k: v for k, v in value.items() if fields is None or k in fields})
+            else:
+                entry[column] = value
+        return entry
+
+    def get(self, prompt_id: str, fields=None) -> Optional[dict]:
+        columns = self.columns(fields)
+        with self.lock:
+            row = self.db.execute("SELECT {} FROM history WHERE prompt_id = ?".format(", ".join(["prompt_id"] + columns)), (prompt_id,)).fetchone()
+        if row is None:
+            return None
+        return self.decode(columns, row[1:], fields)
+
+    def page(self, max_items: Optional[int] = None, offset: int = -1, before: Optional[str] = None, fields=None) -> dict:
+        """
+        Entries from oldest to newest, the max_items newest ones if offset is negative or the ones starting at offset.
+        before is a cursor, the prompt id of the oldest entry of the previous page, only entries older than it are returned.
+        """
+        columns = self.columns(fields)
+        query = "SELECT {} FROM history".format(", ".join(["prompt_id"] + columns))
+        params = []
+        if before is not None:
+            query += " WHERE seq < (SELECT seq FROM history WHERE prompt_id = ?)"
+            params.append(before)
+
+        newest_first = offset < 0 and max_items is not None
+        if newest_first:
+            query += " ORDER BY seq DESC LIMIT ?"
+            params.append(max_items)
+        else:
+            query += " ORDER BY seq ASC LIMIT ? OFFSET ?"
+            params += [-1 if max_items is None else max_items, max(0, offset)]
+
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+        if newest_first:
+            rows.reverse()
+        return {row[0]: self.decode(columns, row[1:], fields) for row in rows}
+
+    def delete(self, prompt_id: str):
+        with self.lock:
+            self.db.execute("DELETE FROM history WHERE prompt_id = ?", (prompt_id,))
+            self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM history")
+            self.db.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+import psutil
+
+import folder_paths
+from comfy.cli_args import args
+from comfy_execution.prompt_models import prompt_model_files
+
+READ_CHUNK_SIZE = 16 * 1024 * 1024
+# seconds after which a prefetched file is read again, the page cache might have evicted it by then
+PREFETCH_EXPIRY = 10 * 60
+
+
+class ModelPrefetcher:
+    """
+    Reads the model files of the prompts queued next into the OS page cache on a background thread while the
+    current prompt runs, so their loaders don't wait on the disk when their prompt starts.
+
+    Only the latest request is worked on, a new one stops the previous one. budget is the maximum amount of
+    bytes read per request and never more than half of the available RAM at that time, 0 disables prefetching. A
+    file that was read is skipped until it changes, PREFETCH_EXPIRY seconds pass or more than half of the RAM was
+    read after it.
+    """
+    def __init__(self, budget: int = 0):
+        self.budget = budget
+        self.condition = threading.Condition()
+        self.request = None
+        self.generation = 0
+        # path -> (size, mtime, time, bytes_read) of the files already read
+        self.prefetched = {}
+        self.bytes_read = 0
+        self.thread = None
+
+    def prefetch(self, upcoming_prompts: list[dict], current_prompt: Optional[dict] = None):
+        if self.budget == 0:
+            return
+        # the current prompt's loaders are reading their files right now
+        skip = set(prompt_model_files(current_prompt)) if current_prompt is not None else set()
+        files = []
+        for prompt in upcoming_prompts:
+            for f in prompt_model_files(prompt):
+                if f not in skip and f not in files:
+                    files.append(f)
+
+        with self.condition:
+            self.request = files
+            self.generation += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.worker, daemon=True, name="model_prefetch")
+                self.thread.start()
+            self.condition.notify()
+
+    def worker(self):
+        while True:
+            with self.condition:
+                while self.request is None:
+                    self.condition.wait()
+                files = self.request
+                generation = self.generation
+                self.request = None
+
+            memory = psutil.virtual_memory()
+            budget = min(self.budget, memory.available // 2)
+            now = time.monotonic()
+            self.prefetched = {path: entry for path, entry in self.prefetched.items()
+                               if now - entry[2] < PREFETCH_EXPIRY and self.bytes_read - entry[3] < memory.total // 2}
+            for folder, filename in files:
+                path = folder_paths.get_full_path(folder, filename)
+                if path is None:
+                    continue
+                try:
+                    stat = os.stat(path)
+                    entry = self.prefetched.get(path)
+                    if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+                        continue
+                    if stat.st_size > budget:
+                        break
+                    budget -= stat.st_size
+                    if self.read(path, generation):
+                        self.bytes_read += stat.st_size
+                        self.prefetched[path] = (stat.st_size, stat.st_mtime_ns, time.monotonic(), self.bytes_read)
+                except OSError as e:
+                    logging.debug("Could not prefetch {}: {}".format(path, e))
+                if generation != self.generation:
+                    break
+
+    def read(self, path: str, generation: int) -> bool:
+        buffer = bytearray(READ_CHUNK_SIZE)
+        with open(path, "rb", buffering=0) as f:
+            while f.readinto(buffer) > 0:
+                if generation != self.generation:
+                    return False
+        return True
+
+
+model_prefetcher = ModelPrefetcher(int(args.model_prefetch_budget * 1024 * 1024 * 1024))
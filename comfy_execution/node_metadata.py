@@ -0,0 +1,78 @@
+from __future__ import annotations
+import inspect
+import threading
+from typing import NamedTuple
+
+import folder_paths
+
+
+class NodeClassMetadata(NamedTuple):
+    input_types: dict
+    valid_inputs: frozenset
+    validate_function_inputs: list[str]
+    validate_has_kwargs: bool
+    return_types: tuple
+    output_node: bool
+
+
+def build_node_metadata(class_def) -> NodeClassMetadata:
+    input_types = class_def.INPUT_TYPES()
+    valid_inputs = frozenset(input_types.get('required', {})).union(input_types.get('optional', {}))
+
+    validate_function_inputs = []
+    validate_has_kwargs = False
+    if hasattr(class_def, "VALIDATE_INPUTS"):
+        argspec = inspect.getfullargspec(class_def.VALIDATE_INPUTS)
+        validate_function_inputs = argspec.args
+        validate_has_kwargs = argspec.varkw is not None
+
+    return NodeClassMetadata(
+        input_types=input_types,
+        valid_inputs=valid_inputs,
+        validate_function_inputs=validate_function_inputs,
+        validate_has_kwargs=validate_has_kwargs,
+        return_types=tuple(getattr(class_def, "RETURN_TYPES", ())),
+        output_node=getattr(class_def, "OUTPUT_NODE", False) is True,
+    )
+
+
+class NodeMetadataCache:
+    """
+    Memoizes the per-class data needed to validate a prompt: INPUT_TYPES, the VALIDATE_INPUTS
+    argspec and the output types.
+
+    INPUT_TYPES of loader nodes enumerates model folders, so every entry is dropped as soon as
+    folder_paths reports a change to the folder registry. Call refresh() once per prompt.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: dict[type, NodeClassMetadata] = {}
+        self.registry_version = None
+        self.hits = 0
+        self.misses = 0
+
+    def refresh(self) -> None:
+        version = folder_paths.get_registry_version()
+        with self.lock:
+            if version != self.registry_version:
+                self.entries.clear()
+                self.registry_version = version
+
+    def get(self, class_def) -> NodeClassMetadata:
+        metadata = self.entries.get(class_def)
+        if metadata is not None:
+            self.hits += 1
+            return metadata
+        self.misses += 1
+        metadata = build_node_metadata(class_def)
+        with self.lock:
+            self.entries[class_def] = metadata
+        return metadata
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.registry_version = None
+
+
+node_metadata_cache = NodeMetadataCache()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+import logging
+import threading
+import concurrent.futures
+from contextlib import contextmanager
+from typing import Callable
+
+from comfy.cli_args import args
+import folder_paths
+
+
+class OutputWriter:
+    """
+    Thread pool that encodes and writes the files of output nodes off the execution thread.
+
+    Futures submitted while a collect() block is active on the submitting thread are added to
+    its list, execution uses that to publish the results of a node or prompt once its files are
+    written. With 0 workers everything is written synchronously.
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = None
+        self.executor_lock = threading.Lock()
+        self.local = threading.local()
+
+    def get_executor(self):
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="output_writer")
+            return self.executor
+
+    def submit(self, fn: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        if self.workers > 0:
+            future = self.get_executor().submit(fn, *args, **kwargs)
+        else:
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+        for pending in getattr(self.local, "collecting", []):
+            pending.append(future)
+        future.add_done_callback(log_write_error)
+        return future
+
+    def submit_file(self, fn: Callable, path: str, *args, **kwargs) -> concurrent.futures.Future:
+        """Submits fn(path, ...) to write the file reserved at path, the file is removed if the write fails."""
+        return self.submit(write_file, fn, path, *args, **kwargs)
+
+    @contextmanager
+    def collect(self):
+        """Collects the futures submitted by the current thread inside the block. Blocks can be nested."""
+        if not hasattr(self.local, "collecting"):
+            self.local.collecting = []
+        pending = []
+        self.local.collecting.append(pending)
+        try:
+            yield pending
+        finally:
+            self.local.collecting.remove(pending)
+
+    def when_done(self, futures: list[concurrent.futures.Future], callback: Callable[[], None]) -> None:
+        """Calls callback once all futures are done, right away on this thread if they already are."""
+        remaining = [f for f in futures if not f.done()]
+        if len(remaining) == 0:
+            callback()
+            return
+
+        lock = threading.Lock()
+        count = [len(remaining)]
+
+        def done(future):
+            with lock:
+                count[0] -= 1
+                last = count[0] == 0
+            if last:
+                try:
+                    callback()
+                except Exception:
+                    logging.exception("Error publishing written outputs")
+
+        for f in remaining:
+            f.add_done_callback(done)
+
+
+def write_file(fn: Callable, path: str, *args, **kwargs):
+    with folder_paths.remove_on_error(path):
+        return fn(path, *args, **kwargs)
+
+
+def log_write_error(future: concurrent.futures.Future):
+    e = future.exception()
+    if e is not None:
+        logging.error("Error writing output file: {}".format(e), exc_info=e)
+
+
+def write_failed(futures: list[concurrent.futures.Future]) -> bool:
+    return any(f.exception() is not None for f in futures)
+
+
+output_writer = OutputWriter(args.output_write_workers)
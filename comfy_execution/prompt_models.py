@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+# (input name, model folder) of the model files loaded by the built-in loader nodes
+LOADER_INPUTS = {
+    "CheckpointLoaderSimple": [("ckpt_name", "checkpoints")],
+    "CheckpointLoader": [("ckpt_name", "checkpoints")],
+    "unCLIPCheckpointLoader": [("ckpt_name", "checkpoints")],
+    "ImageOnlyCheckpointLoader": [("ckpt_name", "checkpoints")],
+    "UNETLoader": [("unet_name", "diffusion_models")],
+    "CLIPLoader": [("clip_name", "text_encoders")],
+    "DualCLIPLoader": [("clip_name1", "text_encoders"), ("clip_name2", "text_encoders")],
+    "TripleCLIPLoader": [("clip_name1", "text_encoders"), ("clip_name2", "text_encoders"), ("clip_name3", "text_encoders")],
+    "LoraLoader": [("lora_name", "loras")],
+    "LoraLoaderModelOnly": [("lora_name", "loras")],
+    "VAELoader": [("vae_name", "vae")],
+    "ControlNetLoader": [("control_net_name", "controlnet")],
+    "DiffControlNetLoader": [("control_net_name", "controlnet")],
+}
+
+# folders of the models that are expensive to swap, prompts sharing one of them have model affinity
+MAIN_MODEL_FOLDERS = ("checkpoints", "diffusion_models")
+
+
+def prompt_model_files(prompt: dict) -> list[tuple[str, str]]:
+    """(folder, filename) of the model files the loader nodes of a prompt load, read from their widget values without running anything."""
+    files = []
+    for node in prompt.values():
+        if not isinstance(node, dict):
+            continue
+        for input_name, folder in LOADER_INPUTS.get(node.get("class_type"), []):
+            value = node.get("inputs", {}).get(input_name)
+            # linked inputs are [node_id, output_index] and can't be known before running
+            if isinstance(value, str) and (folder, value) not in files:
+                files.append((folder, value))
+    return files
+
+
+def prompt_main_models(prompt: dict) -> frozenset[tuple[str, str]]:
+    return frozenset(f for f in prompt_model_files(prompt) if f[0] in MAIN_MODEL_FOLDERS)
@@ -178,16 +178,16 @@ class SaveAudio:
                     metadata[x] = json.dumps(extra_pnginfo[x])
 
         for (batch_number, waveform) in enumerate(audio["waveform"].cpu()):
-            filename_with_batch_num = filename.replace("%batch_num%", str(batch_number))
-            file = f"{filename_with_batch_num}_{counter:05}_.flac"
+            file, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "flac", batch_number)
 
-            buff = io.BytesIO()
-            torchaudio.save(buff, waveform, audio["sample_rate"], format="FLAC")
+            with folder_paths.remove_on_error(os.path.join(full_output_folder, file)) as path:
+                buff = io.BytesIO()
+                torchaudio.save(buff, waveform, audio["sample_rate"], format="FLAC")
 
-            buff = insert_or_replace_vorbis_comment(buff, metadata)
+                buff = insert_or_replace_vorbis_comment(buff, metadata)
 
-            with open(os.path.join(full_output_folder, file), 'wb') as f:
-                f.write(buff.getbuffer())
+                with open(path, 'wb') as f:
+                    f.write(buff.getbuffer())
 
             results.append({
                 "filename": file,
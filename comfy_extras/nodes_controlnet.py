@@ -24,6 +24,23 @@ class SetUnionControlNetType:
 
         return (control_net,)
 
+class ControlNetReuseOutput:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": {"control_net": ("CONTROL_NET", ),
+                             "sigma_window": ("FLOAT", {"default": 0.1, "min": 0.0, "max": 1.0, "step": 0.01, "tooltip": "The output of the controlnet is reused for the next steps while the sigma is within this fraction of the sigma it was computed at. 0 disables the reuse."}),
+                             }}
+
+    CATEGORY = "conditioning/controlnet"
+    RETURN_TYPES = ("CONTROL_NET",)
+
+    FUNCTION = "set_reuse"
+
+    def set_reuse(self, control_net, sigma_window):
+        control_net = control_net.copy()
+        control_net.set_cache_sigma_window(sigma_window)
+        return (control_net,)
+
 class ControlNetInpaintingAliMamaApply(nodes.ControlNetApplyAdvanced):
     @classmethod
     def INPUT_TYPES(s):
@@ -56,5 +73,6 @@ class ControlNetInpaintingAliMamaApply(nodes.ControlNetApplyAdvanced):
 
 NODE_CLASS_MAPPINGS = {
     "SetUnionControlNetType": SetUnionControlNetType,
+    "ControlNetReuseOutput": ControlNetReuseOutput,
     "ControlNetInpaintingAliMamaApply": ControlNetInpaintingAliMamaApply,
 }
@@ -89,18 +89,125 @@ class VAEDecodeHunyuan3D:
                              "vae": ("VAE", ),
                              "num_chunks": ("INT", {"default": 8000, "min": 1000, "max": 500000}),
                              "octree_resolution": ("INT", {"default": 256, "min": 16, "max": 512}),
+                             },
+                "optional": {"octree_levels": ("INT", {"default": 0, "min": 0, "max": 5, "tooltip": "Decode a grid 2^levels times coarser first and only refine it around the surface. 0 decodes the full grid."}),
+                             "surface_threshold": ("FLOAT", {"default": 0.6, "min": -1.0, "max": 1.0, "step": 0.01, "tooltip": "Threshold of the surface the refinement follows, use the one of the node making the mesh."}),
                              }}
     RETURN_TYPES = ("VOXEL",)
     FUNCTION = "decode"
 
     CATEGORY = "latent/3d"
 
-    def decode(self, vae, samples, num_chunks, octree_resolution):
-        voxels = VOXEL(vae.decode(samples["samples"], vae_options={"num_chunks": num_chunks, "octree_resolution": octree_resolution}))
+    def decode(self, vae, samples, num_chunks, octree_resolution, octree_levels=0, surface_threshold=0.6):
+        voxels = VOXEL(vae.decode(samples["samples"], vae_options={"num_chunks": num_chunks, "octree_resolution": octree_resolution,
+                                                                   "octree_levels": octree_levels, "mc_level": surface_threshold}))
         return (voxels, )
 
 
-def voxel_to_mesh(voxels, threshold=0.5, device=None):
+def cluster_vertices(vertices, faces, cell_size):
+    """
+    Vertex clustering decimation: the vertices in the same cell_size sized cube are merged into their mean
+    and the faces that collapse are dropped.
+    """
+    keys = torch.floor(vertices / cell_size).long()
+    keys, inverse = torch.unique(keys, dim=0, return_inverse=True)
+    counts = torch.bincount(inverse, minlength=keys.shape[0]).unsqueeze(1)
+    vertices = torch.zeros((keys.shape[0], 3), dtype=vertices.dtype, device=vertices.device).index_add_(0, inverse, vertices) / counts
+    faces = inverse[faces]
+    keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])
+    faces = faces[keep]
+    # faces that became the same one, compared after rotating their smallest vertex first to keep the winding
+    first = faces.argmin(dim=1, keepdim=True)
+    faces = faces.gather(1, (first + torch.arange(3, device=faces.device)) % 3)
+    return vertices, torch.unique(faces, dim=0)
+
+
+def normalize_vertices(vertices, shape):
+    v_min = 0
+    v_max = max(shape)
+
+    vertices = vertices - (v_min + v_max) / 2
+
+    scale = (v_max - v_min) / 2
+    if scale > 0:
+        vertices = vertices / scale
+
+    return torch.fliplr(vertices)
+
+
+# corners of a cell as offsets from its first corner, and the 12 edges of the cell as pairs of corners
+CELL_CORNERS = [[(i >> 2) & 1, (i >> 1) & 1, i & 1] for i in range(8)]
+CELL_EDGES = [(a, b) for a in range(8) for b in range(a + 1, 8) if bin(a ^ b).count("1") == 1]
+
+
+def voxel_to_mesh_surface_net(voxels, threshold=0.5, device=None, decimation=1):
+    """
+    Surface nets mesher: one vertex per cell of the sample grid the surface goes through, placed at the mean of
+    the points where the surface crosses the cell edges, and one quad per crossed edge joining the vertices of
+    the four cells around it. Vertices are shared by the faces, fully vectorized.
+    """
+    if device is None:
+        device = torch.device("cpu")
+    voxels = voxels.to(device).float()
+
+    # outside everywhere past the volume so the surface is closed
+    padded = torch.nn.functional.pad(voxels, (1, 1, 1, 1, 1, 1), 'constant', threshold - 1.0)
+    inside = padded > threshold
+    D, H, W = padded.shape
+
+    corners = torch.tensor(CELL_CORNERS, device=device)
+    corners_inside = sum(inside[dz:D - 1 + dz, dy:H - 1 + dy, dx:W - 1 + dx].int() for dz, dy, dx in CELL_CORNERS)
+    active = (corners_inside > 0) & (corners_inside < 8)
+    cells = active.nonzero()
+    if cells.shape[0] == 0:
+        return torch.zeros((1, 3)), torch.zeros((1, 3))
+
+    corner_points = cells.unsqueeze(1) + corners
+    values = padded[corner_points[..., 0], corner_points[..., 1], corner_points[..., 2]]
+    edges = torch.tensor(CELL_EDGES, device=device)
+    start, end = values[:, edges[:, 0]], values[:, edges[:, 1]]
+    crossed = (start > threshold) != (end > threshold)
+    t = torch.where(crossed, (threshold - start) / (end - start), 0).clamp(0, 1)
+    points = corners[edges[:, 0]] + t.unsqueeze(-1) * (corners[edges[:, 1]] - corners[edges[:, 0]])
+    vertices = cells + (points * crossed.unsqueeze(-1)).sum(1) / crossed.sum(1, keepdim=True)
+    # sample i of the volume is the center of voxel i of voxel_to_mesh
+    vertices = vertices - 0.5
+
+    cell_index = torch.full(active.shape, -1, dtype=torch.long, device=device)
+    cell_index[active] = torch.arange(cells.shape[0], device=device)
+
+    faces = []
+    for axis in range(3):
+        u, v = (axis + 1) % 3, (axis + 2) % 3
+        # edges along axis starting at p, the points on the border of the padding are never inside
+        step = [0, 0, 0]
+        step[axis] = 1
+        first = inside[1 - step[0]:D - 1, 1 - step[1]:H - 1, 1 - step[2]:W - 1]
+        second = inside[1:D - 1 + step[0], 1:H - 1 + step[1], 1:W - 1 + step[2]]
+        p = (first != second).nonzero() + torch.tensor([1 - s for s in step], device=device)
+        if p.shape[0] == 0:
+            continue
+
+        def cell(du, dv):
+            c = p.clone()
+            c[:, u] -= du
+            c[:, v] -= dv
+            return cell_index[c[:, 0], c[:, 1], c[:, 2]]
+
+        quads = torch.stack([cell(1, 1), cell(0, 1), cell(0, 0), cell(1, 0)], dim=1)
+        # facing away from the inside end of the edge, torch.fliplr in normalize_vertices mirrors the winding
+        flip = inside[p[:, 0], p[:, 1], p[:, 2]]
+        quads[flip] = quads[flip].flip(1)
+        faces.append(quads[:, [0, 1, 2]])
+        faces.append(quads[:, [0, 2, 3]])
+    faces = torch.cat(faces, dim=0)
+
+    if decimation > 1:
+        vertices, faces = cluster_vertices(vertices, faces, decimation)
+    return normalize_vertices(vertices, voxels.shape), faces
+
+
+def voxel_to_mesh(voxels, threshold=0.5, device=None, decimation=1):
     if device is None:
         device = torch.device("cpu")
     voxels = voxels.to(device)
@@ -197,17 +304,9 @@ def voxel_to_mesh(voxels, threshold=0.5, device=None):
         vertices = torch.zeros((1, 3))
         faces = torch.zeros((1, 3))
 
-    v_min = 0
-    v_max = max(voxels.shape)
-
-    vertices = vertices - (v_min + v_max) / 2
-
-    scale = (v_max - v_min) / 2
-    if scale > 0:
-        vertices = vertices / scale
-
-    vertices = torch.fliplr(vertices)
-    return vertices, faces
+    if decimation > 1 and len(all_vertices) > 0:
+        vertices, faces = cluster_vertices(vertices.float(), faces, decimation)
+    return normalize_vertices(vertices, voxels.shape), faces
 
 
 class MESH:
@@ -221,17 +320,21 @@ class VoxelToMeshBasic:
     def INPUT_TYPES(s):
         return {"required": {"voxel": ("VOXEL", ),
                              "threshold": ("FLOAT", {"default": 0.6, "min": -1.0, "max": 1.0, "step": 0.01}),
+                             },
+                "optional": {"algorithm": (["basic", "surface net"], {"tooltip": "basic makes a cube face for every exposed voxel face, surface net makes a smooth mesh with shared vertices."}),
+                             "decimation": ("INT", {"default": 1, "min": 1, "max": 16, "tooltip": "Merge the vertices within cubes of this many voxels, 1 keeps them all."}),
                              }}
     RETURN_TYPES = ("MESH",)
     FUNCTION = "decode"
 
     CATEGORY = "3d"
 
-    def decode(self, voxel, threshold):
+    def decode(self, voxel, threshold, algorithm="basic", decimation=1):
+        mesher = voxel_to_mesh_surface_net if algorithm == "surface net" else voxel_to_mesh
         vertices = []
         faces = []
         for x in voxel.data:
-            v, f = voxel_to_mesh(x, threshold=threshold, device=None)
+            v, f = mesher(x, threshold=threshold, device=None, decimation=decimation)
             vertices.append(v)
             faces.append(f)
 
@@ -394,8 +497,9 @@ class SaveGLB:
                     metadata[x] = json.dumps(extra_pnginfo[x])
 
         for i in range(mesh.vertices.shape[0]):
-            f = f"{filename}_{counter:05}_.glb"
-            save_glb(mesh.vertices[i], mesh.faces[i], os.path.join(full_output_folder, f), metadata)
+            f, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "glb")
+            with folder_paths.remove_on_error(os.path.join(full_output_folder, f)) as path:
+                save_glb(mesh.vertices[i], mesh.faces[i], path, metadata)
             results.append({
                 "filename": f,
                 "subfolder": subfolder,
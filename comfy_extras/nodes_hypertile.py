@@ -1,6 +1,7 @@
 #Taken from: https://github.com/tfernd/HyperTile/
 
 import math
+import torch
 from einops import rearrange
 # Use torch rng for consistency across generations
 from torch import randint
@@ -70,10 +71,48 @@ class HyperTile:
                 out = rearrange(out, "b nh nw (h w) c -> b (nh h nw w) c", h=h // nh, w=w // nw)
             return out
 
+        # DiT models: all the attention layers see the full resolution, the image tokens at the end of the joint
+        # attention are split in tiles that each attend to themselves and a copy of the text tokens
+        self.dit_temp = None
+
+        def hypertile_dit_in(q, k, v, extra_options):
+            token_grid = extra_options.get("token_grid")
+            if token_grid is None or q.shape[1] != k.shape[1]:
+                return q, k, v
+            image_tokens = math.prod(token_grid)
+            text_tokens = q.shape[1] - image_tokens
+            if text_tokens < 0:
+                return q, k, v
+
+            h, w = token_grid[-2:]
+            frames = image_tokens // (h * w)
+            tile_tokens = max(1, round(latent_tile_size * w / extra_options["original_shape"][-1]))
+            nh = random_divisor(h, tile_tokens, swap_size)
+            nw = random_divisor(w, tile_tokens, swap_size)
+            if nh * nw <= 1:
+                return q, k, v
+
+            def split(x):
+                tiles = rearrange(x[:, text_tokens:], "b (f nh h nw w) c -> (b nh nw) (f h w) c", f=frames, h=h // nh, w=w // nw, nh=nh, nw=nw)
+                return torch.cat((x[:, :text_tokens].repeat_interleave(nh * nw, dim=0), tiles), dim=1)
+            self.dit_temp = (nh, nw, h, w, frames, text_tokens)
+            return split(q), split(k), split(v)
+
+        def hypertile_dit_out(out, extra_options):
+            if self.dit_temp is None:
+                return out
+            nh, nw, h, w, frames, text_tokens = self.dit_temp
+            self.dit_temp = None
+            image = rearrange(out[:, text_tokens:], "(b nh nw) (f h w) c -> b (f nh h nw w) c", f=frames, h=h // nh, w=w // nw, nh=nh, nw=nw)
+            # every tile attended with its own copy of the text tokens
+            text = out[:, :text_tokens].unflatten(0, (-1, nh * nw)).mean(dim=1)
+            return torch.cat((text, image), dim=1)
 
         m = model.clone()
         m.set_model_attn1_patch(hypertile_in)
         m.set_model_attn1_output_patch(hypertile_out)
+        m.set_model_patch(hypertile_dit_in, "dit_attn_patch")
+        m.set_model_patch(hypertile_dit_out, "dit_attn_output_patch")
         return (m, )
 
 NODE_CLASS_MAPPINGS = {
@@ -2,12 +2,13 @@ from __future__ import annotations
 
 import nodes
 import folder_paths
+import comfy.utils
 from comfy.cli_args import args
+from comfy_execution.output_writer import output_writer
 
 from PIL import Image
 from PIL.PngImagePlugin import PngInfo
 
-import numpy as np
 import json
 import os
 
@@ -71,6 +72,10 @@ class ImageFromBatch:
         s = s_in[batch_index:batch_index + length].clone()
         return (s,)
 
+def uint8_to_pil(images):
+    # Pillow's animated writers need every frame up front, so only the float conversion is chunked
+    return [Image.fromarray(frame) for chunk in comfy.utils.images_to_uint8(images) for frame in chunk]
+
 class SaveAnimatedWEBP:
     def __init__(self):
         self.output_dir = folder_paths.get_output_directory()
@@ -81,7 +86,7 @@ class SaveAnimatedWEBP:
     @classmethod
     def INPUT_TYPES(s):
         return {"required":
-                    {"images": ("IMAGE", ),
+                    {"images": ("IMAGE,IMAGE_STREAM", ),
                      "filename_prefix": ("STRING", {"default": "ComfyUI"}),
                      "fps": ("FLOAT", {"default": 6.0, "min": 0.01, "max": 1000.0, "step": 0.01}),
                      "lossless": ("BOOLEAN", {"default": True}),
@@ -100,15 +105,11 @@ class SaveAnimatedWEBP:
     CATEGORY = "image/animation"
 
     def save_images(self, images, fps, filename_prefix, lossless, quality, method, num_frames=0, prompt=None, extra_pnginfo=None):
+        pil_images = uint8_to_pil(images)
         method = self.methods.get(method)
         filename_prefix += self.prefix_append
-        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
+        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, pil_images[0].width, pil_images[0].height)
         results: list[FileLocator] = []
-        pil_images = []
-        for image in images:
-            i = 255. * image.cpu().numpy()
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-            pil_images.append(img)
 
         metadata = pil_images[0].getexif()
         if not args.disable_metadata:
@@ -125,8 +126,8 @@ class SaveAnimatedWEBP:
 
         c = len(pil_images)
         for i in range(0, c, num_frames):
-            file = f"{filename}_{counter:05}_.webp"
-            pil_images[i].save(os.path.join(full_output_folder, file), save_all=True, duration=int(1000.0/fps), append_images=pil_images[i + 1:i + num_frames], exif=metadata, lossless=lossless, quality=quality, method=method)
+            file, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "webp")
+            output_writer.submit_file(pil_images[i].save, os.path.join(full_output_folder, file), save_all=True, duration=int(1000.0/fps), append_images=pil_images[i + 1:i + num_frames], exif=metadata, lossless=lossless, quality=quality, method=method)
             results.append({
                 "filename": file,
                 "subfolder": subfolder,
@@ -146,7 +147,7 @@ class SaveAnimatedPNG:
     @classmethod
     def INPUT_TYPES(s):
         return {"required":
-                    {"images": ("IMAGE", ),
+                    {"images": ("IMAGE,IMAGE_STREAM", ),
                      "filename_prefix": ("STRING", {"default": "ComfyUI"}),
                      "fps": ("FLOAT", {"default": 6.0, "min": 0.01, "max": 1000.0, "step": 0.01}),
                      "compress_level": ("INT", {"default": 4, "min": 0, "max": 9})
@@ -162,14 +163,10 @@ class SaveAnimatedPNG:
     CATEGORY = "image/animation"
 
     def save_images(self, images, fps, compress_level, filename_prefix="ComfyUI", prompt=None, extra_pnginfo=None):
+        pil_images = uint8_to_pil(images)
         filename_prefix += self.prefix_append
-        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
+        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, pil_images[0].width, pil_images[0].height)
         results = list()
-        pil_images = []
-        for image in images:
-            i = 255. * image.cpu().numpy()
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-            pil_images.append(img)
 
         metadata = None
         if not args.disable_metadata:
@@ -180,8 +177,8 @@ class SaveAnimatedPNG:
                 for x in extra_pnginfo:
                     metadata.add(b"comf", x.encode("latin-1", "strict") + b"\0" + json.dumps(extra_pnginfo[x]).encode("latin-1", "strict"), after_idat=True)
 
-        file = f"{filename}_{counter:05}_.png"
-        pil_images[0].save(os.path.join(full_output_folder, file), pnginfo=metadata, compress_level=compress_level, save_all=True, duration=int(1000.0/fps), append_images=pil_images[1:])
+        file, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "png")
+        output_writer.submit_file(pil_images[0].save, os.path.join(full_output_folder, file), pnginfo=metadata, compress_level=compress_level, save_all=True, duration=int(1000.0/fps), append_images=pil_images[1:])
         results.append({
             "filename": file,
             "subfolder": subfolder,
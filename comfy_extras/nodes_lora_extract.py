@@ -4,11 +4,47 @@ import comfy.utils
 import folder_paths
 import os
 import logging
+import functools
+import concurrent.futures
 from enum import Enum
 
 CLAMP_QUANTILE = 0.99
+# extra random directions and power iterations of the randomized svd
+RANDOMIZED_OVERSAMPLE = 8
+RANDOMIZED_POWER_ITERATIONS = 2
+MAX_WORKERS = 4
+# bytes an extraction needs per element of the weight: the float32 diff, its svd and the temporaries
+EXTRACTION_BYTES_PER_ELEMENT = 16
+# weight dims extract_lora supports: linear and conv2d
+LORA_WEIGHT_DIMS = (2, 4)
+
+class SVDType(Enum):
+    FULL = 0
+    RANDOMIZED = 1
+
+SVD_TYPES = {"full": SVDType.FULL,
+             "randomized": SVDType.RANDOMIZED}
+
+def randomized_svd(a, rank, niter=RANDOMIZED_POWER_ITERATIONS, oversample=RANDOMIZED_OVERSAMPLE, seed=0):
+    """Truncated svd of the rank biggest singular values from a random projection refined by a few power iterations."""
+    q = min(rank + oversample, *a.shape)
+    generator = torch.Generator(device=a.device).manual_seed(seed)
+    y = torch.linalg.qr(a @ torch.randn(a.shape[1], q, generator=generator, device=a.device, dtype=a.dtype)).Q
+    for _ in range(niter):
+        y = torch.linalg.qr(a.mT @ y).Q
+        y = torch.linalg.qr(a @ y).Q
+    U, S, Vh = torch.linalg.svd(y.mT @ a, full_matrices=False)
+    return (y @ U)[:, :rank], S[:rank], Vh[:rank]
+
+def lora_shapes(shape, rank):
+    """Shapes of the up and down weights extract_lora returns for a diff of this shape."""
+    out_dim, in_dim = shape[0:2]
+    rank = min(rank, in_dim, out_dim)
+    if len(shape) == 4:
+        return (out_dim, rank, 1, 1), (rank, in_dim, shape[2], shape[3])
+    return (out_dim, rank), (rank, in_dim)
 
-def extract_lora(diff, rank):
+def extract_lora(diff, rank, svd_type=SVDType.FULL):
     conv2d = (len(diff.shape) == 4)
     kernel_size = None if not conv2d else diff.size()[2:4]
     conv2d_3x3 = conv2d and kernel_size != (1, 1)
@@ -22,7 +58,10 @@ def extract_lora(diff, rank):
             diff = diff.squeeze()
 
 
-    U, S, Vh = torch.linalg.svd(diff.float())
+    if svd_type == SVDType.RANDOMIZED:
+        U, S, Vh = randomized_svd(diff.float(), rank)
+    else:
+        U, S, Vh = torch.linalg.svd(diff.float(), full_matrices=False)
     U = U[:, :rank]
     S = S[:rank]
     U = U @ torch.diag(S)
@@ -46,31 +85,67 @@ class LORAType(Enum):
 LORA_TYPES = {"standard": LORAType.STANDARD,
               "full_diff": LORAType.FULL_DIFF}
 
-def calc_lora_model(model_diff, rank, prefix_model, prefix_lora, output_sd, lora_type, bias_diff=False):
-    comfy.model_management.load_models_gpu([model_diff], force_patch_weights=True)
-    sd = model_diff.model_state_dict(filter_prefix=prefix_model)
-
-    for k in sd:
+def extract_lora_key(k, weight_diff, rank, svd_type):
+    up_shape, down_shape = lora_shapes(weight_diff.shape, rank)
+    try:
+        up, down = extract_lora(weight_diff.load(), rank, svd_type)
+        return up.contiguous().half().cpu(), down.contiguous().half().cpu()
+    except Exception:
+        # the file header already lists the key, a zero lora doesn't change the weight
+        logging.warning("Could not generate lora weights for key {}, is the weight difference a zero?".format(k))
+        return torch.zeros(up_shape, dtype=torch.float16), torch.zeros(down_shape, dtype=torch.float16)
+
+def lazy_half(weight_diff):
+    load = weight_diff.load if isinstance(weight_diff, comfy.utils.LazyTensor) else lambda: weight_diff
+    return comfy.utils.LazyTensor(weight_diff.shape, torch.float16, lambda: load().contiguous().half().cpu())
+
+def calc_lora_model(model_diff, rank, prefix_model, prefix_lora, output_sd, lora_type, bias_diff=False, svd_type=SVDType.FULL, executor=None):
+    """
+    Adds the lora weights of the model diff to output_sd as LazyTensors to save with save_torch_file_streaming. The
+    diff of each weight is only calculated when extracting its lora, on the executor threads when there is one.
+    """
+    sd = model_diff.lazy_state_dict(filter_prefix=prefix_model)
+
+    # in the order the file gets written so the extractions finish when they are needed
+    for k in sorted(sd):
         if k.endswith(".weight"):
             weight_diff = sd[k]
             if lora_type == LORAType.STANDARD:
-                if weight_diff.ndim < 2:
+                if len(weight_diff.shape) < 2:
                     if bias_diff:
-                        output_sd["{}{}.diff".format(prefix_lora, k[len(prefix_model):-7])] = weight_diff.contiguous().half().cpu()
+                        output_sd["{}{}.diff".format(prefix_lora, k[len(prefix_model):-7])] = lazy_half(weight_diff)
                     continue
-                try:
-                    out = extract_lora(weight_diff, rank)
-                    output_sd["{}{}.lora_up.weight".format(prefix_lora, k[len(prefix_model):-7])] = out[0].contiguous().half().cpu()
-                    output_sd["{}{}.lora_down.weight".format(prefix_lora, k[len(prefix_model):-7])] = out[1].contiguous().half().cpu()
-                except:
-                    logging.warning("Could not generate lora weights for key {}, is the weight difference a zero?".format(k))
+                if len(weight_diff.shape) not in LORA_WEIGHT_DIMS:
+                    # the file header lists every key before the extractions run so these are left out here
+                    logging.warning("Could not generate lora weights for key {}, {}D weights are not supported.".format(k, len(weight_diff.shape)))
+                    continue
+                if not isinstance(weight_diff, comfy.utils.LazyTensor):
+                    weight_diff = comfy.utils.LazyTensor(weight_diff.shape, weight_diff.dtype, lambda w=weight_diff: w)
+                if executor is not None:
+                    result = executor.submit(extract_lora_key, k, weight_diff, rank, svd_type).result
+                else:
+                    result = functools.cache(functools.partial(extract_lora_key, k, weight_diff, rank, svd_type))
+                up_shape, down_shape = lora_shapes(weight_diff.shape, rank)
+                output_sd["{}{}.lora_up.weight".format(prefix_lora, k[len(prefix_model):-7])] = comfy.utils.LazyTensor(up_shape, torch.float16, lambda result=result: result()[0])
+                output_sd["{}{}.lora_down.weight".format(prefix_lora, k[len(prefix_model):-7])] = comfy.utils.LazyTensor(down_shape, torch.float16, lambda result=result: result()[1])
             elif lora_type == LORAType.FULL_DIFF:
-                output_sd["{}{}.diff".format(prefix_lora, k[len(prefix_model):-7])] = weight_diff.contiguous().half().cpu()
+                output_sd["{}{}.diff".format(prefix_lora, k[len(prefix_model):-7])] = lazy_half(weight_diff)
 
         elif bias_diff and k.endswith(".bias"):
-            output_sd["{}{}.diff_b".format(prefix_lora, k[len(prefix_model):-5])] = sd[k].contiguous().half().cpu()
+            output_sd["{}{}.diff_b".format(prefix_lora, k[len(prefix_model):-5])] = lazy_half(sd[k])
     return output_sd
 
+def extraction_workers(model_patchers):
+    """How many loras get extracted at once, as many as the free memory of the load devices fits for the biggest weight."""
+    workers = MAX_WORKERS
+    for patcher in model_patchers:
+        sd = patcher.model_state_dict()
+        largest = max((sd[k].numel() for k in patcher.patches if k in sd), default=0)
+        if largest > 0:
+            free = comfy.model_management.get_free_memory(patcher.load_device)
+            workers = min(workers, max(1, int(free // (largest * EXTRACTION_BYTES_PER_ELEMENT))))
+    return workers
+
 class LoraSave:
     def __init__(self):
         self.output_dir = folder_paths.get_output_directory()
@@ -83,7 +158,8 @@ class LoraSave:
                               "bias_diff": ("BOOLEAN", {"default": True}),
                             },
                 "optional": {"model_diff": ("MODEL", {"tooltip": "The ModelSubtract output to be converted to a lora."}),
-                             "text_encoder_diff": ("CLIP", {"tooltip": "The CLIPSubtract output to be converted to a lora."})},
+                             "text_encoder_diff": ("CLIP", {"tooltip": "The CLIPSubtract output to be converted to a lora."}),
+                             "svd": (tuple(SVD_TYPES.keys()), {"default": "full", "tooltip": "randomized only calculates the singular vectors of the rank, it is a lot faster on big models and nearly as accurate."})},
     }
     RETURN_TYPES = ()
     FUNCTION = "save"
@@ -91,23 +167,32 @@ class LoraSave:
 
     CATEGORY = "_for_testing"
 
-    def save(self, filename_prefix, rank, lora_type, bias_diff, model_diff=None, text_encoder_diff=None):
+    def save(self, filename_prefix, rank, lora_type, bias_diff, model_diff=None, text_encoder_diff=None, svd="full"):
         if model_diff is None and text_encoder_diff is None:
             return {}
 
         lora_type = LORA_TYPES.get(lora_type)
+        svd_type = SVD_TYPES.get(svd)
         full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir)
 
-        output_sd = {}
-        if model_diff is not None:
-            output_sd = calc_lora_model(model_diff, rank, "diffusion_model.", "diffusion_model.", output_sd, lora_type, bias_diff=bias_diff)
-        if text_encoder_diff is not None:
-            output_sd = calc_lora_model(text_encoder_diff.patcher, rank, "", "text_encoders.", output_sd, lora_type, bias_diff=bias_diff)
-
-        output_checkpoint = f"{filename}_{counter:05}_.safetensors"
+        output_checkpoint, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "safetensors")
         output_checkpoint = os.path.join(full_output_folder, output_checkpoint)
 
-        comfy.utils.save_torch_file(output_sd, output_checkpoint, metadata=None)
+        # the layers are extracted in parallel and written as soon as they are done
+        patchers = [model_diff] if model_diff is not None else []
+        if text_encoder_diff is not None:
+            patchers.append(text_encoder_diff.patcher)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=extraction_workers(patchers), thread_name_prefix="lora_extract")
+        try:
+            output_sd = {}
+            if model_diff is not None:
+                output_sd = calc_lora_model(model_diff, rank, "diffusion_model.", "diffusion_model.", output_sd, lora_type, bias_diff=bias_diff, svd_type=svd_type, executor=executor)
+            if text_encoder_diff is not None:
+                output_sd = calc_lora_model(text_encoder_diff.patcher, rank, "", "text_encoders.", output_sd, lora_type, bias_diff=bias_diff, svd_type=svd_type, executor=executor)
+            with folder_paths.remove_on_error(output_checkpoint):
+                comfy.utils.save_torch_file_streaming(output_sd, output_checkpoint, metadata=None)
+        finally:
+            executor.shutdown(cancel_futures=True)
         return {}
 
 NODE_CLASS_MAPPINGS = {
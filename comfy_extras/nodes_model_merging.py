@@ -191,7 +191,6 @@ def save_checkpoint(model, clip=None, vae=None, clip_vision=None, filename_prefi
     if enable_modelspec:
         metadata["modelspec.sai_model_spec"] = "1.0.0"
         metadata["modelspec.implementation"] = "sgm"
-        metadata["modelspec.title"] = "{} {}".format(filename, counter)
 
     #TODO:
     # "stable-diffusion-v1", "stable-diffusion-v1-inpainting", "stable-diffusion-v2-512",
@@ -216,10 +215,13 @@ def save_checkpoint(model, clip=None, vae=None, clip_vision=None, filename_prefi
             for x in extra_pnginfo:
                 metadata[x] = json.dumps(extra_pnginfo[x])
 
-    output_checkpoint = f"{filename}_{counter:05}_.safetensors"
+    output_checkpoint, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "safetensors")
+    if enable_modelspec:
+        metadata["modelspec.title"] = "{} {}".format(filename, counter)
     output_checkpoint = os.path.join(full_output_folder, output_checkpoint)
 
-    comfy.sd.save_checkpoint(output_checkpoint, model, clip, vae, clip_vision, metadata=metadata, extra_keys=extra_keys)
+    with folder_paths.remove_on_error(output_checkpoint):
+        comfy.sd.save_checkpoint(output_checkpoint, model, clip, vae, clip_vision, metadata=metadata, extra_keys=extra_keys)
 
 class CheckpointSave:
     def __init__(self):
@@ -291,12 +293,13 @@ class CLIPSave:
 
             full_output_folder, filename, counter, subfolder, filename_prefix_ = folder_paths.get_save_image_path(filename_prefix_, self.output_dir)
 
-            output_checkpoint = f"{filename}_{counter:05}_.safetensors"
+            output_checkpoint, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "safetensors")
             output_checkpoint = os.path.join(full_output_folder, output_checkpoint)
 
             current_clip_sd = comfy.utils.state_dict_prefix_replace(current_clip_sd, replace_prefix)
 
-            comfy.utils.save_torch_file(current_clip_sd, output_checkpoint, metadata=metadata)
+            with folder_paths.remove_on_error(output_checkpoint):
+                comfy.utils.save_torch_file(current_clip_sd, output_checkpoint, metadata=metadata)
         return {}
 
 class VAESave:
@@ -327,10 +330,11 @@ class VAESave:
                 for x in extra_pnginfo:
                     metadata[x] = json.dumps(extra_pnginfo[x])
 
-        output_checkpoint = f"{filename}_{counter:05}_.safetensors"
+        output_checkpoint, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "safetensors")
         output_checkpoint = os.path.join(full_output_folder, output_checkpoint)
 
-        comfy.utils.save_torch_file(vae.get_sd(), output_checkpoint, metadata=metadata)
+        with folder_paths.remove_on_error(output_checkpoint):
+            comfy.utils.save_torch_file(vae.get_sd(), output_checkpoint, metadata=metadata)
         return {}
 
 class ModelSave:
@@ -143,6 +143,29 @@ def get_functions(x, ratio, original_shape):
     return nothing, nothing
 
 
+def get_dit_functions(x, ratio, token_grid):
+    """
+    Merge and unmerge functions for the tokens of a DiT attention. The image tokens are the last prod(token_grid)
+    tokens of x, only they get merged, the text tokens in front of them are kept.
+    """
+    image_tokens = math.prod(token_grid)
+    text_tokens = x.shape[1] - image_tokens
+    r = int(image_tokens * ratio)
+    if text_tokens < 0 or r <= 0:
+        nothing = lambda y: y
+        return nothing, nothing
+
+    # video frames are stacked as more rows
+    w = token_grid[-1]
+    m, u = bipartite_soft_matching_random2d(x[:, text_tokens:], w, image_tokens // w, 2, 2, r)
+
+    def merge(y):
+        return torch.cat((y[:, :text_tokens], m(y[:, text_tokens:])), dim=1)
+
+    def unmerge(y):
+        return torch.cat((y[:, :text_tokens], u(y[:, text_tokens:])), dim=1)
+    return merge, unmerge
+
 
 class TomePatchModel:
     @classmethod
@@ -165,9 +188,24 @@ class TomePatchModel:
         def tomesd_u(n, extra_options):
             return self.u(n)
 
+        # DiT models: only the queries are merged and the attention output is unmerged before the output projection
+        self.dit_u = None
+        def tomesd_dit_m(q, k, v, extra_options):
+            if "token_grid" not in extra_options:
+                return q, k, v
+            m, self.dit_u = get_dit_functions(q, ratio, extra_options["token_grid"])
+            return m(q), k, v
+        def tomesd_dit_u(n, extra_options):
+            if self.dit_u is None:
+                return n
+            u, self.dit_u = self.dit_u, None
+            return u(n)
+
         m = model.clone()
         m.set_model_attn1_patch(tomesd_m)
         m.set_model_attn1_output_patch(tomesd_u)
+        m.set_model_patch(tomesd_dit_m, "dit_attn_patch")
+        m.set_model_patch(tomesd_dit_u, "dit_attn_output_patch")
         return (m, )
 
 
@@ -1,20 +1,33 @@
-import torch
+import comfy.patcher_extension
+import comfy.torch_compile
+
+SHAPE_BUCKETS = {"none": (False, False),
+                 "batch": (True, False),
+                 "batch and resolution": (True, True)}
 
 class TorchCompileModel:
     @classmethod
     def INPUT_TYPES(s):
         return {"required": { "model": ("MODEL",),
                              "backend": (["inductor", "cudagraphs"],),
-                              }}
+                              },
+                "optional": {"shape_buckets": (tuple(SHAPE_BUCKETS.keys()), {"default": "none", "tooltip": "Pads the batch size to a power of two and the resolution to a multiple of {} latent pixels so fewer shapes get compiled, when both are padded the model is compiled for static shapes. Resolution padding repeats the edges and changes the result slightly.".format(comfy.torch_compile.RESOLUTION_MULTIPLE)})},
+                }
     RETURN_TYPES = ("MODEL",)
     FUNCTION = "patch"
 
     CATEGORY = "_for_testing"
     EXPERIMENTAL = True
 
-    def patch(self, model, backend):
+    def patch(self, model, backend, shape_buckets="none"):
+        batch_buckets, resolution_buckets = SHAPE_BUCKETS[shape_buckets]
         m = model.clone()
-        m.add_object_patch("diffusion_model", torch.compile(model=m.get_model_object("diffusion_model"), backend=backend))
+        # replacing the weight tensors when patching loras would make torch.compile recompile the model
+        m.weight_inplace_update = True
+        # only a few shapes are left when both are bucketed, otherwise the resolution varies and stays dynamic
+        key, compiled = comfy.torch_compile.compiled_models.get(m, backend, dynamic=False if batch_buckets and resolution_buckets else None)
+        m.add_object_patch("diffusion_model", compiled)
+        m.add_wrapper_with_key(comfy.patcher_extension.WrappersMP.APPLY_MODEL, "torch_compile", comfy.torch_compile.CompiledModelWrapper(key, batch_buckets, resolution_buckets))
         return (m, )
 
 NODE_CLASS_MAPPINGS = {
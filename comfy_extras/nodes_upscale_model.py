@@ -1,4 +1,5 @@
 import logging
+import weakref
 from spandrel import ModelLoader, ImageModelDescriptor
 from comfy import model_management
 import torch
@@ -36,6 +37,10 @@ class UpscaleModelLoader:
         return (out, )
 
 
+# (tile size, max tiles per batch) that last worked for an upscale model on a device,
+# so later upscales don't have to run out of memory again to find them
+working_tile_sizes = weakref.WeakKeyDictionary()
+
 class ImageUpscaleWithModel:
     @classmethod
     def INPUT_TYPES(s):
@@ -56,23 +61,33 @@ class ImageUpscaleWithModel:
         model_management.free_memory(memory_required, device)
 
         upscale_model.to(device)
-        in_img = image.movedim(-1,-3).to(device)
+        in_img = image.movedim(-1,-3)
 
-        tile = 512
+        # tiles are copied from pinned memory so the copy of the next ones overlaps with the upscale
+        non_blocking = model_management.is_device_cuda(device) and model_management.device_supports_non_blocking(device)
+        tile, max_tiles_per_batch = working_tile_sizes.get(upscale_model.model, {}).get(device, (512, None))
         overlap = 32
 
         oom = True
         while oom:
+            tiles_per_batch = max(1, int(model_management.get_free_memory(device) / ((tile * tile * 3) * image.element_size() * max(upscale_model.scale, 1.0) * 384.0)))
+            if max_tiles_per_batch is not None:
+                tiles_per_batch = min(tiles_per_batch, max_tiles_per_batch)
             try:
                 steps = in_img.shape[0] * comfy.utils.get_tiled_scale_steps(in_img.shape[3], in_img.shape[2], tile_x=tile, tile_y=tile, overlap=overlap)
                 pbar = comfy.utils.ProgressBar(steps)
-                s = comfy.utils.tiled_scale(in_img, lambda a: upscale_model(a), tile_x=tile, tile_y=tile, overlap=overlap, upscale_amount=upscale_model.scale, pbar=pbar)
+                s = comfy.utils.tiled_scale_batched(in_img, lambda a: upscale_model(a), tile_x=tile, tile_y=tile, overlap=overlap, upscale_amount=upscale_model.scale, tiles_per_batch=tiles_per_batch,
+                                                    device=device, non_blocking=non_blocking, pbar=pbar)
                 oom = False
             except model_management.OOM_EXCEPTION as e:
-                tile //= 2
-                if tile < 128:
-                    raise e
-
+                if tiles_per_batch > 1:
+                    max_tiles_per_batch = tiles_per_batch // 2
+                else:
+                    tile //= 2
+                    if tile < 128:
+                        raise e
+
+        working_tile_sizes.setdefault(upscale_model.model, {})[device] = (tile, max_tiles_per_batch)
         upscale_model.to("cpu")
         s = torch.clamp(s.movedim(-3,-1), min=0, max=1.0)
         return (s,)
@@ -2,9 +2,11 @@ from __future__ import annotations
 
 import os
 import av
-import torch
+import itertools
+import numpy as np
 import folder_paths
 import json
+import comfy.utils
 from fractions import Fraction
 from comfy.comfy_types import FileLocator
 
@@ -18,7 +20,7 @@ class SaveWEBM:
     @classmethod
     def INPUT_TYPES(s):
         return {"required":
-                    {"images": ("IMAGE", ),
+                    {"images": ("IMAGE,IMAGE_STREAM", ),
                      "filename_prefix": ("STRING", {"default": "ComfyUI"}),
                      "codec": (["vp9", "av1"],),
                      "fps": ("FLOAT", {"default": 24.0, "min": 0.01, "max": 1000.0, "step": 0.01}),
@@ -37,33 +39,44 @@ class SaveWEBM:
     EXPERIMENTAL = True
 
     def save_images(self, images, codec, fps, filename_prefix, crf, prompt=None, extra_pnginfo=None):
-        filename_prefix += self.prefix_append
-        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
-
-        file = f"{filename}_{counter:05}_.webm"
-        container = av.open(os.path.join(full_output_folder, file), mode="w")
-
-        if prompt is not None:
-            container.metadata["prompt"] = json.dumps(prompt)
-
-        if extra_pnginfo is not None:
-            for x in extra_pnginfo:
-                container.metadata[x] = json.dumps(extra_pnginfo[x])
-
-        codec_map = {"vp9": "libvpx-vp9", "av1": "libaom-av1"}
-        stream = container.add_stream(codec_map[codec], rate=Fraction(round(fps * 1000), 1000))
-        stream.width = images.shape[-2]
-        stream.height = images.shape[-3]
-        stream.pix_fmt = "yuv420p"
-        stream.bit_rate = 0
-        stream.options = {'crf': str(crf)}
+        # frames of an IMAGE_STREAM are converted and encoded as they are decoded
+        chunks = comfy.utils.images_to_uint8(images)
+        first = next(chunks)
+        chunks = itertools.chain([first], chunks)
 
-        for frame in images:
-            frame = av.VideoFrame.from_ndarray(torch.clamp(frame[..., :3] * 255, min=0, max=255).to(device=torch.device("cpu"), dtype=torch.uint8).numpy(), format="rgb24")
-            for packet in stream.encode(frame):
-                container.mux(packet)
-        container.mux(stream.encode())
-        container.close()
+        filename_prefix += self.prefix_append
+        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, first.shape[2], first.shape[1])
+
+        file, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "webm")
+        with folder_paths.remove_on_error(os.path.join(full_output_folder, file)) as path:
+            container = av.open(path, mode="w")
+
+            if prompt is not None:
+                container.metadata["prompt"] = json.dumps(prompt)
+
+            if extra_pnginfo is not None:
+                for x in extra_pnginfo:
+                    container.metadata[x] = json.dumps(extra_pnginfo[x])
+
+            codec_map = {"vp9": "libvpx-vp9", "av1": "libaom-av1"}
+            stream = container.add_stream(codec_map[codec], rate=Fraction(round(fps * 1000), 1000))
+            stream.width = first.shape[2]
+            stream.height = first.shape[1]
+            stream.pix_fmt = "yuv420p"
+            stream.bit_rate = 0
+            stream.options = {'crf': str(crf)}
+
+            def encode(chunk):
+                for frame in chunk:
+                    frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(frame[..., :3]), format="rgb24")
+                    for packet in stream.encode(frame):
+                        container.mux(packet)
+
+            try:
+                comfy.utils.consume_in_background(chunks, encode)
+                container.mux(stream.encode())
+            finally:
+                container.close()
 
         results: list[FileLocator] = [{
             "filename": file,
@@ -74,6 +87,44 @@ class SaveWEBM:
         return {"ui": {"images": results, "animated": (True,)}}  # TODO: frontend side
 
 
+class ImageStream:
+    """IMAGE_STREAM value, every iteration decodes the latents again and yields IMAGE chunks in frame order."""
+    def __init__(self, vae, samples, tile_t, overlap_t):
+        self.vae = vae
+        self.samples = samples
+        self.tile_t = tile_t
+        self.overlap_t = overlap_t
+
+    def __iter__(self):
+        return self.vae.decode_stream(self.samples, tile_t=self.tile_t, overlap_t=self.overlap_t)
+
+
+class VAEDecodeStream:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": {"samples": ("LATENT", ), "vae": ("VAE", ),
+                             "temporal_size": ("INT", {"default": 0, "min": 0, "max": 4096, "step": 4, "tooltip": "Only used for video VAEs that can't decode one latent frame at a time: Amount of frames to decode at a time, 0 picks it from the free memory."}),
+                             "temporal_overlap": ("INT", {"default": 8, "min": 4, "max": 4096, "step": 4, "tooltip": "Only used for video VAEs that can't decode one latent frame at a time: Amount of frames to overlap."}),
+                             }}
+    RETURN_TYPES = ("IMAGE_STREAM",)
+    FUNCTION = "decode"
+
+    CATEGORY = "latent/video"
+
+    EXPERIMENTAL = True
+
+    DESCRIPTION = "Decodes video latents lazily, chunk by chunk, while the connected save node encodes them so the whole decoded video never has to fit in memory."
+
+    def decode(self, vae, samples, temporal_size, temporal_overlap):
+        temporal_compression = vae.temporal_compression_decode() or 1
+        tile_t = None
+        if temporal_size > 0:
+            tile_t = max(2, temporal_size // temporal_compression)
+        overlap_t = max(1, temporal_overlap // temporal_compression)
+        return (ImageStream(vae, samples["samples"], tile_t, overlap_t), )
+
+
 NODE_CLASS_MAPPINGS = {
     "SaveWEBM": SaveWEBM,
+    "VAEDecodeStream": VAEDecodeStream,
 }
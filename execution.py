@@ -1,12 +1,12 @@
 import sys
 import copy
+import json
 import logging
 import threading
 import heapq
 import time
 import traceback
 from enum import Enum
-import inspect
 from typing import List, Literal, NamedTuple, Optional
 
 import torch
@@ -17,6 +17,10 @@ from comfy_execution.graph import get_input_info, ExecutionList, DynamicPrompt,
 from comfy_execution.graph_utils import is_link, GraphBuilder
 from comfy_execution.caching import HierarchicalCache, LRUCache, CacheKeySetInputSignature, CacheKeySetID
 from comfy_execution.validation import validate_node_input
+from comfy_execution.node_metadata import node_metadata_cache
+from comfy_execution.output_writer import output_writer
+from comfy_execution.history_store import HistoryStore
+from comfy_execution.prompt_models import prompt_main_models
 
 class ExecutionResult(Enum):
     SUCCESS = 0
@@ -88,7 +92,7 @@ class CacheSet:
         return result
 
 def get_input_data(inputs, class_def, unique_id, outputs=None, dynprompt=None, extra_data={}):
-    valid_inputs = class_def.INPUT_TYPES()
+    valid_inputs = node_metadata_cache.get(class_def).input_types
     input_data_all = {}
     missing_keys = {}
     for x in inputs:
@@ -245,6 +249,27 @@ def format_value(x):
     else:
         return str(x)
 
+def send_executed(server, message, client_id, pending_writes, node_type, executed):
+    """Sends the executed message of an output node, or an execution_error if writing one of its files failed."""
+    errors = [f.exception() for f in pending_writes if f.exception() is not None]
+    if len(errors) == 0:
+        server.send_sync("executed", message, client_id)
+        return
+    mes = {
+        "prompt_id": message["prompt_id"],
+        "node_id": message["node"],
+        "node_type": node_type,
+        "executed": executed,
+
+        "exception_message": "Failed to write output file: {}".format(errors[0]),
+        "exception_type": full_type_name(type(errors[0])),
+        "traceback": traceback.format_exception(type(errors[0]), errors[0], errors[0].__traceback__),
+        "current_inputs": [],
+        "current_outputs": [],
+    }
+    server.send_sync("execution_error", mes, client_id)
+
+
 def execute(server, dynprompt, caches, current_item, extra_data, executed, prompt_id, execution_list, pending_subgraph_results):
     unique_id = current_item
     real_node_id = dynprompt.get_real_node_id(unique_id)
@@ -282,6 +307,7 @@ def execute(server, dynprompt, caches, current_item, extra_data, executed, promp
             output_data = merge_result_data(resolved_outputs, class_def)
             output_ui = []
             has_subgraph = False
+            pending_writes = []
         else:
             input_data_all, missing_keys = get_input_data(inputs, class_def, unique_id, caches.outputs, dynprompt, extra_data)
             if server.client_id is not None:
@@ -324,7 +350,8 @@ def execute(server, dynprompt, caches, current_item, extra_data, executed, promp
                     return block
             def pre_execute_cb(call_index):
                 GraphBuilder.set_default_prefix(unique_id, call_index, 0)
-            output_data, output_ui, has_subgraph = get_output_data(obj, input_data_all, execution_block_cb=execution_block_cb, pre_execute_cb=pre_execute_cb)
+            with output_writer.collect() as pending_writes:
+                output_data, output_ui, has_subgraph = get_output_data(obj, input_data_all, execution_block_cb=execution_block_cb, pre_execute_cb=pre_execute_cb)
         if len(output_ui) > 0:
             caches.ui.set(unique_id, {
                 "meta": {
@@ -336,7 +363,10 @@ def execute(server, dynprompt, caches, current_item, extra_data, executed, promp
                 "output": output_ui
             })
             if server.client_id is not None:
-                server.send_sync("executed", { "node": unique_id, "display_node": display_node_id, "output": output_ui, "prompt_id": prompt_id }, server.client_id)
+                client_id = server.client_id
+                message = { "node": unique_id, "display_node": display_node_id, "output": output_ui, "prompt_id": prompt_id }
+                # the files of output nodes are written in the background, only announce them once they exist
+                output_writer.when_done(pending_writes, lambda: send_executed(server, message, client_id, pending_writes, class_type, list(executed)))
         if has_subgraph:
             cached_outputs = []
             new_node_ids = []
@@ -351,6 +381,7 @@ def execute(server, dynprompt, caches, current_item, extra_data, executed, promp
                     for node_id in new_graph.keys():
                         if dynprompt.has_node(node_id):
                             raise DuplicateNodeError(f"Attempt to add duplicate node {node_id}. Ensure node ids are unique and deterministic or use graph_utils.GraphBuilder.")
+                    nodes.load_lazy_custom_nodes(node_info["class_type"] for node_info in new_graph.values())
                     for node_id, node_info in new_graph.items():
                         new_node_ids.append(node_id)
                         display_id = node_info.get("override_display_id", unique_id)
@@ -423,6 +454,7 @@ class PromptExecutor:
         self.caches = CacheSet(self.lru_size)
         self.status_messages = []
         self.success = True
+        self.pending_writes = []
 
     def add_message(self, event, data: dict, broadcast: bool):
         data = {
@@ -472,7 +504,8 @@ class PromptExecutor:
         self.status_messages = []
         self.add_message("execution_start", { "prompt_id": prompt_id}, broadcast=False)
 
-        with torch.inference_mode():
+        with torch.inference_mode(), output_writer.collect() as pending_writes:
+            self.pending_writes = pending_writes
             dynamic_prompt = DynamicPrompt(prompt)
             is_changed_cache = IsChangedCache(dynamic_prompt, self.caches.outputs)
             for cache in self.caches.all:
@@ -540,18 +573,15 @@ def validate_inputs(prompt, item, validated):
     class_type = prompt[unique_id]['class_type']
     obj_class = nodes.NODE_CLASS_MAPPINGS[class_type]
 
-    class_inputs = obj_class.INPUT_TYPES()
-    valid_inputs = set(class_inputs.get('required',{})).union(set(class_inputs.get('optional',{})))
+    metadata = node_metadata_cache.get(obj_class)
+    class_inputs = metadata.input_types
+    valid_inputs = metadata.valid_inputs
 
     errors = []
     valid = True
 
-    validate_function_inputs = []
-    validate_has_kwargs = False
-    if hasattr(obj_class, "VALIDATE_INPUTS"):
-        argspec = inspect.getfullargspec(obj_class.VALIDATE_INPUTS)
-        validate_function_inputs = argspec.args
-        validate_has_kwargs = argspec.varkw is not None
+    validate_function_inputs = metadata.validate_function_inputs
+    validate_has_kwargs = metadata.validate_has_kwargs
     received_types = {}
 
     for x in valid_inputs:
@@ -589,7 +619,7 @@ def validate_inputs(prompt, item, validated):
 
             o_id = val[0]
             o_class_type = prompt[o_id]['class_type']
-            r = nodes.NODE_CLASS_MAPPINGS[o_class_type].RETURN_TYPES
+            r = node_metadata_cache.get(nodes.NODE_CLASS_MAPPINGS[o_class_type]).return_types
             received_type = r[val[1]]
             received_types[x] = received_type
             if 'input_types' not in validate_function_inputs and not validate_node_input(received_type, input_type):
@@ -767,6 +797,8 @@ def full_type_name(klass):
     return module + '.' + klass.__qualname__
 
 def validate_prompt(prompt):
+    nodes.load_lazy_custom_nodes(node.get('class_type', None) for node in prompt.values() if isinstance(node, dict))
+    node_metadata_cache.refresh()
     outputs = set()
     for x in prompt:
         if 'class_type' not in prompt[x]:
@@ -789,7 +821,7 @@ def validate_prompt(prompt):
             }
             return (False, error, [], [])
 
-        if hasattr(class_, 'OUTPUT_NODE') and class_.OUTPUT_NODE is True:
+        if node_metadata_cache.get(class_).output_node:
             outputs.add(x)
 
     if len(outputs) == 0:
@@ -876,37 +908,153 @@ def validate_prompt(prompt):
 
 MAXIMUM_HISTORY_SIZE = 10000
 
+# lanes of the queue by the "priority" of a prompt's extra_data, prompts sent with front run before all of them
+QUEUE_LANES = {"interactive": 1, "normal": 2, "batch": 3}
+
+def queue_lane(item):
+    if item[0] < 0:
+        return 0
+    return QUEUE_LANES.get(item[3].get("priority"), QUEUE_LANES["normal"])
+
+def queue_client(item):
+    return item[3].get("client_id", None)
+
+def load_client_weights(path):
+    """
+    Share of the queue of the client ids in a JSON file of {client_id: weight}, a client with weight 2 gets twice
+    as many prompts started as one with the default weight of 1 while both have prompts queued.
+    """
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            weights = json.load(f)
+        weights = {str(client): float(weight) for client, weight in weights.items()}
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        logging.error("Could not load the queue client weights {}: {}".format(path, e))
+        return {}
+    for client in [c for c, w in weights.items() if w <= 0]:
+        logging.warning("Ignoring the queue weight of client {}, it must be positive.".format(client))
+        del weights[client]
+    return weights
+
+# number of queued prompts whose model files are prefetched
+PREFETCH_LOOKAHEAD = 2
+
 class PromptQueue:
-    def __init__(self, server):
+    def __init__(self, server, history_path="", model_affinity=0, prefetcher=None, client_weights=None):
         self.server = server
         self.mutex = threading.RLock()
         self.not_empty = threading.Condition(self.mutex)
         self.task_counter = 0
         self.queue = []
+        # read-only copy of self.queue shared by get_current_queue calls until the queue changes
+        self.queue_snapshot = None
         self.currently_running = {}
-        self.history = {}
+        self.history = HistoryStore(history_path, max_items=MAXIMUM_HISTORY_SIZE)
         self.flags = {}
+        # weighted fair queueing: prompts started by each client divided by its weight, see prune_client_service
+        # for when they are dropped. Weights are by client id and default to 1.
+        self.client_service = {}
+        self.client_weights = client_weights if client_weights is not None else {}
+        # how many times a prompt may be overtaken by one using the main model of the last started prompt
+        self.model_affinity = model_affinity
+        self.last_models = frozenset()
+        self.item_models = {}
+        self.overtaken = {}
+        # reads the model files of the next prompts while the current one runs
+        self.prefetcher = prefetcher
         server.prompt_queue = self
 
     def put(self, item):
         with self.mutex:
+            client = queue_client(item)
+            if all(queue_client(x) != client for x in self.queue):
+                # a client coming back doesn't get credit for the time it had nothing queued
+                active = [self.client_service.get(queue_client(x), 0.0) for x in self.queue]
+                if len(active) > 0:
+                    self.client_service[client] = max(self.client_service.get(client, 0.0), min(active))
+            self.item_models[item[1]] = prompt_main_models(item[2])
             heapq.heappush(self.queue, item)
+            self.queue_snapshot = None
+            self.prefetch_upcoming()
             self.server.queue_updated()
             self.not_empty.notify()
 
+    def next_item(self):
+        """
+        The item to run next: the lane with the highest priority, within it the client with the least weighted
+        service and that client's oldest item. With model_affinity an item sharing a main model with the last
+        started prompt can overtake it.
+        """
+        lanes = [queue_lane(x) for x in self.queue]
+        lane = min(lanes)
+        candidates = [x for x, l in zip(self.queue, lanes) if l == lane]
+
+        def order(x):
+            return (self.client_service.get(queue_client(x), 0.0), x[0])
+
+        item = min(candidates, key=order)
+        if self.model_affinity > 0 and len(self.last_models) > 0 and self.item_models[item[1]].isdisjoint(self.last_models):
+            if self.overtaken.get(item[1], 0) < self.model_affinity:
+                match = min((x for x in candidates if not self.item_models[x[1]].isdisjoint(self.last_models)), key=order, default=None)
+                if match is not None:
+                    self.overtaken[item[1]] = self.overtaken.get(item[1], 0) + 1
+                    item = match
+        return item
+
     def get(self, timeout=None):
         with self.not_empty:
             while len(self.queue) == 0:
                 self.not_empty.wait(timeout=timeout)
                 if timeout is not None and len(self.queue) == 0:
                     return None
-            item = heapq.heappop(self.queue)
+            item = self.next_item()
+            self.queue.pop(next(x for x in range(len(self.queue)) if self.queue[x] is item))
+            heapq.heapify(self.queue)
+            self.queue_snapshot = None
+
+            client = queue_client(item)
+            self.client_service[client] = self.client_service.get(client, 0.0) + 1.0 / self.client_weights.get(client, 1.0)
+            models = self.item_models.pop(item[1], frozenset())
+            if len(models) > 0:
+                self.last_models = models
+            self.overtaken.pop(item[1], None)
+
             i = self.task_counter
             self.currently_running[i] = copy.deepcopy(item)
             self.task_counter += 1
+            self.prefetch_upcoming()
             self.server.queue_updated()
             return (item, i)
 
+    def prune_client_service(self):
+        """
+        Drops the service of the clients with nothing queued or running, when they come back put() starts them
+        at the least service of the queued clients.
+        """
+        active = {queue_client(x) for x in self.queue} | {queue_client(x) for x in self.currently_running.values()}
+        for client in list(self.client_service):
+            if client not in active:
+                del self.client_service[client]
+
+    def queued_count(self, client_id):
+        with self.mutex:
+            return sum(1 for x in self.queue if queue_client(x) == client_id)
+
+    def upcoming(self, count):
+        """The next count items get() will most likely return, model affinity isn't taken into account."""
+        with self.mutex:
+            return heapq.nsmallest(count, self.queue, key=lambda x: (queue_lane(x), self.client_service.get(queue_client(x), 0.0), x[0]))
+
+    def prefetch_upcoming(self):
+        if self.prefetcher is None:
+            return
+        current = None
+        if len(self.currently_running) > 0:
+            current = next(reversed(self.currently_running.values()))[2]
+        self.prefetcher.prefetch([x[2] for x in self.upcoming(PREFETCH_LOOKAHEAD)], current)
+
     class ExecutionStatus(NamedTuple):
         status_str: Literal['success', 'error']
         completed: bool
@@ -916,27 +1064,30 @@ class PromptQueue:
                   status: Optional['PromptQueue.ExecutionStatus']):
         with self.mutex:
             prompt = self.currently_running.pop(item_id)
-            if len(self.history) > MAXIMUM_HISTORY_SIZE:
-                self.history.pop(next(iter(self.history)))
 
             status_dict: Optional[dict] = None
             if status is not None:
-                status_dict = copy.deepcopy(status._asdict())
+                status_dict = status._asdict()
 
-            self.history[prompt[1]] = {
+            entry = {
                 "prompt": prompt,
                 "outputs": {},
                 'status': status_dict,
             }
-            self.history[prompt[1]].update(history_result)
+            entry.update(history_result)
+            self.history.add(prompt[1], entry)
+            self.prune_client_service()
             self.server.queue_updated()
 
     def get_current_queue(self):
+        """The running and pending items, the pending list is shared between calls and must not be modified."""
         with self.mutex:
             out = []
             for x in self.currently_running.values():
                 out += [x]
-            return (out, copy.deepcopy(self.queue))
+            if self.queue_snapshot is None:
+                self.queue_snapshot = copy.deepcopy(self.queue)
+            return (out, self.queue_snapshot)
 
     def get_tasks_remaining(self):
         with self.mutex:
@@ -945,6 +1096,10 @@ class PromptQueue:
     def wipe_queue(self):
         with self.mutex:
             self.queue = []
+            self.queue_snapshot = None
+            self.item_models = {}
+            self.overtaken = {}
+            self.client_service = {}
             self.server.queue_updated()
 
     def delete_queue_item(self, function):
@@ -954,38 +1109,34 @@ class PromptQueue:
                     if len(self.queue) == 1:
                         self.wipe_queue()
                     else:
-                        self.queue.pop(x)
+                        item = self.queue.pop(x)
                         heapq.heapify(self.queue)
+                        self.queue_snapshot = None
+                        self.item_models.pop(item[1], None)
+                        self.overtaken.pop(item[1], None)
+                        self.prune_client_service()
                     self.server.queue_updated()
                     return True
         return False
 
-    def get_history(self, prompt_id=None, max_items=None, offset=-1):
-        with self.mutex:
-            if prompt_id is None:
-                out = {}
-                i = 0
-                if offset < 0 and max_items is not None:
-                    offset = len(self.history) - max_items
-                for k in self.history:
-                    if i >= offset:
-                        out[k] = self.history[k]
-                        if max_items is not None and len(out) >= max_items:
-                            break
-                    i += 1
-                return out
-            elif prompt_id in self.history:
-                return {prompt_id: copy.deepcopy(self.history[prompt_id])}
-            else:
-                return {}
+    def get_history(self, prompt_id=None, max_items=None, offset=-1, before=None, fields=None):
+        """
+        History entries by prompt id, every entry is decoded again so callers can modify them.
+        before is a cursor for paging backwards, the prompt id of the oldest entry of the previous page,
+        fields limits the fields of the entries to the ones in it.
+        """
+        if prompt_id is None:
+            return self.history.page(max_items=max_items, offset=offset, before=before, fields=fields)
+        entry = self.history.get(prompt_id, fields=fields)
+        if entry is None:
+            return {}
+        return {prompt_id: entry}
 
     def wipe_history(self):
-        with self.mutex:
-            self.history = {}
+        self.history.clear()
 
     def delete_history_item(self, id_to_delete):
-        with self.mutex:
-            self.history.pop(id_to_delete, None)
+        self.history.delete(id_to_delete)
 
     def set_flag(self, name, data):
         with self.mutex:
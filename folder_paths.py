@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import os
 import time
+import threading
 import mimetypes
 import logging
+from contextlib import contextmanager
 from typing import Literal
 from collections.abc import Collection
 
@@ -53,6 +55,17 @@ user_directory = os.path.join(base_path, "user")
 
 filename_list_cache: dict[str, tuple[list[str], dict[str, float], float]] = {}
 
+# Incremented whenever the registered folders or the files found in them change. Lets callers
+# that cache data derived from folder listings (like node INPUT_TYPES) know when to drop it.
+registry_version = 0
+input_directory_mtimes: dict[str, float] = {}
+
+# Next free counter of each (output folder, filename) known from the last create_save_file() call.
+# get_save_image_path() takes the entry out, so callers that write their files without
+# create_save_file() fall back to scanning the folder.
+save_counters: dict[tuple[str, str], int] = {}
+save_counters_lock = threading.Lock()
+
 class CacheHelper:
     """
     Helper class for managing file list cache data.
@@ -109,6 +122,7 @@ def set_temp_directory(temp_dir: str) -> None:
 def set_input_directory(input_dir: str) -> None:
     global input_directory
     input_directory = input_dir
+    bump_registry_version()
 
 def get_output_directory() -> str:
     global output_directory
@@ -203,9 +217,61 @@ def exists_annotated_filepath(name) -> bool:
     return os.path.exists(filepath)
 
 
+def bump_registry_version() -> None:
+    global registry_version
+    registry_version += 1
+
+def get_input_directory_mtimes(known: dict[str, float]) -> dict[str, float]:
+    """
+    mtimes of the input directory and its subdirectories. The input directory is only listed when its own
+    mtime is not the known one, adding or removing a subdirectory changes it, otherwise only the known
+    subdirectories are checked.
+    """
+    input_dir = get_input_directory()
+    try:
+        out = {input_dir: os.path.getmtime(input_dir)}
+        if known.get(input_dir) == out[input_dir]:
+            for path in known:
+                if path != input_dir:
+                    out[path] = os.path.getmtime(path)
+            return out
+        with os.scandir(input_dir) as it:
+            for entry in it:
+                if entry.is_dir():
+                    out[entry.path] = entry.stat().st_mtime
+    except OSError:
+        return {}
+    return out
+
+def get_registry_version() -> int:
+    """
+    Returns a counter that changes whenever the model folder registry, the files in the model
+    folders or the input directory may have changed.
+
+    Only directory mtimes are checked, the input directory is only listed after its own mtime
+    changed, so this is cheap enough to call once per prompt. Stale entries of the filename list
+    cache are dropped as a side effect.
+    """
+    global input_directory_mtimes
+    for folder_name in list(filename_list_cache.keys()):
+        try:
+            stale = cached_filename_list_(folder_name) is None
+        except (OSError, KeyError):
+            stale = True
+        if stale:
+            filename_list_cache.pop(folder_name, None)
+            bump_registry_version()
+
+    mtimes = get_input_directory_mtimes(input_directory_mtimes)
+    if mtimes != input_directory_mtimes:
+        input_directory_mtimes = mtimes
+        bump_registry_version()
+    return registry_version
+
 def add_model_folder_path(folder_name: str, full_folder_path: str, is_default: bool = False) -> None:
     global folder_names_and_paths
     folder_name = map_legacy(folder_name)
+    bump_registry_version()
     if folder_name in folder_names_and_paths:
         paths, _exts = folder_names_and_paths[folder_name]
         if full_folder_path in paths:
@@ -338,9 +404,13 @@ def get_filename_list(folder_name: str) -> list[str]:
     folder_name = map_legacy(folder_name)
     out = cached_filename_list_(folder_name)
     if out is None:
-        out = get_filename_list_(folder_name)
         global filename_list_cache
+        previous = filename_list_cache.get(folder_name)
+        out = get_filename_list_(folder_name)
         filename_list_cache[folder_name] = out
+        # what was computed from the previous listing is only outdated if the files changed
+        if previous is not None and previous[0] != out[0]:
+            bump_registry_version()
     cache_helper.set(folder_name, out)
     return list(out[0])
 
@@ -382,6 +452,11 @@ def get_save_image_path(filename_prefix: str, output_dir: str, image_width=0, im
         logging.error(err)
         raise Exception(err)
 
+    with save_counters_lock:
+        counter = save_counters.pop(save_counter_key(full_output_folder, filename), None)
+    if counter is not None:
+        return full_output_folder, filename, counter, subfolder, filename_prefix
+
     try:
         counter = max(filter(lambda a: os.path.normcase(a[1][:-1]) == os.path.normcase(filename) and a[1][-1] == "_", map(map_filename, os.listdir(full_output_folder))))[0] + 1
     except ValueError:
@@ -390,3 +465,45 @@ def get_save_image_path(filename_prefix: str, output_dir: str, image_width=0, im
         os.makedirs(full_output_folder, exist_ok=True)
         counter = 1
     return full_output_folder, filename, counter, subfolder, filename_prefix
+
+def save_counter_key(full_output_folder: str, filename: str) -> tuple[str, str]:
+    return os.path.normcase(os.path.abspath(full_output_folder)), os.path.normcase(filename)
+
+def create_save_file(full_output_folder: str, filename: str, counter: int, extension: str, batch_number: int | None = None) -> tuple[str, int]:
+    """
+    Atomically creates the empty output file {filename}_{counter:05}_.{extension}, moving on to the next
+    counter while the name is taken by another save (from this or another process). %batch_num% in
+    filename is replaced by batch_number.
+
+    Returns the file name and the counter it was created with. The next get_save_image_path() call for
+    filename continues from there without scanning the folder.
+    """
+    name = filename
+    if batch_number is not None:
+        name = filename.replace("%batch_num%", str(batch_number))
+    while True:
+        file = f"{name}_{counter:05}_.{extension}"
+        try:
+            with open(os.path.join(full_output_folder, file), "xb"):
+                pass
+        except FileExistsError:
+            counter += 1
+            continue
+        break
+
+    key = save_counter_key(full_output_folder, filename)
+    with save_counters_lock:
+        save_counters[key] = max(save_counters.get(key, 0), counter + 1)
+    return file, counter
+
+@contextmanager
+def remove_on_error(file_path: str):
+    """Removes the file created by create_save_file() when the block writing it raises, an empty or partly written file is worse than none."""
+    try:
+        yield file_path
+    except BaseException:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        raise
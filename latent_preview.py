@@ -6,10 +6,31 @@ import comfy.model_management
 import folder_paths
 import comfy.utils
 import logging
+import time
 
 MAX_PREVIEW_RESOLUTION = args.preview_size
+PREVIEW_INTERVAL = 1.0 / args.preview_rate if args.preview_rate > 0 else 0.0
+
+PREVIEW_WANTED_CHECK = None
+def set_preview_wanted_check(function):
+    """function() returns whether anyone receives the previews, samplers skip decoding them when it doesn't."""
+    global PREVIEW_WANTED_CHECK
+    PREVIEW_WANTED_CHECK = function
+
+def preview_wanted():
+    return PREVIEW_WANTED_CHECK is None or PREVIEW_WANTED_CHECK()
+
+def downscale_preview(image, max_size):
+    # on the device the preview was decoded on, so only the downscaled preview is copied to the cpu
+    height, width = image.shape[:2]
+    if max_size is None or max(height, width) <= max_size:
+        return image
+    scale = max_size / max(height, width)
+    size = (max(1, round(height * scale)), max(1, round(width * scale)))
+    return torch.nn.functional.interpolate(image.movedim(-1, 0).unsqueeze(0).float(), size=size, mode="bilinear", antialias=True)[0].movedim(0, -1)
 
 def preview_to_image(latent_image):
+        latent_image = downscale_preview(latent_image, MAX_PREVIEW_RESOLUTION)
         latents_ubyte = (((latent_image + 1.0) / 2.0).clamp(0, 1)  # change scale from -1..1 to 0..1
                             .mul(0xFF)  # to 0..255
                             )
@@ -96,13 +117,18 @@ def prepare_callback(model, steps, x0_output_dict=None):
     previewer = get_previewer(model.load_device, model.model.latent_format)
 
     pbar = comfy.utils.ProgressBar(steps)
+    last_preview = None
     def callback(step, x0, x, total_steps):
+        nonlocal last_preview
         if x0_output_dict is not None:
             x0_output_dict["x0"] = x0
 
         preview_bytes = None
-        if previewer:
-            preview_bytes = previewer.decode_latent_to_preview_image(preview_format, x0)
+        if previewer and preview_wanted():
+            now = time.monotonic()
+            if last_preview is None or now - last_preview >= PREVIEW_INTERVAL:
+                last_preview = now
+                preview_bytes = previewer.decode_latent_to_preview_image(preview_format, x0)
         pbar.update_absolute(step + 1, total_steps, preview_bytes)
     return callback
 
@@ -69,10 +69,15 @@ def execute_prestartup_script():
     if args.disable_all_custom_nodes:
         return
 
+    def timed_execute_script(script_path):
+        time_before = time.perf_counter()
+        success = execute_script(script_path)
+        return time.perf_counter() - time_before, success
+
     node_paths = folder_paths.get_folder_paths("custom_nodes")
+    script_paths = []
     for custom_node_path in node_paths:
         possible_modules = os.listdir(custom_node_path)
-        node_prestartup_times = []
 
         for possible_module in possible_modules:
             module_path = os.path.join(custom_node_path, possible_module)
@@ -81,9 +86,16 @@ def execute_prestartup_script():
 
             script_path = os.path.join(module_path, "prestartup_script.py")
             if os.path.exists(script_path):
-                time_before = time.perf_counter()
-                success = execute_script(script_path)
-                node_prestartup_times.append((time.perf_counter() - time_before, module_path, success))
+                script_paths.append((module_path, script_path))
+
+    if args.custom_node_import_workers > 1 and len(script_paths) > 1:
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.custom_node_import_workers) as executor:
+            results = list(executor.map(timed_execute_script, [x[1] for x in script_paths]))
+    else:
+        results = [timed_execute_script(x[1]) for x in script_paths]
+
+    node_prestartup_times = [(r[0], x[0], r[1]) for x, r in zip(script_paths, results)]
     if len(node_prestartup_times) > 0:
         logging.info("\nPrestartup times for custom nodes:")
         for n in sorted(node_prestartup_times):
@@ -132,11 +144,18 @@ if args.windows_standalone_build:
         pass
 
 import comfy.utils
+import comfy.model_detection_cache
+import comfy.attention_autotune
+import comfy.memory_profile
+import comfy.torch_compile
 
 import execution
+from comfy_execution.output_writer import output_writer, write_failed
+from comfy_execution.model_prefetch import model_prefetcher
 import server
 from server import BinaryEventTypes
 import nodes
+import latent_preview
 import comfy.model_management
 import comfyui_version
 import app.logger
@@ -175,14 +194,21 @@ def prompt_worker(q, server_instance):
 
             e.execute(item[2], prompt_id, item[3], item[4])
             need_gc = True
-            q.task_done(item_id,
-                        e.history_result,
-                        status=execution.PromptQueue.ExecutionStatus(
-                            status_str='success' if e.success else 'error',
-                            completed=e.success,
-                            messages=e.status_messages))
-            if server_instance.client_id is not None:
-                server_instance.send_sync("executing", {"node": None, "prompt_id": prompt_id}, server_instance.client_id)
+
+            def publish_result(item_id=item_id, prompt_id=prompt_id, client_id=server_instance.client_id, history_result=e.history_result,
+                               success=e.success, messages=e.status_messages, pending_writes=e.pending_writes):
+                success = success and not write_failed(pending_writes)
+                q.task_done(item_id,
+                            history_result,
+                            status=execution.PromptQueue.ExecutionStatus(
+                                status_str='success' if success else 'error',
+                                completed=success,
+                                messages=messages))
+                if client_id is not None:
+                    server_instance.send_sync("executing", {"node": None, "prompt_id": prompt_id}, client_id)
+
+            # the prompt is only done once the files of its output nodes are written
+            output_writer.when_done(e.pending_writes, publish_result)
 
             current_time = time.perf_counter()
             execution_time = current_time - execution_start_time
@@ -229,6 +255,7 @@ def hijack_progress(server_instance):
             server_instance.send_sync(BinaryEventTypes.UNENCODED_PREVIEW_IMAGE, preview_image, server_instance.client_id)
 
     comfy.utils.set_progress_bar_global_hook(hook)
+    latent_preview.set_preview_wanted_check(lambda: server_instance.is_listening(server_instance.client_id))
 
 
 def cleanup_temp():
@@ -247,6 +274,11 @@ def start_comfyui(asyncio_loop=None):
         logging.info(f"Setting temp directory to: {temp_dir}")
         folder_paths.set_temp_directory(temp_dir)
     cleanup_temp()
+    comfy.model_detection_cache.detection_cache.set_path(os.path.join(folder_paths.get_user_directory(), "model_detection_cache.json"))
+    comfy.memory_profile.memory_profiles.set_path(os.path.join(folder_paths.get_user_directory(), "memory_profiles.json"))
+    comfy.torch_compile.compiled_models.set_path(os.path.join(folder_paths.get_user_directory(), "torch_compile"))
+    if args.attention_autotune:
+        comfy.attention_autotune.attention_tuner.set_path(os.path.join(folder_paths.get_user_directory(), "attention_autotune.json"))
 
     if args.windows_standalone_build:
         try:
@@ -259,7 +291,7 @@ def start_comfyui(asyncio_loop=None):
         asyncio_loop = asyncio.new_event_loop()
         asyncio.set_event_loop(asyncio_loop)
     prompt_server = server.PromptServer(asyncio_loop)
-    q = execution.PromptQueue(prompt_server)
+    q = execution.PromptQueue(prompt_server, args.history_database or "", model_affinity=args.queue_model_affinity, prefetcher=model_prefetcher, client_weights=execution.load_client_weights(args.queue_client_weights))
 
     nodes.init_extra_nodes(init_custom_nodes=not args.disable_all_custom_nodes)
 
@@ -33,8 +33,12 @@ import comfy.model_management
 from comfy.cli_args import args
 
 import importlib
+import threading
+import concurrent.futures
 
 import folder_paths
+from app.custom_node_manifest import CustomNodeManifest
+from comfy_execution.output_writer import output_writer
 import latent_preview
 import node_helpers
 
@@ -477,7 +481,7 @@ class SaveLatent:
                 for x in extra_pnginfo:
                     metadata[x] = json.dumps(extra_pnginfo[x])
 
-        file = f"{filename}_{counter:05}_.latent"
+        file, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "latent")
 
         results: list[FileLocator] = []
         results.append({
@@ -492,7 +496,8 @@ class SaveLatent:
         output["latent_tensor"] = samples["samples"].contiguous()
         output["latent_format_version_0"] = torch.tensor([])
 
-        comfy.utils.save_torch_file(output, file, metadata=metadata)
+        with folder_paths.remove_on_error(file):
+            comfy.utils.save_torch_file(output, file, metadata=metadata)
         return { "ui": { "latents": results } }
 
 
@@ -1576,6 +1581,9 @@ class KSamplerAdvanced:
             disable_noise = True
         return common_ksampler(model, noise_seed, steps, cfg, sampler_name, scheduler, positive, negative, latent_image, denoise=denoise, disable_noise=disable_noise, start_step=start_at_step, last_step=end_at_step, force_full_denoise=force_full_denoise)
 
+def save_png(path, pixels, pnginfo, compress_level):
+    Image.fromarray(pixels).save(path, pnginfo=pnginfo, compress_level=compress_level)
+
 class SaveImage:
     def __init__(self):
         self.output_dir = folder_paths.get_output_directory()
@@ -1607,21 +1615,19 @@ class SaveImage:
         filename_prefix += self.prefix_append
         full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
         results = list()
-        for (batch_number, image) in enumerate(images):
-            i = 255. * image.cpu().numpy()
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-            metadata = None
-            if not args.disable_metadata:
-                metadata = PngInfo()
-                if prompt is not None:
-                    metadata.add_text("prompt", json.dumps(prompt))
-                if extra_pnginfo is not None:
-                    for x in extra_pnginfo:
-                        metadata.add_text(x, json.dumps(extra_pnginfo[x]))
-
-            filename_with_batch_num = filename.replace("%batch_num%", str(batch_number))
-            file = f"{filename_with_batch_num}_{counter:05}_.png"
-            img.save(os.path.join(full_output_folder, file), pnginfo=metadata, compress_level=self.compress_level)
+        metadata = None
+        if not args.disable_metadata:
+            metadata = PngInfo()
+            if prompt is not None:
+                metadata.add_text("prompt", json.dumps(prompt))
+            if extra_pnginfo is not None:
+                for x in extra_pnginfo:
+                    metadata.add_text(x, json.dumps(extra_pnginfo[x]))
+
+        pixels = (255. * images).clamp(0, 255).to(torch.uint8).cpu().numpy()
+        for (batch_number, image) in enumerate(pixels):
+            file, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "png", batch_number)
+            output_writer.submit_file(save_png, os.path.join(full_output_folder, file), image, metadata, self.compress_level)
             results.append({
                 "filename": file,
                 "subfolder": subfolder,
@@ -2099,6 +2105,14 @@ EXTENSION_WEB_DIRS = {}
 # Dictionary of successfully loaded module names and associated directories.
 LOADED_MODULE_DIRS = {}
 
+# Custom nodes registered from the manifest whose module is not imported yet, node name -> module path.
+LAZY_CUSTOM_NODES = {}
+LAZY_CUSTOM_NODES_LOCK = threading.RLock()
+CUSTOM_NODE_MANIFEST = None
+
+# (seconds, module path, status) of every custom node module import.
+CUSTOM_NODE_IMPORT_TIMES = []
+
 
 def get_module_name(module_path: str) -> str:
     """
@@ -2122,47 +2136,193 @@ def get_module_name(module_path: str) -> str:
     return base_path
 
 
-def load_custom_node(module_path: str, ignore=set(), module_parent="custom_nodes") -> bool:
+def import_custom_node_module(module_path: str):
     module_name = os.path.basename(module_path)
     if os.path.isfile(module_path):
         sp = os.path.splitext(module_path)
         module_name = sp[0]
+    logging.debug("Trying to load custom node {}".format(module_path))
+    if os.path.isfile(module_path):
+        module_spec = importlib.util.spec_from_file_location(module_name, module_path)
+        module_dir = os.path.split(module_path)[0]
+    else:
+        module_spec = importlib.util.spec_from_file_location(module_name, os.path.join(module_path, "__init__.py"))
+        module_dir = module_path
+
+    module = importlib.util.module_from_spec(module_spec)
+    sys.modules[module_name] = module
+    module_spec.loader.exec_module(module)
+    return module, module_name, module_dir
+
+
+def register_custom_node_module(module, module_name: str, module_dir: str, module_path: str, ignore=set(), module_parent="custom_nodes") -> bool:
+    LOADED_MODULE_DIRS[module_name] = os.path.abspath(module_dir)
+
+    if hasattr(module, "WEB_DIRECTORY") and getattr(module, "WEB_DIRECTORY") is not None:
+        web_dir = os.path.abspath(os.path.join(module_dir, getattr(module, "WEB_DIRECTORY")))
+        if os.path.isdir(web_dir):
+            EXTENSION_WEB_DIRS[module_name] = web_dir
+
+    if hasattr(module, "NODE_CLASS_MAPPINGS") and getattr(module, "NODE_CLASS_MAPPINGS") is not None:
+        for name, node_cls in module.NODE_CLASS_MAPPINGS.items():
+            if name not in ignore:
+                NODE_CLASS_MAPPINGS[name] = node_cls
+                LAZY_CUSTOM_NODES.pop(name, None)
+                node_cls.RELATIVE_PYTHON_MODULE = "{}.{}".format(module_parent, get_module_name(module_path))
+        if hasattr(module, "NODE_DISPLAY_NAME_MAPPINGS") and getattr(module, "NODE_DISPLAY_NAME_MAPPINGS") is not None:
+            NODE_DISPLAY_NAME_MAPPINGS.update(module.NODE_DISPLAY_NAME_MAPPINGS)
+        return True
+    else:
+        logging.warning(f"Skip {module_path} module for custom nodes due to the lack of NODE_CLASS_MAPPINGS.")
+        return False
+
+
+def load_custom_node(module_path: str, ignore=set(), module_parent="custom_nodes") -> bool:
     try:
-        logging.debug("Trying to load custom node {}".format(module_path))
-        if os.path.isfile(module_path):
-            module_spec = importlib.util.spec_from_file_location(module_name, module_path)
-            module_dir = os.path.split(module_path)[0]
-        else:
-            module_spec = importlib.util.spec_from_file_location(module_name, os.path.join(module_path, "__init__.py"))
-            module_dir = module_path
-
-        module = importlib.util.module_from_spec(module_spec)
-        sys.modules[module_name] = module
-        module_spec.loader.exec_module(module)
-
-        LOADED_MODULE_DIRS[module_name] = os.path.abspath(module_dir)
-
-        if hasattr(module, "WEB_DIRECTORY") and getattr(module, "WEB_DIRECTORY") is not None:
-            web_dir = os.path.abspath(os.path.join(module_dir, getattr(module, "WEB_DIRECTORY")))
-            if os.path.isdir(web_dir):
-                EXTENSION_WEB_DIRS[module_name] = web_dir
-
-        if hasattr(module, "NODE_CLASS_MAPPINGS") and getattr(module, "NODE_CLASS_MAPPINGS") is not None:
-            for name, node_cls in module.NODE_CLASS_MAPPINGS.items():
-                if name not in ignore:
-                    NODE_CLASS_MAPPINGS[name] = node_cls
-                    node_cls.RELATIVE_PYTHON_MODULE = "{}.{}".format(module_parent, get_module_name(module_path))
-            if hasattr(module, "NODE_DISPLAY_NAME_MAPPINGS") and getattr(module, "NODE_DISPLAY_NAME_MAPPINGS") is not None:
-                NODE_DISPLAY_NAME_MAPPINGS.update(module.NODE_DISPLAY_NAME_MAPPINGS)
-            return True
-        else:
-            logging.warning(f"Skip {module_path} module for custom nodes due to the lack of NODE_CLASS_MAPPINGS.")
-            return False
+        module, module_name, module_dir = import_custom_node_module(module_path)
+        return register_custom_node_module(module, module_name, module_dir, module_path, ignore, module_parent)
     except Exception as e:
         logging.warning(traceback.format_exc())
         logging.warning(f"Cannot import {module_path} module for custom nodes: {e}")
         return False
 
+def module_hooks_server(module_name: str) -> bool:
+    """
+    Returns True if the module registered server routes or prompt handlers. Those have to be in
+    place before the server starts, so such modules are never imported lazily.
+    """
+    server_module = sys.modules.get("server")
+    instance = getattr(getattr(server_module, "PromptServer", None), "instance", None)
+    if instance is None:
+        return False
+    handlers = [getattr(route, "handler", None) for route in instance.routes] + list(instance.on_prompt_handlers)
+    for handler in handlers:
+        handler_module = getattr(handler, "__module__", None) or ""
+        if handler_module == module_name or handler_module.startswith(module_name + "."):
+            return True
+    return False
+
+def import_custom_node_modules(module_paths: list[str], workers: int = 1) -> dict:
+    """
+    Imports custom node modules without registering their nodes.
+
+    With workers > 1 independent modules are imported from a thread pool, which overlaps the disk
+    and native library loading most of the import time goes to. A module that fails to import in
+    parallel is retried serially since the failure may come from an import race with another module.
+
+    Returns {module_path: (result, seconds)} where result is the import_custom_node_module() tuple
+    or the (exception, formatted traceback) that was raised.
+    """
+    def timed_import(module_path):
+        time_before = time.perf_counter()
+        try:
+            result = import_custom_node_module(module_path)
+        except Exception as e:
+            result = (e, traceback.format_exc())
+        return result, time.perf_counter() - time_before
+
+    if workers <= 1 or len(module_paths) <= 1:
+        return {module_path: timed_import(module_path) for module_path in module_paths}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="custom_node_import") as executor:
+        results = dict(zip(module_paths, executor.map(timed_import, module_paths)))
+
+    for module_path, (result, import_time) in results.items():
+        if isinstance(result[0], Exception):
+            logging.debug("Retrying import of {} serially after: {}".format(module_path, result[0]))
+            result, retry_time = timed_import(module_path)
+            results[module_path] = (result, import_time + retry_time)
+    return results
+
+def register_lazy_custom_node(module_path: str, entry: dict, ignore=set()) -> None:
+    LOADED_MODULE_DIRS[entry["module_name"]] = entry["module_dir"]
+    web_dir = entry["web_directory"]
+    if web_dir is not None and os.path.isdir(web_dir):
+        EXTENSION_WEB_DIRS[entry["module_name"]] = web_dir
+
+    for name in entry["node_names"]:
+        if name not in ignore:
+            NODE_CLASS_MAPPINGS.pop(name, None)
+            LAZY_CUSTOM_NODES[name] = module_path
+    NODE_DISPLAY_NAME_MAPPINGS.update(entry["display_names"])
+
+def load_lazy_custom_nodes(class_types) -> None:
+    """
+    Imports the modules of the lazily registered custom nodes (--lazy-custom-nodes) among
+    class_types. Nodes that are already loaded or unknown are ignored.
+    """
+    if len(LAZY_CUSTOM_NODES) == 0:
+        return
+
+    with LAZY_CUSTOM_NODES_LOCK:
+        module_paths = []
+        for class_type in class_types:
+            module_path = LAZY_CUSTOM_NODES.get(class_type, None)
+            if module_path is not None and module_path not in module_paths:
+                module_paths.append(module_path)
+
+        for module_path in module_paths:
+            owned = set(name for name, path in LAZY_CUSTOM_NODES.items() if path == module_path)
+            time_before = time.perf_counter()
+            try:
+                module, module_name, module_dir = import_custom_node_module(module_path)
+                ignore = set(getattr(module, "NODE_CLASS_MAPPINGS", None) or {}).difference(owned)
+                success = register_custom_node_module(module, module_name, module_dir, module_path, ignore, module_parent="custom_nodes")
+            except Exception as e:
+                logging.warning(traceback.format_exc())
+                logging.warning(f"Cannot import {module_path} module for custom nodes: {e}")
+                success = False
+
+            for name in owned:
+                LAZY_CUSTOM_NODES.pop(name, None)
+            import_time = time.perf_counter() - time_before
+            CUSTOM_NODE_IMPORT_TIMES.append((import_time, module_path, "imported on demand" if success else "IMPORT FAILED"))
+            logging.info("{:6.1f} seconds: lazily imported {}".format(import_time, module_path))
+            if not success and CUSTOM_NODE_MANIFEST is not None:
+                CUSTOM_NODE_MANIFEST.remove(module_path)
+                CUSTOM_NODE_MANIFEST.save()
+
+def lazy_custom_node_info() -> dict:
+    """
+    object_info of the lazily registered custom nodes as recorded in the manifest. Combos that
+    list a model folder list it again, other combo options are the ones that were recorded.
+    """
+    if CUSTOM_NODE_MANIFEST is None:
+        return {}
+    with LAZY_CUSTOM_NODES_LOCK:
+        out = {}
+        for name, module_path in LAZY_CUSTOM_NODES.items():
+            info = CUSTOM_NODE_MANIFEST.node_info(module_path, name)
+            if info is not None:
+                out[name] = info
+        return out
+
+def lazy_custom_nodes_without_info() -> list:
+    """The lazily registered custom nodes that have no recorded object_info, they have to be imported to get it."""
+    with LAZY_CUSTOM_NODES_LOCK:
+        info = lazy_custom_node_info()
+        return [name for name in LAZY_CUSTOM_NODES if name not in info]
+
+def record_custom_node_info(infos: dict) -> None:
+    """Records the object_info of the imported custom nodes so later lazy startups can serve it without importing them."""
+    if CUSTOM_NODE_MANIFEST is None:
+        return
+    CUSTOM_NODE_MANIFEST.set_node_info(infos)
+    CUSTOM_NODE_MANIFEST.save()
+
+def log_custom_node_import_times(node_import_times, total_time):
+    logging.info("\nImport times for custom nodes:")
+    for n in sorted(node_import_times):
+        if n[2] == "imported":
+            import_message = ""
+        else:
+            import_message = " ({})".format(n[2])
+        logging.info("{:6.1f} seconds{}: {}".format(n[0], import_message, n[1]))
+    imported = [n for n in node_import_times if n[2] != "lazy"]
+    logging.info("{:6.1f} seconds total for {} imported and {} lazy modules ({:.1f} seconds summed import time)".format(
+        total_time, len(imported), len(node_import_times) - len(imported), sum(n[0] for n in imported)))
+    logging.info("")
+
 def init_external_custom_nodes():
     """
     Initializes the external custom nodes.
@@ -2170,12 +2330,18 @@ def init_external_custom_nodes():
     This function loads custom nodes from the specified folder paths and imports them into the application.
     It measures the import times for each custom node and logs the results.
 
+    With --custom-node-import-workers modules are imported in parallel, with --lazy-custom-nodes
+    modules that are unchanged since their last import are only registered from the manifest
+    and imported the first time one of their nodes is used.
+
     Returns:
         None
     """
+    global CUSTOM_NODE_MANIFEST
+    startup_time = time.perf_counter()
     base_node_names = set(NODE_CLASS_MAPPINGS.keys())
     node_paths = folder_paths.get_folder_paths("custom_nodes")
-    node_import_times = []
+    module_paths = []
     for custom_node_path in node_paths:
         possible_modules = os.listdir(os.path.realpath(custom_node_path))
         if "__pycache__" in possible_modules:
@@ -2185,19 +2351,51 @@ def init_external_custom_nodes():
             module_path = os.path.join(custom_node_path, possible_module)
             if os.path.isfile(module_path) and os.path.splitext(module_path)[1] != ".py": continue
             if module_path.endswith(".disabled"): continue
-            time_before = time.perf_counter()
-            success = load_custom_node(module_path, base_node_names, module_parent="custom_nodes")
-            node_import_times.append((time.perf_counter() - time_before, module_path, success))
-
+            module_paths.append(module_path)
+
+    manifest = None
+    lazy_entries = {}
+    if args.lazy_custom_nodes:
+        manifest = CustomNodeManifest()
+        manifest.load()
+        manifest.prune(module_paths)
+        CUSTOM_NODE_MANIFEST = manifest
+        for module_path in module_paths:
+            entry = manifest.get(module_path)
+            if entry is not None and not entry["eager"]:
+                lazy_entries[module_path] = entry
+
+    imported = import_custom_node_modules([x for x in module_paths if x not in lazy_entries], args.custom_node_import_workers)
+
+    # Register in directory order so that later modules still override nodes of earlier ones
+    node_import_times = []
+    for module_path in module_paths:
+        if module_path in lazy_entries:
+            register_lazy_custom_node(module_path, lazy_entries[module_path], base_node_names)
+            node_import_times.append((0.0, module_path, "lazy"))
+            continue
+
+        result, import_time = imported[module_path]
+        if isinstance(result[0], Exception):
+            logging.warning(result[1])
+            logging.warning(f"Cannot import {module_path} module for custom nodes: {result[0]}")
+            success = False
+        else:
+            module, module_name, module_dir = result
+            success = register_custom_node_module(module, module_name, module_dir, module_path, base_node_names, module_parent="custom_nodes")
+            if success and manifest is not None:
+                node_names = [name for name in module.NODE_CLASS_MAPPINGS if name not in base_node_names]
+                web_dir = EXTENSION_WEB_DIRS.get(module_name, None)
+                manifest.set(module_path, module_name, os.path.abspath(module_dir), node_names,
+                             dict(getattr(module, "NODE_DISPLAY_NAME_MAPPINGS", None) or {}), web_dir, module_hooks_server(module_name))
+        node_import_times.append((import_time, module_path, "imported" if success else "IMPORT FAILED"))
+
+    if manifest is not None:
+        manifest.save()
+
+    CUSTOM_NODE_IMPORT_TIMES.extend(node_import_times)
     if len(node_import_times) > 0:
-        logging.info("\nImport times for custom nodes:")
-        for n in sorted(node_import_times):
-            if n[2]:
-                import_message = ""
-            else:
-                import_message = " (IMPORT FAILED)"
-            logging.info("{:6.1f} seconds{}: {}".format(n[0], import_message, n[1]))
-        logging.info("")
+        log_custom_node_import_times(node_import_times, time.perf_counter() - startup_time)
 
 def init_builtin_extra_nodes():
     """
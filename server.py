@@ -14,6 +14,7 @@ import struct
 import ssl
 import socket
 import ipaddress
+import concurrent.futures
 from PIL import Image, ImageOps
 from PIL.PngImagePlugin import PngInfo
 from io import BytesIO
@@ -32,6 +33,7 @@ from app.frontend_management import FrontendManager
 from app.user_manager import UserManager
 from app.model_manager import ModelFileManager
 from app.custom_node_manager import CustomNodeManager
+from app.websocket_client import WebSocketClient, send_socket_catch_exception  # noqa: F401
 from typing import Optional
 from api_server.routes.internal.internal_routes import InternalRoutes
 
@@ -39,11 +41,28 @@ class BinaryEventTypes:
     PREVIEW_IMAGE = 1
     UNENCODED_PREVIEW_IMAGE = 2
 
-async def send_socket_catch_exception(function, message):
-    try:
-        await function(message)
-    except (aiohttp.ClientError, aiohttp.ClientPayloadError, ConnectionResetError, BrokenPipeError, ConnectionError) as err:
-        logging.warning("send error: {}".format(err))
+def encode_preview_image(image_data):
+    image_type = image_data[0]
+    image = image_data[1]
+    max_size = image_data[2]
+    if max_size is not None and max(image.size) != max_size:
+        if hasattr(Image, 'Resampling'):
+            resampling = Image.Resampling.BILINEAR
+        else:
+            resampling = Image.ANTIALIAS
+
+        image = ImageOps.contain(image, (max_size, max_size), resampling)
+    type_num = 1
+    if image_type == "JPEG":
+        type_num = 1
+    elif image_type == "PNG":
+        type_num = 2
+
+    bytesIO = BytesIO()
+    header = struct.pack(">I", type_num)
+    bytesIO.write(header)
+    image.save(bytesIO, format=image_type, quality=95, compress_level=1)
+    return bytesIO.getvalue()
 
 @web.middleware
 async def cache_control(request: web.Request, handler):
@@ -176,6 +195,8 @@ class PromptServer():
         max_upload_size = round(args.max_upload_size * 1024 * 1024)
         self.app = web.Application(client_max_size=max_upload_size, middlewares=middlewares)
         self.sockets = dict()
+        self.clients: dict[str, WebSocketClient] = {}
+        self.preview_encoder = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview_encoder")
         self.web_root = (
             FrontendManager.init_frontend(args.front_end_version)
             if args.front_end_root is None
@@ -197,10 +218,13 @@ class PromptServer():
             if sid:
                 # Reusing existing session, remove old
                 self.sockets.pop(sid, None)
+                self.remove_client(sid)
             else:
                 sid = uuid.uuid4().hex
 
             self.sockets[sid] = ws
+            client = self.clients[sid] = WebSocketClient(ws)
+            client.start()
 
             try:
                 # Send initial state to the new client
@@ -213,7 +237,10 @@ class PromptServer():
                     if msg.type == aiohttp.WSMsgType.ERROR:
                         logging.warning('ws connection closed with exception %s' % ws.exception())
             finally:
-                self.sockets.pop(sid, None)
+                if self.sockets.get(sid) is ws:
+                    self.sockets.pop(sid, None)
+                if self.clients.get(sid) is client:
+                    self.remove_client(sid)
             return ws
 
         @routes.get("/")
@@ -585,34 +612,48 @@ class PromptServer():
         @routes.get("/object_info")
         async def get_object_info(request):
             with folder_paths.cache_helper:
+                # lazy custom nodes are described from the manifest, only the ones without a record are imported
+                nodes.load_lazy_custom_nodes(nodes.lazy_custom_nodes_without_info())
                 out = {}
-                for x in nodes.NODE_CLASS_MAPPINGS:
+                # the prompt worker can import lazy custom nodes while this runs
+                for x in list(nodes.NODE_CLASS_MAPPINGS):
                     try:
                         out[x] = node_info(x)
                     except Exception:
                         logging.error(f"[ERROR] An error occurred while retrieving information for the '{x}' node.")
                         logging.error(traceback.format_exc())
+                nodes.record_custom_node_info(out)
+                out.update(nodes.lazy_custom_node_info())
                 return web.json_response(out)
 
         @routes.get("/object_info/{node_class}")
         async def get_object_info_node(request):
             node_class = request.match_info.get("node_class", None)
             out = {}
+            nodes.load_lazy_custom_nodes([node_class])
             if (node_class is not None) and (node_class in nodes.NODE_CLASS_MAPPINGS):
                 out[node_class] = node_info(node_class)
             return web.json_response(out)
 
+        def history_fields(request):
+            fields = request.rel_url.query.get("fields", None)
+            if fields is not None:
+                fields = [f.strip() for f in fields.split(",")]
+            return fields
+
         @routes.get("/history")
         async def get_history(request):
             max_items = request.rel_url.query.get("max_items", None)
             if max_items is not None:
                 max_items = int(max_items)
-            return web.json_response(self.prompt_queue.get_history(max_items=max_items))
+            offset = int(request.rel_url.query.get("offset", -1))
+            before = request.rel_url.query.get("before", None)
+            return web.json_response(self.prompt_queue.get_history(max_items=max_items, offset=offset, before=before, fields=history_fields(request)))
 
         @routes.get("/history/{prompt_id}")
         async def get_history_prompt_id(request):
             prompt_id = request.match_info.get("prompt_id", None)
-            return web.json_response(self.prompt_queue.get_history(prompt_id=prompt_id))
+            return web.json_response(self.prompt_queue.get_history(prompt_id=prompt_id, fields=history_fields(request)))
 
         @routes.get("/queue")
         async def get_queue(request):
@@ -647,6 +688,14 @@ class PromptServer():
 
                 if "client_id" in json_data:
                     extra_data["client_id"] = json_data["client_id"]
+                if args.max_queued_per_client > 0 and self.prompt_queue.queued_count(extra_data.get("client_id", None)) >= args.max_queued_per_client:
+                    error = {
+                        "type": "queue_quota_exceeded",
+                        "message": "Too many queued prompts",
+                        "details": "At most {} prompts can be queued per client".format(args.max_queued_per_client),
+                        "extra_info": {}
+                    }
+                    return web.json_response({"error": error, "node_errors": []}, status=429)
                 if valid[0]:
                     prompt_id = str(uuid.uuid4())
                     outputs_to_execute = valid[2]
@@ -759,48 +808,42 @@ class PromptServer():
         return message
 
     async def send_image(self, image_data, sid=None):
-        image_type = image_data[0]
-        image = image_data[1]
-        max_size = image_data[2]
-        if max_size is not None:
-            if hasattr(Image, 'Resampling'):
-                resampling = Image.Resampling.BILINEAR
-            else:
-                resampling = Image.ANTIALIAS
-
-            image = ImageOps.contain(image, (max_size, max_size), resampling)
-        type_num = 1
-        if image_type == "JPEG":
-            type_num = 1
-        elif image_type == "PNG":
-            type_num = 2
-
-        bytesIO = BytesIO()
-        header = struct.pack(">I", type_num)
-        bytesIO.write(header)
-        image.save(bytesIO, format=image_type, quality=95, compress_level=1)
-        preview_bytes = bytesIO.getvalue()
+        if not self.is_listening(sid):
+            return
+        # encoded off the event loop, previews are sent every few sampling steps
+        preview_bytes = await self.loop.run_in_executor(self.preview_encoder, encode_preview_image, image_data)
         await self.send_bytes(BinaryEventTypes.PREVIEW_IMAGE, preview_bytes, sid=sid)
 
-    async def send_bytes(self, event, data, sid=None):
-        message = self.encode_bytes(event, data)
-
+    def is_listening(self, sid=None):
+        """Whether a message sent to sid, None for everyone, would reach a socket."""
         if sid is None:
-            sockets = list(self.sockets.values())
-            for ws in sockets:
-                await send_socket_catch_exception(ws.send_bytes, message)
-        elif sid in self.sockets:
-            await send_socket_catch_exception(self.sockets[sid].send_bytes, message)
+            return len(self.sockets) > 0
+        return sid in self.sockets
 
-    async def send_json(self, event, data, sid=None):
-        message = {"type": event, "data": data}
+    async def send_bytes(self, event, data, sid=None):
+        message = bytes(self.encode_bytes(event, data))
+        self.broadcast(message, sid, coalesce_key=event if event == BinaryEventTypes.PREVIEW_IMAGE else None)
 
+    async def send_json(self, event, data, sid=None):
+        message = json.dumps({"type": event, "data": data})
+        coalesce_key = None
+        # the status sent on connect carries the client's sid, it must not be replaced
+        if event in ("progress", "status") and not (isinstance(data, dict) and "sid" in data):
+            coalesce_key = event
+        self.broadcast(message, sid, coalesce_key=coalesce_key)
+
+    def broadcast(self, message, sid=None, coalesce_key=None):
+        """Queues an already serialized message for sid, None for every client."""
         if sid is None:
-            sockets = list(self.sockets.values())
-            for ws in sockets:
-                await send_socket_catch_exception(ws.send_json, message)
-        elif sid in self.sockets:
-            await send_socket_catch_exception(self.sockets[sid].send_json, message)
+            for client in list(self.clients.values()):
+                client.put(message, coalesce_key)
+        elif sid in self.clients:
+            self.clients[sid].put(message, coalesce_key)
+
+    def remove_client(self, sid):
+        client = self.clients.pop(sid, None)
+        if client is not None:
+            client.close()
 
     def send_sync(self, event, data, sid=None):
         self.loop.call_soon_threadsafe(
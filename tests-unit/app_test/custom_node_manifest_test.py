@@ -0,0 +1,118 @@
+import os
+import json
+import pytest
+
+import folder_paths
+from app.custom_node_manifest import CustomNodeManifest, module_fingerprint
+
+
+@pytest.fixture
+def custom_node(tmp_path):
+    module_dir = tmp_path / "custom_nodes" / "my_pack"
+    module_dir.mkdir(parents=True)
+    (module_dir / "__init__.py").write_text("NODE_CLASS_MAPPINGS = {}\n")
+    return str(module_dir)
+
+
+def record(manifest, module_path, eager=False):
+    manifest.set(module_path, "my_pack", module_path, ["MyNode"], {"MyNode": "My Node"}, None, eager)
+
+
+def test_roundtrip(tmp_path, custom_node):
+    path = str(tmp_path / "manifest.json")
+    manifest = CustomNodeManifest(path)
+    record(manifest, custom_node)
+    manifest.save()
+
+    loaded = CustomNodeManifest(path)
+    loaded.load()
+    entry = loaded.get(custom_node)
+    assert entry is not None
+    assert entry["node_names"] == ["MyNode"]
+    assert entry["display_names"] == {"MyNode": "My Node"}
+    assert entry["eager"] is False
+
+
+def test_entry_invalidated_by_changes(tmp_path, custom_node):
+    manifest = CustomNodeManifest(str(tmp_path / "manifest.json"))
+    record(manifest, custom_node)
+    assert manifest.get(custom_node) is not None
+
+    with open(os.path.join(custom_node, "nodes.py"), "w") as f:
+        f.write("x = 1\n")
+    assert manifest.get(custom_node) is None
+
+
+def test_fingerprint_ignores_pycache(custom_node):
+    before = module_fingerprint(custom_node)
+    os.makedirs(os.path.join(custom_node, "__pycache__"))
+    with open(os.path.join(custom_node, "__pycache__", "cached.py"), "w") as f:
+        f.write("")
+    assert module_fingerprint(custom_node) == before
+
+
+def test_other_version_discarded(tmp_path, custom_node):
+    path = str(tmp_path / "manifest.json")
+    manifest = CustomNodeManifest(path)
+    record(manifest, custom_node)
+    manifest.save()
+
+    with open(path) as f:
+        data = f.read().replace('"comfyui_version": "', '"comfyui_version": "old-')
+    with open(path, "w") as f:
+        f.write(data)
+
+    loaded = CustomNodeManifest(path)
+    loaded.load()
+    assert loaded.get(custom_node) is None
+
+
+def test_prune(tmp_path, custom_node):
+    manifest = CustomNodeManifest(str(tmp_path / "manifest.json"))
+    record(manifest, custom_node)
+    manifest.prune([])
+    assert manifest.get(custom_node) is None
+    assert manifest.dirty
+
+
+def test_node_info(tmp_path, custom_node, monkeypatch):
+    listings = {"loras": ["a.safetensors"], "vae": [], "upscale_models": []}
+    monkeypatch.setattr(folder_paths, "get_filename_list", lambda name: listings[name])
+    path = str(tmp_path / "manifest.json")
+    manifest = CustomNodeManifest(path)
+    record(manifest, custom_node)
+    manifest.save()
+    info = {"name": "MyNode", "input": {"required": {"lora": (["a.safetensors"],), "mode": (["fast", "slow"], {"default": "fast"})},
+                                        "optional": {"model": ("COMBO", {"options": ["a.safetensors"]})}}}
+    # modules that are not imported have no info to record
+    manifest.set_node_info({"OtherNode": {}}, listings)
+    assert not manifest.dirty
+    manifest.set_node_info({"MyNode": info, "OtherNode": {}}, listings)
+    assert manifest.dirty
+    manifest.save()
+
+    loaded = CustomNodeManifest(path)
+    loaded.load()
+    assert loaded.node_info(custom_node, "MyNode") == json.loads(json.dumps(info))
+    assert loaded.node_info(custom_node, "OtherNode") is None
+    loaded.set_node_info({"MyNode": info}, listings)
+    assert not loaded.dirty
+
+    # the folder listings are served as they are now, the other options as recorded
+    listings["loras"] = ["a.safetensors", "b.safetensors"]
+    served = loaded.node_info(custom_node, "MyNode")
+    assert served["input"]["required"]["lora"] == [["a.safetensors", "b.safetensors"]]
+    assert served["input"]["optional"]["model"] == ["COMBO", {"options": ["a.safetensors", "b.safetensors"]}]
+    assert served["input"]["required"]["mode"] == [["fast", "slow"], {"default": "fast"}]
+
+
+@pytest.mark.parametrize("spec", [([],), (["x.png"], {"image_upload": True})])
+def test_computed_node_info_not_recorded(tmp_path, custom_node, spec):
+    # an empty list could be the listing of either empty folder
+    listings = {"vae": [], "upscale_models": []}
+    manifest = CustomNodeManifest(str(tmp_path / "manifest.json"))
+    record(manifest, custom_node)
+    manifest.set_node_info({"MyNode": {"input": {"required": {"x": (["a"],)}}}}, listings)
+    assert manifest.node_info(custom_node, "MyNode") is not None
+    manifest.set_node_info({"MyNode": {"input": {"required": {"x": spec}}}}, listings)
+    assert manifest.node_info(custom_node, "MyNode") is None
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from comfy.attention_autotune import AttentionAutotuner, device_name, shape_bucket  # noqa: E402
+
+
+class Backend:
+    def __init__(self, delay=0.0, fail=False, value=0.0):
+        self.delay = delay
+        self.fail = fail
+        self.value = value
+        self.calls = 0
+
+    def __call__(self, q, k, v, heads, mask=None, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("not supported")
+        time.sleep(self.delay)
+        return torch.full_like(q, self.value)
+
+
+def qkv(q_len=64, k_len=64):
+    return torch.zeros(1, q_len, 32), torch.zeros(1, k_len, 32), torch.zeros(1, k_len, 32)
+
+
+def test_shape_bucket():
+    assert [shape_bucket(n) for n in (1, 2, 3, 77, 4096, 4097)] == [1, 2, 4, 128, 4096, 8192]
+
+
+def test_signature():
+    tuner = AttentionAutotuner()
+    q, k, _ = qkv(4000, 77)
+    assert tuner.signature(q, k, 4) == "cpu|float32|bh4|q4096|k128|d8|nomask"
+    assert tuner.signature(q.view(1, 4000, 4, 8).transpose(1, 2), k.view(1, 77, 4, 8).transpose(1, 2), 4, mask=torch.zeros(1), skip_reshape=True) == "cpu|float32|bh4|q4096|k128|d8|mask"
+
+
+
+def test_device_name_cached(monkeypatch):
+    calls = []
+
+    def get_device_name(device):
+        calls.append(device)
+        return "GPU"
+
+    monkeypatch.setattr(torch.cuda, "get_device_name", get_device_name)
+    device_name.cache_clear()
+    try:
+        assert [device_name(torch.device("cuda", 0)) for _ in range(3)] == ["GPU"] * 3
+        assert device_name(torch.device("cpu")) == "cpu"
+        assert calls == [torch.device("cuda", 0)]
+    finally:
+        device_name.cache_clear()
+
+def test_picks_fastest_and_remembers(tmp_path):
+    path = str(tmp_path / "autotune.json")
+    tuner = AttentionAutotuner(path)
+    backends = {"slow": Backend(delay=0.01), "fast": Backend(), "broken": Backend(fail=True), "nan": Backend(value=float("nan"))}
+    q, k, v = qkv()
+    assert tuner.select(backends, q, k, v, 4) == "fast"
+    calls = {n: b.calls for n, b in backends.items()}
+    assert tuner.select(backends, q, k, v, 4) == "fast"
+    assert {n: b.calls for n, b in backends.items()} == calls
+    # another shape signature is tuned on its own
+    assert tuner.select(backends, *qkv(200, 64), 4) == "fast"
+    assert backends["slow"].calls > calls["slow"]
+
+    other = AttentionAutotuner(path)
+    assert other.select({"fast": Backend(fail=True)}, q, k, v, 4) == "fast"
+    assert {entry[:2] for entry in other.table()} == {(tuner.signature(q, k, 4), "fast"), (tuner.signature(*qkv(200, 64)[:2], 4), "fast")}
+
+
+def test_inaccurate_backends_not_used():
+    tuner = AttentionAutotuner()
+    lossy = Backend(value=1.01)
+    backends = {"reference": Backend(delay=0.01, value=1.0), "lossy": lossy, "close": Backend(delay=0.005, value=1.0 + 1e-6)}
+    assert tuner.select(backends, *qkv(), 4) == "close"
+    assert lossy.calls == 1
+
+def test_retunes_when_backend_missing():
+    tuner = AttentionAutotuner()
+    q, k, v = qkv()
+    assert tuner.select({"a": Backend()}, q, k, v, 4) == "a"
+    assert tuner.select({"b": Backend()}, q, k, v, 4) == "b"
+
+
+def test_default_when_nothing_works():
+    tuner = AttentionAutotuner()
+    broken = Backend(fail=True)
+    q, k, v = qkv()
+    assert tuner.select({"broken": broken}, q, k, v, 4) is None
+    assert tuner.select({"broken": broken}, q, k, v, 4) is None
+    assert broken.calls == 1
+
+
+def test_attention_autotune_matches_pytorch(cpu, monkeypatch):
+    from comfy.ldm.modules import attention
+    monkeypatch.setattr(attention.comfy.attention_autotune, "attention_tuner", AttentionAutotuner())
+
+    q, k, v = (torch.randn(2, 100, 64) for _ in range(3))
+    expected = attention.attention_pytorch(q, k, v, 4)
+    torch.testing.assert_close(attention.attention_autotune(q, k, v, 4), expected, rtol=1e-4, atol=1e-4)
+    assert len(attention.comfy.attention_autotune.attention_tuner.table()) == 1
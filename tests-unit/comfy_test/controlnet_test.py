@@ -0,0 +1,92 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+
+class ModelSampling:
+    def timestep(self, sigma):
+        return sigma * 100
+
+    def calculate_input(self, sigma, noise):
+        return noise / (sigma.view(-1, 1, 1, 1) ** 2 + 1) ** 0.5
+
+
+class Model:
+    model_sampling = ModelSampling()
+
+
+@pytest.fixture(scope="module")
+def controlnet(cpu):
+    from comfy import controlnet, ops
+    from comfy.cldm import cldm
+
+    torch.manual_seed(0)
+    control_model = cldm.ControlNet(image_size=32, in_channels=4, model_channels=32, hint_channels=3, num_res_blocks=1,
+                                    channel_mult=(1, 2), attention_resolutions=[], num_head_channels=32,
+                                    use_spatial_transformer=True, transformer_depth=[1, 1], transformer_depth_middle=1, context_dim=32,
+                                    operations=ops.manual_cast)
+    for p in control_model.parameters():
+        torch.nn.init.normal_(p, std=0.1)
+    return controlnet, control_model
+
+
+def make_chain(controlnet, control_model, count):
+    module, model = controlnet, control_model
+    chain = None
+    for i in range(count):
+        c = module.ControlNet(model, load_device=torch.device("cpu"))
+        c.set_cond_hint(torch.rand(1, 3, 64, 64, generator=torch.Generator().manual_seed(i)), strength=0.5 + i)
+        c.set_previous_controlnet(chain)
+        chain = c
+    chain.pre_run(Model(), lambda a: 1000.0 * (1.0 - a))
+    return chain
+
+
+def run(chain, sigma, x):
+    cond = {"c_crossattn": torch.ones(x.shape[0], 7, 32)}
+    with torch.no_grad():
+        return chain.get_control(x, torch.tensor([sigma] * x.shape[0]), cond, 1, {})
+
+
+def assert_same(a, b):
+    for k in b:
+        assert len(a[k]) == len(b[k])
+        for x, y in zip(a[k], b[k]):
+            torch.testing.assert_close(x, y, rtol=1e-4, atol=1e-4)
+
+
+def test_batched_chain_matches_sequential(controlnet, monkeypatch):
+    module, control_model = controlnet
+    x = torch.randn(2, 4, 8, 8, generator=torch.Generator().manual_seed(5))
+
+    calls = []
+    forward = control_model.forward
+    monkeypatch.setattr(control_model, "forward", lambda **kwargs: calls.append(kwargs["x"].shape[0]) or forward(**kwargs))
+    batched = run(make_chain(module, control_model, 3), 1.0, x)
+    assert calls == [6]
+
+    calls.clear()
+    monkeypatch.setattr(module, "run_controlnets_batched", lambda *args: None)
+    sequential = run(make_chain(module, control_model, 3), 1.0, x)
+    assert calls == [2, 2, 2]
+    assert_same(batched, sequential)
+
+
+def test_output_reused_within_sigma_window(controlnet, monkeypatch):
+    module, control_model = controlnet
+    x = torch.randn(2, 4, 8, 8)
+    chain = make_chain(module, control_model, 1)
+    chain.set_cache_sigma_window(0.25)
+
+    calls = []
+    forward = control_model.forward
+    monkeypatch.setattr(control_model, "forward", lambda **kwargs: calls.append(1) or forward(**kwargs))
+    first = run(chain, 10.0, x)
+    reused = run(chain, 8.0, x)
+    assert len(calls) == 1
+    assert_same(reused, first)
+
+    run(chain, 7.0, x)
+    assert len(calls) == 2
+    chain.cleanup()
+    assert chain.cached_controls == []
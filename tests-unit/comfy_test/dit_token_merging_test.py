@@ -0,0 +1,94 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+
+@pytest.fixture
+def model_patcher(cpu):
+    from comfy import model_patcher
+    return model_patcher.ModelPatcher(torch.nn.Module(), torch.device("cpu"), torch.device("cpu"))
+
+
+def init_weights(model):
+    torch.manual_seed(0)
+    for name, p in model.named_parameters():
+        if p.ndim >= 2:
+            torch.nn.init.normal_(p, std=p[0].numel() ** -0.5)
+        elif name.endswith("bias"):
+            torch.nn.init.zeros_(p)
+        else:
+            torch.nn.init.ones_(p)
+    return model
+
+
+def tiny_models():
+    from comfy.ops import disable_weight_init as ops
+    from comfy.ldm.flux.model import Flux
+    from comfy.ldm.modules.diffusionmodules.mmdit import OpenAISignatureMMDITWrapper
+    from comfy.ldm.wan.model import WanModel
+    flux = Flux(in_channels=16, out_channels=16, vec_in_dim=32, context_in_dim=64, hidden_size=128, mlp_ratio=4.0, num_heads=4,
+                depth=1, depth_single_blocks=1, axes_dim=[8, 12, 12], theta=10000, patch_size=2, qkv_bias=True, guidance_embed=False, operations=ops)
+    sd3 = OpenAISignatureMMDITWrapper(patch_size=2, in_channels=16, depth=2, num_patches=4096, pos_embed_max_size=64, adm_in_channels=32, qk_norm="rms",
+                                      context_embedder_config={"target": "torch.nn.Linear", "params": {"in_features": 64, "out_features": 128}},
+                                      x_block_self_attn_layers=[0], operations=ops)
+    wan = WanModel(dim=128, ffn_dim=256, text_dim=64, num_heads=4, num_layers=1, operations=ops)
+    image_inputs = (torch.randn(1, 16, 32, 24), torch.tensor([0.5]), torch.randn(1, 7, 64), torch.randn(1, 32))
+    video_inputs = (torch.randn(1, 16, 3, 32, 24), torch.tensor([0.5]), torch.randn(1, 7, 64))
+    return [(init_weights(flux), image_inputs), (init_weights(sd3), image_inputs), (init_weights(wan), video_inputs)]
+
+
+def test_tome_dit_functions(model_patcher):
+    from comfy_extras.nodes_tomesd import get_dit_functions
+    # every 2x2 region of the 8x6 token grid has the same token so merging loses nothing
+    grid = torch.randn(1, 4, 3, 16).repeat_interleave(2, dim=1).repeat_interleave(2, dim=2)
+    text = torch.randn(1, 5, 16)
+    x = torch.cat((text, grid.flatten(1, 2)), dim=1)
+    merge, unmerge = get_dit_functions(x, 0.75, (8, 6))
+    merged = merge(x)
+    assert merged.shape == (1, 5 + 12, 16)
+    assert torch.equal(merged[:, :5], text)
+    torch.testing.assert_close(unmerge(merged), x)
+
+    merge, unmerge = get_dit_functions(x, 0.0, (8, 6))
+    assert merge(x) is x
+
+
+def test_hypertile_dit_tiles(model_patcher):
+    from comfy.ldm.common_dit import attention_with_patches, optimized_attention
+    from comfy_extras.nodes_hypertile import HyperTile
+    m = HyperTile().patch(model_patcher, 32, 1, 0, False)[0]
+    # 2 text tokens and 4x4 image tokens of 2x2 latent pixels, the 32 pixel tiles are 2x2 tokens
+    transformer_options = dict(m.model_options["transformer_options"], token_grid=(4, 4), original_shape=[1, 16, 8, 8])
+    q, k, v = torch.randn(3, 2, 18, 8).unbind(0)
+    out = attention_with_patches(q, k, v, 2, transformer_options=transformer_options)
+
+    grid = torch.arange(16).reshape(4, 4) + 2
+    text_out = []
+    for tile in grid.unflatten(0, (2, 2)).unflatten(2, (2, 2)).permute(0, 2, 1, 3).flatten(2).flatten(0, 1):
+        idx = torch.cat((torch.arange(2), tile))
+        tile_out = optimized_attention(q[:, idx], k[:, idx], v[:, idx], 2)
+        torch.testing.assert_close(out[:, tile], tile_out[:, 2:])
+        text_out.append(tile_out[:, :2])
+    torch.testing.assert_close(out[:, :2], torch.stack(text_out).mean(0))
+
+
+def test_dit_models_patched(model_patcher):
+    from comfy_extras.nodes_hypertile import HyperTile
+    from comfy_extras.nodes_tomesd import TomePatchModel
+    patched = {
+        "tome": TomePatchModel().patch(model_patcher, 0.5)[0],
+        "tome off": TomePatchModel().patch(model_patcher, 0.0)[0],
+        "hypertile": HyperTile().patch(model_patcher, 64, 1, 0, False)[0],
+        "hypertile off": HyperTile().patch(model_patcher, 2048, 1, 0, False)[0],
+    }
+    for model, inputs in tiny_models():
+        with torch.no_grad():
+            base = model(*inputs)
+            for name, m in patched.items():
+                out = model(*inputs, transformer_options=m.model_options["transformer_options"])
+                assert out.shape == base.shape
+                if name.endswith("off"):
+                    torch.testing.assert_close(out, base)
+                else:
+                    assert not torch.equal(out, base)
+                    assert (out - base).norm() < 0.5 * base.norm()
@@ -0,0 +1,64 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+if not hasattr(torch, "float8_e4m3fn"):
+    pytest.skip("float8 needs a newer pytorch", allow_module_level=True)
+
+import comfy.float  # noqa: E402
+
+FLOAT8_TYPES = [torch.float8_e4m3fn, torch.float8_e5m2]
+
+
+def float8_values(dtype):
+    values = torch.arange(256, dtype=torch.uint8).view(dtype).float()
+    return values[values.isfinite()].unique()
+
+
+@pytest.mark.parametrize("dtype", FLOAT8_TYPES)
+def test_rounds_to_neighbours(dtype):
+    info = torch.finfo(dtype)
+    x = torch.cat([torch.randn(10000) * s for s in (1e-4, 1e-2, 1.0, 100.0)] + [torch.tensor([0.0, -0.0, info.max, -info.max])])
+    out = comfy.float.stochastic_rounding(x, dtype, seed=1).float()
+
+    grid = float8_values(dtype)
+    x = x.clamp(info.min, info.max)
+    i = torch.searchsorted(grid, x, right=True).clamp(1, len(grid) - 1)
+    lower, upper = grid[i - 1], grid[i]
+    exact = grid[i - 1] == x
+    assert ((out == lower) | (out == upper) | (exact & (out == x))).all()
+    # representable values don't change
+    representable = grid[grid.abs() <= info.max]
+    assert torch.equal(comfy.float.stochastic_rounding(representable, dtype).float(), representable)
+
+
+@pytest.mark.parametrize("dtype", FLOAT8_TYPES)
+@pytest.mark.parametrize("value", [0.3, -2.7, 0.003, -1e-5, 300.0])
+def test_unbiased(dtype, value):
+    x = torch.full((200000,), value)
+    out = comfy.float.stochastic_rounding(x, dtype, seed=0).float()
+    grid = float8_values(dtype)
+    spacing = (grid[grid > abs(value)].min() - grid[grid <= abs(value)].max()).item()
+    assert abs(out.mean().item() - value) < spacing * 0.01
+
+
+def test_clamps_and_seeds():
+    x = torch.tensor([1000.0, -1e6, float("inf"), 0.1])
+    out = comfy.float.stochastic_rounding(x, torch.float8_e4m3fn, seed=3).float()
+    assert out[:3].tolist() == [448.0, -448.0, 448.0]
+
+    x = torch.randn(64, 48)
+    a = comfy.float.stochastic_rounding(x, torch.float8_e4m3fn, seed=5)
+    assert a.shape == x.shape and a.dtype == torch.float8_e4m3fn
+    assert torch.equal(a.float(), comfy.float.stochastic_rounding(x, torch.float8_e4m3fn, seed=5).float())
+    assert not torch.equal(a.float(), comfy.float.stochastic_rounding(x, torch.float8_e4m3fn, seed=6).float())
+    # transposed inputs keep their shape
+    assert torch.equal(comfy.float.stochastic_rounding(x.t(), torch.float8_e4m3fn, seed=5).float(), comfy.float.stochastic_rounding(x.t().contiguous(), torch.float8_e4m3fn, seed=5).float())
+
+
+def test_chunks(monkeypatch):
+    x = torch.randn(1000)
+    monkeypatch.setattr(comfy.float, "STOCHASTIC_ROUNDING_CHUNK", 300)
+    out = comfy.float.stochastic_rounding(x, torch.float8_e5m2, seed=0).float()
+    grid = float8_values(torch.float8_e5m2)
+    i = torch.searchsorted(grid, x, right=True)
+    assert ((out == grid[i - 1]) | (out == grid[i])).all()
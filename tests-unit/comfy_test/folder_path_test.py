@@ -115,6 +115,55 @@ def test_get_save_image_path(temp_dir):
         assert subfolder == ""
         assert filename_prefix == "test"
 
+def test_save_counter_not_rescanned(temp_dir, clear_folder_paths):
+    full_output_folder, filename, counter, _, _ = folder_paths.get_save_image_path("test", temp_dir)
+    for i in range(3):
+        file, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "png")
+        assert file == f"test_{i + 1:05}_.png"
+        counter += 1
+
+    with patch("os.listdir", side_effect=AssertionError("output folder scanned")):
+        _, _, counter, _, _ = folder_paths.get_save_image_path("test", temp_dir)
+    assert counter == 4
+
+def test_save_file_skips_taken_names(temp_dir, clear_folder_paths):
+    full_output_folder, filename, counter, _, _ = folder_paths.get_save_image_path("test", temp_dir)
+    # written by another process after the counter was looked up
+    for i in range(1, 3):
+        open(os.path.join(temp_dir, f"test_{i:05}_.png"), "w").close()
+    file, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "png")
+    assert (file, counter) == ("test_00003_.png", 3)
+
+def test_save_counter_rescanned_after_unknown_write(temp_dir, clear_folder_paths):
+    full_output_folder, filename, counter, _, _ = folder_paths.get_save_image_path("test", temp_dir)
+    folder_paths.create_save_file(full_output_folder, filename, counter, "png")
+    _, _, counter, _, _ = folder_paths.get_save_image_path("test", temp_dir)
+    # a caller writing its file without create_save_file
+    open(os.path.join(temp_dir, f"test_{counter:05}_.png"), "w").close()
+    _, _, counter, _, _ = folder_paths.get_save_image_path("test", temp_dir)
+    assert counter == 3
+
+def test_save_file_batch_number(temp_dir, clear_folder_paths):
+    full_output_folder, filename, counter, _, _ = folder_paths.get_save_image_path("test_%batch_num%", temp_dir)
+    file, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "png", 2)
+    assert file == "test_2_00001_.png"
+    assert os.path.isfile(os.path.join(temp_dir, file))
+
+def test_save_file_removed_on_error(temp_dir, clear_folder_paths):
+    full_output_folder, filename, counter, _, _ = folder_paths.get_save_image_path("test", temp_dir)
+    file, counter = folder_paths.create_save_file(full_output_folder, filename, counter, "safetensors")
+    with pytest.raises(OSError):
+        with folder_paths.remove_on_error(os.path.join(temp_dir, file)) as path:
+            with open(path, "wb") as f:
+                f.write(b"partial")
+            raise OSError("disk full")
+    assert os.listdir(temp_dir) == []
+
+    with folder_paths.remove_on_error(os.path.join(temp_dir, file)) as path:
+        with open(path, "wb") as f:
+            f.write(b"done")
+    assert os.listdir(temp_dir) == [file]
+
 
 def test_base_path_changes(set_base_dir):
     test_dir = os.path.abspath("/test/dir")
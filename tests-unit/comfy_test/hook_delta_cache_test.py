@@ -0,0 +1,123 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+
+@pytest.fixture
+def comfy_modules(cpu):
+    from comfy import hooks, lora, model_patcher
+    return hooks, lora, model_patcher
+
+
+def lora_patch(out_features, in_features, rank=2, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    up = torch.randn(out_features, rank, generator=generator)
+    down = torch.randn(rank, in_features, generator=generator)
+    return ("lora", (up, down, None, None, None, None))
+
+
+def test_delta_cache_lru(comfy_modules):
+    _, _, model_patcher = comfy_modules
+    cache = model_patcher.HookDeltaCache(max_bytes=3 * 16)
+    for i in range(3):
+        assert cache.put(("hook", str(i)), torch.zeros(4))
+    assert cache.get(("hook", "0")) is not None
+    assert cache.put(("hook", "3"), torch.zeros(4))
+    # "1" was the least recently used
+    assert cache.get(("hook", "1")) is None
+    assert cache.put(("hook", "big"), torch.zeros(16)) is False
+    assert cache.stats() == {"entries": 3, "bytes": 48, "hits": 1, "misses": 1, "evictions": 1, "rejected": 1}
+    cache.clear()
+
+    assert cache.put(("other", "a"), torch.zeros(4))
+    assert cache.put(("hook", "a"), torch.zeros(4))
+    cache.remove_hook("other")
+    assert list(cache.deltas) == [("hook", "a")] and cache.size == 16
+
+
+def test_is_linear_patch(comfy_modules):
+    _, lora, _ = comfy_modules
+    patch = lora_patch(4, 4)
+    assert lora.is_linear_patch((1.0, patch, 1.0, None, None))
+    assert lora.is_linear_patch((0.5, (torch.zeros(4, 4),), 1.0, None, None))
+    assert not lora.is_linear_patch((1.0, patch, 0.5, None, None))
+    assert not lora.is_linear_patch((1.0, patch, 1.0, None, lambda a: a))
+    assert not lora.is_linear_patch((1.0, ("lora", patch[1][:4] + (torch.ones(4), None)), 1.0, None, None))
+    assert not lora.is_linear_patch((1.0, ("set", (torch.zeros(4, 4),)), 1.0, None, None))
+
+
+@pytest.mark.parametrize("strengths", [(0.5, 1.0), (1.0, 0.0), (0.25, -0.75)])
+def test_hook_weights_from_deltas_match_recalculation(comfy_modules, monkeypatch, strengths):
+    hooks, _, model_patcher = comfy_modules
+    # the deltas of the two hooks are about twice the size of the tiny model
+    monkeypatch.setattr(model_patcher, "HOOK_DELTA_CACHE_RATIO", 4.0)
+
+    def patched_weights(hook_mode):
+        torch.manual_seed(0)
+        model = torch.nn.Sequential(torch.nn.Linear(8, 6), torch.nn.Linear(6, 4))
+        patcher = model_patcher.ModelPatcher(model, torch.device("cpu"), torch.device("cpu"))
+        patcher.set_hook_mode(hook_mode)
+        group = hooks.HookGroup()
+        for i, strength in enumerate(strengths):
+            hook = hooks.WeightHook()
+            hook.hook_keyframe.add(hooks.HookKeyframe(strength=strength))
+            patcher.add_hook_patches(hook, {"0.weight": lora_patch(6, 8, seed=i), "1.weight": lora_patch(4, 6, seed=10 + i)}, strength_patch=0.8)
+            group.add(hook)
+        patcher.patch_hooks(group)
+        weights = [model[0].weight.detach().clone(), model[1].weight.detach().clone()]
+        return patcher, group, weights
+
+    _, _, expected = patched_weights(hooks.EnumHookMode.MinVram)
+    patcher, group, weights = patched_weights(hooks.EnumHookMode.MaxSpeed)
+    for w, e in zip(weights, expected):
+        torch.testing.assert_close(w, e)
+    computed = patcher.hook_delta_cache.misses
+    # the weights served from the deltas are not also cached in full
+    assert group not in patcher.cached_hook_patches
+    assert patcher.hook_delta_cache.max_bytes == 4 * patcher.model_size()
+
+    # a new keyframe strength reuses the deltas
+    group.hooks[0].hook_keyframe.keyframes[0].strength = 0.1
+    patcher.cached_hook_patches.clear()
+    patcher.patch_hooks(None)
+    patcher.patch_hooks(group)
+    assert patcher.hook_delta_cache.misses == computed
+    assert patcher.hook_delta_cache.hits > 0
+
+
+def test_hook_weights_cached_in_full_without_room_for_deltas(comfy_modules, monkeypatch):
+    hooks, _, model_patcher = comfy_modules
+    monkeypatch.setattr(model_patcher, "HOOK_DELTA_CACHE_RATIO", 0.0)
+    model = torch.nn.Sequential(torch.nn.Linear(8, 6))
+    patcher = model_patcher.ModelPatcher(model, torch.device("cpu"), torch.device("cpu"))
+    patcher.set_hook_mode(hooks.EnumHookMode.MaxSpeed)
+    hook = hooks.WeightHook()
+    patcher.add_hook_patches(hook, {"0.weight": lora_patch(6, 8)})
+    group = hooks.HookGroup()
+    group.add(hook)
+    patcher.patch_hooks(group)
+    assert patcher.hook_delta_cache.stats()["rejected"] == 1
+    assert list(patcher.cached_hook_patches[group]) == ["0.weight"]
+
+
+def test_cached_weights_and_deltas_mixed(comfy_modules, monkeypatch):
+    hooks, _, model_patcher = comfy_modules
+    monkeypatch.setattr(model_patcher, "HOOK_DELTA_CACHE_RATIO", 4.0)
+    model = torch.nn.Sequential(torch.nn.Linear(8, 6), torch.nn.Linear(6, 4))
+    patcher = model_patcher.ModelPatcher(model, torch.device("cpu"), torch.device("cpu"))
+    patcher.set_hook_mode(hooks.EnumHookMode.MaxSpeed)
+    hook = hooks.WeightHook()
+    patcher.add_hook_patches(hook, {"0.weight": lora_patch(6, 8)})
+    # a strength_model other than 1.0 is not linear in the hook strength
+    patcher.add_hook_patches(hook, {"1.weight": lora_patch(4, 6)}, strength_model=0.5)
+    group = hooks.HookGroup()
+    group.add(hook)
+    patcher.patch_hooks(group)
+    expected = [model[0].weight.detach().clone(), model[1].weight.detach().clone()]
+    assert list(patcher.cached_hook_patches[group]) == ["1.weight"]
+
+    patcher.patch_hooks(None)
+    patcher.patch_hooks(group)
+    torch.testing.assert_close(model[0].weight, expected[0])
+    torch.testing.assert_close(model[1].weight, expected[1])
+    assert patcher.hook_delta_cache.hits == 1
@@ -0,0 +1,49 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+
+@pytest.fixture
+def nodes_hunyuan3d(cpu):
+    from comfy_extras import nodes_hunyuan3d
+    return nodes_hunyuan3d
+
+
+def ellipsoid(n=32):
+    g = torch.linspace(-1, 1, n)
+    z, y, x = torch.meshgrid(g, g, g, indexing="ij")
+    return (0.7 - (x ** 2 + y ** 2 + (z * 1.3) ** 2).sqrt()) * 4
+
+
+def signed_volume(vertices, faces):
+    a, b, c = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    return (a * torch.cross(b, c, dim=1)).sum().item() / 6
+
+
+def test_surface_net_closed_and_oriented_like_basic(nodes_hunyuan3d):
+    voxels = ellipsoid()
+    basic_vertices, basic_faces = nodes_hunyuan3d.voxel_to_mesh(voxels, threshold=0.6)
+    vertices, faces = nodes_hunyuan3d.voxel_to_mesh_surface_net(voxels, threshold=0.6)
+
+    # every edge is used once in each direction by the faces of a closed, consistently wound mesh
+    edges = torch.cat([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    assert torch.unique(edges, dim=0).shape[0] == edges.shape[0]
+    assert torch.equal(torch.unique(edges, dim=0), torch.unique(edges.flip(1), dim=0))
+
+    assert vertices.shape[0] * 3 < basic_vertices.shape[0]
+    assert signed_volume(vertices, faces) == pytest.approx(signed_volume(basic_vertices, basic_faces), rel=0.05)
+    assert vertices.abs().max() <= 1.0
+
+
+def test_surface_net_decimation(nodes_hunyuan3d):
+    voxels = ellipsoid()
+    vertices, faces = nodes_hunyuan3d.voxel_to_mesh_surface_net(voxels, threshold=0.6)
+    decimated_vertices, decimated_faces = nodes_hunyuan3d.voxel_to_mesh_surface_net(voxels, threshold=0.6, decimation=2)
+    assert decimated_vertices.shape[0] * 2 < vertices.shape[0]
+    assert decimated_faces.max() < decimated_vertices.shape[0]
+    assert signed_volume(decimated_vertices, decimated_faces) == pytest.approx(signed_volume(vertices, faces), rel=0.1)
+
+
+def test_surface_net_empty(nodes_hunyuan3d):
+    vertices, faces = nodes_hunyuan3d.voxel_to_mesh_surface_net(torch.zeros(8, 8, 8), threshold=0.6)
+    assert vertices.shape == (1, 3) and faces.shape == (1, 3)
@@ -0,0 +1,46 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+
+@pytest.fixture
+def decoders(cpu):
+    from comfy.ldm.hunyuan3d.vae import HierarchicalVolumeDecoder, VanillaVolumeDecoder
+    return VanillaVolumeDecoder(), HierarchicalVolumeDecoder()
+
+
+class SphereDecoder:
+    """Occupancy logits of spheres of a different radius per batch item, counting the decoded points."""
+    def __init__(self, radius):
+        self.radius = radius
+        self.points = 0
+
+    def __call__(self, queries, latents):
+        self.points += queries.shape[1]
+        return (self.radius[:, None] - queries.norm(dim=-1)).unsqueeze(-1) * 4
+
+
+def surface_cells(grid, level):
+    coarse = grid.unsqueeze(1)
+    corners_max = torch.nn.functional.max_pool3d(coarse, 2, stride=1)
+    corners_min = -torch.nn.functional.max_pool3d(-coarse, 2, stride=1)
+    return ((corners_min <= level) & (corners_max >= level)).squeeze(1)
+
+
+@pytest.mark.parametrize("resolution,levels", [(32, 2), (48, 3), (30, 3)])
+def test_hierarchical_matches_dense_at_surface(decoders, resolution, levels):
+    vanilla, hierarchical_volume_decoder = decoders
+    latents = torch.zeros(2, 1, 1)
+    level = 0.6
+    dense_decoder = SphereDecoder(torch.tensor([0.7, 0.45]))
+    dense = vanilla(latents, dense_decoder, num_chunks=1000, octree_resolution=resolution, enable_pbar=False)
+    hierarchical_decoder = SphereDecoder(torch.tensor([0.7, 0.45]))
+    hierarchical = hierarchical_volume_decoder(latents, hierarchical_decoder, num_chunks=1000, octree_resolution=resolution,
+                                               levels=levels, mc_level=level, enable_pbar=False)
+
+    assert hierarchical.shape == dense.shape
+    assert torch.equal(surface_cells(hierarchical, level), surface_cells(dense, level))
+    cells = surface_cells(dense, level)
+    corners = torch.nn.functional.max_pool3d(torch.nn.functional.pad(cells.float().unsqueeze(1), (1, 1, 1, 1, 1, 1)), 2, stride=1).squeeze(1) > 0
+    torch.testing.assert_close(hierarchical[corners], dense[corners])
+    assert hierarchical_decoder.points < dense_decoder.points / 2
@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Modules that must only be imported once a model of that family is actually loaded.
+ON_DEMAND_MODULES = [
+    "transformers",
+    "comfy.ldm.flux.model",
+    "comfy.ldm.wan.model",
+    "comfy.ldm.wan.vae",
+    "comfy.ldm.hunyuan_video.model",
+    "comfy.ldm.lightricks.model",
+    "comfy.ldm.cosmos.model",
+    "comfy.ldm.cascade.stage_c",
+    "comfy.ldm.cascade.stage_c_coder",
+    "comfy.text_encoders.flux",
+    "comfy.text_encoders.sd3_clip",
+    "comfy.text_encoders.hunyuan_video",
+]
+
+BENCHMARK_SCRIPT = """
+import sys, time, json
+sys.argv = ["main.py", "--cpu"]
+import comfy.options
+comfy.options.enable_args_parsing()
+import utils.extra_config
+times = {}
+start = time.perf_counter()
+import torch
+times["torch"] = time.perf_counter() - start
+for name in ["comfy.model_detection", "comfy.sd", "comfy.controlnet"]:
+    t = time.perf_counter()
+    __import__(name)
+    times[name] = time.perf_counter() - t
+loaded_before = [m for m in %(modules)r if m in sys.modules]
+
+import comfy.supported_models
+config = comfy.supported_models.Flux({"image_model": "flux", "guidance_embed": True})
+config.clip_target({})
+print(json.dumps({"times": times, "loaded": loaded_before,
+                  "flux_te_loaded": "comfy.text_encoders.flux" in sys.modules}))
+"""
+
+
+def run_benchmark():
+    script = BENCHMARK_SCRIPT % {"modules": ON_DEMAND_MODULES}
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=600)
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope="module")
+def benchmark():
+    pytest.importorskip("torch")
+    return run_benchmark()
+
+
+def test_model_families_imported_on_demand(benchmark):
+    assert benchmark["loaded"] == []
+
+
+def test_clip_target_imports_text_encoder(benchmark):
+    assert benchmark["flux_te_loaded"]
+
+
+def test_import_time_report(benchmark):
+    times = benchmark["times"]
+    logging.info("Import times (seconds):")
+    for name, seconds in times.items():
+        logging.info("{:8.3f} {}".format(seconds, name))
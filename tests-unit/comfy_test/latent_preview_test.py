@@ -0,0 +1,60 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+
+class Previewer:
+    def __init__(self):
+        self.calls = 0
+
+    def decode_latent_to_preview_image(self, preview_format, x0):
+        self.calls += 1
+        return (preview_format, None, None)
+
+
+class Model:
+    load_device = torch.device("cpu")
+
+    class model:
+        latent_format = None
+
+
+@pytest.fixture
+def latent_preview(cpu, monkeypatch):
+    import latent_preview
+    previewer = Previewer()
+    monkeypatch.setattr(latent_preview, "get_previewer", lambda device, latent_format: previewer)
+    monkeypatch.setattr(latent_preview, "PREVIEW_WANTED_CHECK", None)
+    return latent_preview, previewer
+
+
+def run_steps(latent_preview, steps):
+    callback = latent_preview.prepare_callback(Model(), steps)
+    for i in range(steps):
+        callback(i, torch.zeros(1, 4, 8, 8), None, steps)
+
+
+def test_previews_rate_limited(latent_preview, monkeypatch):
+    module, previewer = latent_preview
+    monkeypatch.setattr(module, "PREVIEW_INTERVAL", 3600.0)
+    run_steps(module, 10)
+    assert previewer.calls == 1
+
+    monkeypatch.setattr(module, "PREVIEW_INTERVAL", 0.0)
+    run_steps(module, 10)
+    assert previewer.calls == 11
+
+
+def test_previews_skipped_without_listeners(latent_preview, monkeypatch):
+    module, previewer = latent_preview
+    monkeypatch.setattr(module, "PREVIEW_INTERVAL", 0.0)
+    module.set_preview_wanted_check(lambda: False)
+    run_steps(module, 10)
+    assert previewer.calls == 0
+
+
+def test_downscale_preview(latent_preview):
+    module, _ = latent_preview
+    image = torch.rand(100, 60, 3)
+    assert module.downscale_preview(image, 50).shape == (50, 30, 3)
+    assert module.downscale_preview(image, 512) is image
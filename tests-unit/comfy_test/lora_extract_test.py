@@ -0,0 +1,82 @@
+import concurrent.futures
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import safetensors.torch  # noqa: E402
+from comfy.utils import save_torch_file_streaming  # noqa: E402
+
+
+@pytest.fixture
+def lora_extract(cpu):
+    from comfy_extras import nodes_lora_extract
+    return nodes_lora_extract
+
+
+def test_randomized_svd(lora_extract):
+    generator = torch.Generator().manual_seed(0)
+    low_rank = torch.randn(96, 6, generator=generator) @ torch.randn(6, 64, generator=generator)
+    U, S, Vh = lora_extract.randomized_svd(low_rank, 6)
+    assert U.shape == (96, 6) and S.shape == (6,) and Vh.shape == (6, 64)
+    torch.testing.assert_close(U @ torch.diag(S) @ Vh, low_rank, rtol=1e-4, atol=1e-4)
+
+    noisy = low_rank + 0.01 * torch.randn(96, 64, generator=generator)
+    exact = torch.linalg.svd(noisy, full_matrices=False)
+    U, S, Vh = lora_extract.randomized_svd(noisy, 4)
+    torch.testing.assert_close(S, exact.S[:4], rtol=1e-3, atol=1e-3)
+    best = torch.linalg.norm(noisy - exact.U[:, :4] @ torch.diag(exact.S[:4]) @ exact.Vh[:4])
+    assert torch.linalg.norm(noisy - U @ torch.diag(S) @ Vh) < best * 1.01
+
+
+@pytest.mark.parametrize("svd_type", ["full", "randomized"])
+def test_calc_lora_model(lora_extract, tmp_path, svd_type):
+    from comfy import model_patcher
+    svd_type = lora_extract.SVD_TYPES[svd_type]
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(torch.nn.Linear(16, 12), torch.nn.Conv2d(4, 6, 3), torch.nn.LayerNorm(6), torch.nn.Conv1d(4, 8, 3), torch.nn.Conv3d(4, 8, (1, 3, 3)))
+    patcher = model_patcher.ModelPatcher(model, torch.device("cpu"), torch.device("cpu"))
+    diffs = {k: torch.randn_like(v) for k, v in model.state_dict().items()}
+    for k in diffs:
+        patcher.add_patches({k: (diffs[k],)}, -1.0, 1.0)
+    expected_diffs = {k: v - diffs[k] for k, v in model.state_dict().items()}
+
+    outputs = []
+    for executor in (None, concurrent.futures.ThreadPoolExecutor(max_workers=2)):
+        sd = lora_extract.calc_lora_model(patcher, 4, "", "lora.", {}, lora_extract.LORAType.STANDARD, bias_diff=True, svd_type=svd_type, executor=executor)
+        path = str(tmp_path / "lora.safetensors")
+        save_torch_file_streaming(sd, path)
+        outputs.append(safetensors.torch.load_file(path))
+        if executor is not None:
+            executor.shutdown()
+
+    assert outputs[0].keys() == outputs[1].keys() == {
+        "lora.0.lora_up.weight", "lora.0.lora_down.weight", "lora.0.diff_b",
+        "lora.1.lora_up.weight", "lora.1.lora_down.weight", "lora.1.diff_b",
+        "lora.2.diff", "lora.2.diff_b",
+        # only the biases of the conv1d and conv3d, extract_lora can't do their weights
+        "lora.3.diff_b", "lora.4.diff_b",
+    }
+    for k in outputs[0]:
+        assert torch.equal(outputs[0][k], outputs[1][k])
+    up, down = lora_extract.extract_lora(expected_diffs["0.weight"], 4, svd_type)
+    torch.testing.assert_close(outputs[0]["lora.0.lora_up.weight"].float() @ outputs[0]["lora.0.lora_down.weight"].float(), up @ down, rtol=1e-2, atol=1e-2)
+    assert outputs[0]["lora.1.lora_down.weight"].shape == (4, 4, 3, 3)
+    torch.testing.assert_close(outputs[0]["lora.2.diff"].float(), expected_diffs["2.weight"], rtol=1e-3, atol=1e-3)
+
+
+def test_extraction_workers(lora_extract, monkeypatch):
+    from comfy import model_patcher
+    model = torch.nn.Sequential(torch.nn.Linear(64, 32), torch.nn.Linear(32, 16))
+    patcher = model_patcher.ModelPatcher(model, torch.device("cpu"), torch.device("cpu"))
+    patcher.add_patches({"1.weight": (torch.zeros(16, 32),)})
+    assert lora_extract.extraction_workers([]) == lora_extract.MAX_WORKERS
+
+    # only the patched weights are extracted
+    per_extraction = 16 * 32 * lora_extract.EXTRACTION_BYTES_PER_ELEMENT
+    monkeypatch.setattr(lora_extract.comfy.model_management, "get_free_memory", lambda device: 2.5 * per_extraction)
+    assert lora_extract.extraction_workers([patcher]) == 2
+    monkeypatch.setattr(lora_extract.comfy.model_management, "get_free_memory", lambda device: 0)
+    assert lora_extract.extraction_workers([patcher]) == 1
+    monkeypatch.setattr(lora_extract.comfy.model_management, "get_free_memory", lambda device: 1e12)
+    assert lora_extract.extraction_workers([patcher]) == lora_extract.MAX_WORKERS
@@ -0,0 +1,83 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from comfy.memory_profile import MemoryProfiles, batch_estimate  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def test_batch_estimate():
+    points = {"1": 100, "4": 250}
+    assert batch_estimate(points, 1) == 100
+    assert batch_estimate(points, 2) == 150
+    assert batch_estimate(points, 8) == 500
+    assert batch_estimate({"2": 100}, 1) == 100
+
+
+def test_estimate_interpolates_resolutions(tmp_path):
+    path = str(tmp_path / "profiles.json")
+    profiles = MemoryProfiles(path)
+    assert profiles.estimate("model", (2, 4, 64, 64)) is None
+
+    profiles.record("model", (2, 4, 64, 64), 200 * MB)
+    profiles.record("model", (2, 4, 128, 128), 800 * MB)
+    assert profiles.is_measured("model", (2, 4, 64, 64))
+    assert not profiles.is_measured("model", (1, 4, 64, 64))
+    assert profiles.estimate("model", (2, 4, 64, 64)) == 200 * MB
+    assert profiles.estimate("model", (4, 4, 64, 64)) == 400 * MB
+    assert profiles.estimate("model", (2, 4, 96, 96)) == pytest.approx(200 * MB + 600 * MB * (96 * 96 - 64 * 64) / (128 * 128 - 64 * 64))
+    # a measured bigger resolution is an upper bound, nothing to go on for a bigger one
+    assert profiles.estimate("model", (2, 4, 32, 32)) == 200 * MB
+    assert profiles.estimate("model", (2, 4, 256, 256)) is None
+    assert profiles.estimate("model", (2, 4, 8, 64, 64)) is None
+    assert profiles.estimate("other", (2, 4, 64, 64)) is None
+
+    reloaded = MemoryProfiles(path)
+    assert reloaded.estimate("model", (2, 4, 128, 128)) == 800 * MB
+
+
+def test_measure_skips_cpu():
+    profiles = MemoryProfiles()
+    with profiles.measure("model", (1, 4, 8, 8), torch.device("cpu")):
+        pass
+    assert profiles.entries == {}
+
+
+def test_memory_required_uses_profiles(cpu, monkeypatch):
+    import comfy.cli_args
+    from comfy import memory_profile, model_base
+    profiles = MemoryProfiles()
+    monkeypatch.setattr(memory_profile, "memory_profiles", profiles)
+
+    class SD15:
+        pass
+
+    def sd15_model(diffusion_model):
+        model = object.__new__(model_base.BaseModel)
+        torch.nn.Module.__init__(model)
+        model.model_config = SD15()
+        model.manual_cast_dtype = None
+        model.memory_usage_factor = 1.0
+        model.get_dtype = lambda: torch.float16
+        model.diffusion_model = diffusion_model
+        return model
+
+    model = sd15_model(torch.nn.Linear(4, 4))
+    heuristic = model.memory_required((2, 4, 64, 64))
+    assert heuristic > 0
+
+    key = model.memory_profile_key()
+    assert key.startswith("SD15|float16|attention_") and key.endswith("|20")
+    profiles.record(key, (2, 4, 64, 64), 123 * MB)
+    assert model.memory_required((2, 4, 64, 64)) == 123 * MB
+    # profiles of a bigger model of the same config class don't apply
+    assert sd15_model(torch.nn.Linear(8, 8)).memory_required((2, 4, 64, 64)) == heuristic
+    # profiles of another dtype don't apply
+    model.manual_cast_dtype = torch.bfloat16
+    assert model.memory_required((2, 4, 64, 64)) == heuristic
+
+    # with autotuning the key doesn't name a single backend
+    model.manual_cast_dtype = None
+    monkeypatch.setattr(comfy.cli_args.args, "attention_autotune", True)
+    assert model.memory_profile_key() == "SD15|float16|autotune|20"
@@ -0,0 +1,89 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+safetensors_torch = pytest.importorskip("safetensors.torch")
+
+import comfy.model_detection_cache  # noqa: E402
+from comfy.model_detection_cache import ModelDetectionCache, encode_value, decode_value  # noqa: E402
+
+FLUX_CONFIG = {"image_model": "flux", "guidance_embed": True, "axes_dim": (16, 56, 56), "in_channels": 16}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ModelDetectionCache(str(tmp_path / "detection.json"))
+    monkeypatch.setattr(comfy.model_detection_cache, "detection_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    path = str(tmp_path / "model.safetensors")
+    safetensors_torch.save_file({"img_in.weight": torch.zeros(4, 4)}, path)
+    return path
+
+
+def test_value_roundtrip():
+    value = {"a": (1, 2), "b": [torch.float16, None], "c": {"d": "x"}}
+    assert decode_value(encode_value(value)) == value
+    with pytest.raises(TypeError):
+        encode_value(object())
+
+
+def test_file_key_follows_header(checkpoint, tmp_path):
+    cache = ModelDetectionCache()
+    key = cache.file_key(checkpoint)
+    assert key is not None
+    assert cache.file_key(checkpoint) == key
+
+    copy = str(tmp_path / "copy.safetensors")
+    safetensors_torch.save_file({"img_in.weight": torch.ones(4, 4)}, copy)
+    assert cache.file_key(copy) == key
+
+    safetensors_torch.save_file({"img_in.weight": torch.zeros(4, 8)}, checkpoint)
+    assert cache.file_key(checkpoint) != key
+    assert cache.file_key(str(tmp_path / "model.ckpt")) is None
+
+
+def test_persisted_between_instances(cache, checkpoint):
+    key = cache.file_key(checkpoint)
+    cache.set(key, "unet:", {"model_config": "Flux", "unet_config": FLUX_CONFIG})
+
+    other = ModelDetectionCache(cache.path)
+    assert other.get(key, "unet:") == {"model_config": "Flux", "unet_config": FLUX_CONFIG}
+    assert other.get(key, "unet:model.") is None
+
+
+
+def test_other_version_dropped(cache, checkpoint):
+    key = cache.file_key(checkpoint)
+    cache.set(key, "unet:", {"model_config": "Flux", "unet_config": FLUX_CONFIG})
+    with open(cache.path, "r", encoding="utf-8") as f:
+        data = f.read().replace('"comfyui_version": "', '"comfyui_version": "old-')
+    with open(cache.path, "w", encoding="utf-8") as f:
+        f.write(data)
+
+    other = ModelDetectionCache(cache.path)
+    assert other.get(key, "unet:") is None
+    other.set(key, "unet:model.", {"model_config": "Flux", "unet_config": FLUX_CONFIG})
+    assert ModelDetectionCache(cache.path).entries.keys() == {key}
+    assert ModelDetectionCache(cache.path).get(key, "unet:") is None
+
+def test_detection_skipped_on_hit(cpu, cache, checkpoint, monkeypatch):
+    from comfy import model_detection, supported_models
+    calls = []
+
+    def detect_unet_config(state_dict, key_prefix, metadata=None):
+        calls.append(key_prefix)
+        return dict(FLUX_CONFIG)
+
+    monkeypatch.setattr(model_detection, "detect_unet_config", detect_unet_config)
+    key = cache.file_key(checkpoint)
+    first = model_detection.model_config_from_unet({}, "", cache_key=key)
+    second = model_detection.model_config_from_unet({}, "", cache_key=key)
+    assert calls == [""]
+    assert type(first) is type(second) is supported_models.Flux
+    assert second.unet_config == first.unet_config
+
+    model_detection.model_config_from_unet({}, "", cache_key=None)
+    assert calls == ["", ""]
@@ -0,0 +1,92 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import safetensors  # noqa: E402
+import safetensors.torch  # noqa: E402
+from comfy.utils import LazyTensor, save_torch_file, save_torch_file_streaming  # noqa: E402
+
+
+@pytest.fixture
+def model_patcher(cpu):
+    from comfy import model_patcher
+    return model_patcher
+
+
+def test_streaming_matches_save_torch_file(tmp_path):
+    sd = {
+        "a.weight": torch.randn(3, 5),
+        "b.half": torch.randn(7).half(),
+        "b.bf16": torch.randn(2, 3).bfloat16(),
+        "c.int": torch.arange(5),
+        "d.bool": torch.tensor([True, False, True]),
+        "e.scalar": torch.tensor(1.5),
+        "f.empty": torch.tensor([]),
+        "g.transposed": torch.randn(4, 6).t(),
+    }
+    if hasattr(torch, "float8_e4m3fn"):
+        sd["h.fp8"] = torch.randn(9).to(torch.float8_e4m3fn)
+    metadata = {"prompt": "{}", "modelspec.title": "test"}
+    expected_path = str(tmp_path / "expected.safetensors")
+    save_torch_file({k: v.contiguous() for k, v in sd.items()}, expected_path, metadata=metadata)
+
+    loaded = []
+    lazy_sd = dict(sd)
+    lazy_sd["a.weight"] = LazyTensor((3, 5), torch.float32, lambda: loaded.append("a") or sd["a.weight"])
+    path = str(tmp_path / "streaming.safetensors")
+    save_torch_file_streaming(lazy_sd, path, metadata=metadata)
+    assert loaded == ["a"]
+
+    expected = safetensors.torch.load_file(expected_path)
+    out = safetensors.torch.load_file(path)
+    assert out.keys() == expected.keys()
+    for k in expected:
+        assert out[k].dtype == expected[k].dtype
+        assert torch.equal(out[k].reshape(-1).view(torch.uint8), expected[k].reshape(-1).view(torch.uint8))
+    with safetensors.safe_open(path, framework="pt") as f:
+        assert f.metadata() == metadata
+
+    # without metadata, which safetensors doesn't keep in order, the files are the same
+    save_torch_file({k: v.contiguous() for k, v in sd.items()}, expected_path)
+    save_torch_file_streaming(sd, path)
+    with open(path, "rb") as f, open(expected_path, "rb") as e:
+        assert f.read() == e.read()
+
+
+def test_streaming_rejects_wrong_shape(tmp_path):
+    sd = {"a": LazyTensor((2, 2), torch.float32, lambda: torch.zeros(4))}
+    with pytest.raises(ValueError):
+        save_torch_file_streaming(sd, str(tmp_path / "out.safetensors"))
+
+
+def test_lazy_state_dict_matches_patched_model(model_patcher, tmp_path):
+    def make_model(seed):
+        torch.manual_seed(seed)
+        model = torch.nn.Sequential(torch.nn.Linear(8, 6), torch.nn.Linear(6, 4)).half()
+        return model_patcher.ModelPatcher(model, torch.device("cpu"), torch.device("cpu"))
+
+    model1 = make_model(0)
+    model2 = make_model(1)
+    merged = model1.clone()
+    kp = model2.get_key_patches("0.")
+    for k in kp:
+        merged.add_patches({k: kp[k]}, 0.3, 0.7)
+    up, down = torch.randn(4, 2), torch.randn(2, 6)
+    merged.add_patches({"1.weight": ("lora", (up, down, None, None, None, None))}, 0.5)
+
+    lazy = merged.lazy_state_dict()
+    assert isinstance(lazy["0.weight"], LazyTensor) and isinstance(lazy["1.weight"], LazyTensor)
+    assert not isinstance(lazy["1.bias"], LazyTensor)
+    path = str(tmp_path / "merged.safetensors")
+    save_torch_file_streaming(lazy, path)
+    # nothing was patched in the model
+    assert torch.equal(model1.model[0].weight, merged.model[0].weight)
+    assert len(merged.backup) == 0
+
+    merged.patch_model()
+    expected = {k: v.clone() for k, v in merged.model.state_dict().items()}
+    merged.unpatch_model()
+    out = safetensors.torch.load_file(path)
+    assert out.keys() == expected.keys()
+    for k in expected:
+        torch.testing.assert_close(out[k], expected[k], rtol=0, atol=0)
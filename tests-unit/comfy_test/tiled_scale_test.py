@@ -0,0 +1,67 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import comfy.utils  # noqa: E402
+
+
+def upscale(a):
+    return torch.nn.functional.interpolate(a, scale_factor=2, mode="bilinear") + a.mean(dim=(1, 2, 3), keepdim=True)
+
+
+@pytest.mark.parametrize("tiles_per_batch", [1, 3, 64])
+@pytest.mark.parametrize("size", [(40, 56), (16, 16)])
+def test_tiled_scale_batched_matches_tiled_scale(tiles_per_batch, size):
+    samples = torch.rand(3, 3, *size)
+    calls = []
+
+    def function(a):
+        calls.append(a.shape[0])
+        return upscale(a)
+
+    out = comfy.utils.tiled_scale_batched(samples, function, tile_x=24, tile_y=16, overlap=4, upscale_amount=2, tiles_per_batch=tiles_per_batch)
+    expected = comfy.utils.tiled_scale(samples, upscale, tile_x=24, tile_y=16, overlap=4, upscale_amount=2)
+    torch.testing.assert_close(out, expected)
+    assert max(calls) <= tiles_per_batch
+    assert sum(calls) == samples.shape[0] * comfy.utils.get_tiled_scale_steps(size[1], size[0], 24, 16, 4)
+
+
+def test_tiled_scale_batched_device_samples():
+    # the samples are already on a device that can't pin memory, like the IMAGE tensors with --gpu-only
+    samples = torch.rand(2, 3, 40, 56, device="meta")
+    out = comfy.utils.tiled_scale_batched(samples, upscale, tile_x=24, tile_y=16, overlap=4, upscale_amount=2, output_device="meta", device="meta", non_blocking=True)
+    assert out.shape == (2, 3, 80, 112)
+
+
+class UpscaleModel:
+    scale = 2
+
+    def __init__(self, max_pixels):
+        self.model = torch.nn.Identity()
+        self.max_pixels = max_pixels
+        self.calls = []
+
+    def to(self, device):
+        return self
+
+    def __call__(self, a):
+        self.calls.append(tuple(a.shape))
+        if a.shape[0] * a.shape[2] * a.shape[3] > self.max_pixels:
+            raise torch.cuda.OutOfMemoryError()
+        return upscale(a)
+
+
+def test_upscale_remembers_working_tile_size(cpu):
+    from comfy_extras import nodes_upscale_model
+
+    image = torch.rand(2, 300, 300, 3)
+    model = UpscaleModel(max_pixels=256 * 256)
+    first = nodes_upscale_model.ImageUpscaleWithModel().upscale(model, image)[0]
+    assert first.shape == (2, 600, 600, 3)
+    tile, tiles_per_batch = nodes_upscale_model.working_tile_sizes[model.model][torch.device("cpu")]
+    assert (tile, tiles_per_batch) == (256, 1)
+
+    model.calls.clear()
+    second = nodes_upscale_model.ImageUpscaleWithModel().upscale(model, image)[0]
+    assert all(b * h * w <= model.max_pixels for b, c, h, w in model.calls)
+    torch.testing.assert_close(second, first)
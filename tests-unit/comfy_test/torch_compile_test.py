@@ -0,0 +1,93 @@
+import gc
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from comfy.torch_compile import CompiledModels, CompiledModelWrapper, bucket_resolution  # noqa: E402
+
+
+@pytest.fixture
+def model_patcher(cpu):
+    from comfy import model_patcher
+    return model_patcher
+
+
+class Executor:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, x, t, c_concat, c_crossattn, control, transformer_options, **kwargs):
+        self.calls.append((x.shape, t.shape, c_concat.shape, c_crossattn.shape, {k: v.shape for k, v in kwargs.items()}))
+        return torch.cat([x, c_concat], dim=1) * 2 + t.reshape(-1, 1, 1, 1)
+
+
+def test_bucket_resolution():
+    assert [bucket_resolution(n) for n in (1, 16, 17, 128, 130)] == [16, 16, 32, 128, 144]
+
+
+@pytest.mark.parametrize("batch_buckets,resolution_buckets", [(False, False), (True, False), (True, True)])
+def test_wrapper_pads_and_crops(batch_buckets, resolution_buckets):
+    x = torch.randn(3, 4, 20, 30)
+    t = torch.arange(3).float()
+    c_concat = torch.randn(3, 1, 20, 30)
+    c_crossattn = torch.randn(3, 77, 8)
+    y = torch.randn(3, 16)
+    executor = Executor()
+    models = CompiledModels()
+    wrapper = CompiledModelWrapper("key", batch_buckets, resolution_buckets, models=models)
+    out = wrapper(executor, x, t, c_concat, c_crossattn, None, {}, y=y)
+
+    torch.testing.assert_close(out, Executor()(x, t, c_concat, c_crossattn, None, {}, y=y))
+    batch = 4 if batch_buckets else 3
+    resolution = (32, 32) if resolution_buckets else (20, 30)
+    assert executor.calls == [((batch, 4) + resolution, (batch,), (batch, 1) + resolution, (batch, 77, 8), {"y": (batch, 16)})]
+    assert models.statistics() == {"models": 1, "calls": 1, "hits": 1, "compiles": 0, "compile_time": 0.0}
+
+
+def test_compiled_models_are_shared(model_patcher, tmp_path, monkeypatch):
+    monkeypatch.setenv("TORCHINDUCTOR_CACHE_DIR", str(tmp_path / "inductor"))
+    models = CompiledModels(str(tmp_path))
+    module = torch.nn.Sequential(torch.nn.Linear(8, 8))
+    patcher = model_patcher.ModelPatcher(torch.nn.Module(), torch.device("cpu"), torch.device("cpu"))
+    patcher.model.diffusion_model = module
+
+    key, compiled = models.get(patcher, "eager")
+    assert models.get(patcher.clone(), "eager") == (key, compiled)
+    assert models.get(patcher, "eager", dynamic=False)[1] is not compiled
+    assert models.get(patcher, "inductor")[0] != key
+    patched = patcher.clone()
+    patched.add_patches({"diffusion_model.0.weight": (torch.zeros(8, 8),)})
+    assert models.get(patched, "eager")[0] != key
+
+    # the wrappers only live while they are used
+    del compiled
+    gc.collect()
+    assert len(models.models) == 0
+    key, compiled = models.get(patcher, "eager")
+
+    def executor(x, t, c_concat, c_crossattn, control, transformer_options, **kwargs):
+        return compiled(x)
+
+    wrapper = CompiledModelWrapper(key, models=models)
+    x = torch.randn(2, 8)
+    torch.testing.assert_close(wrapper(executor, x, torch.zeros(2)), module(x))
+    wrapper(executor, x, torch.zeros(2))
+    stats = models.statistics()
+    assert stats["calls"] == 2 and stats["compiles"] >= 1 and stats["hits"] == 1
+
+
+@pytest.mark.parametrize("shape_buckets,dynamic", [("none", None), ("batch", None), ("batch and resolution", False)])
+def test_node_static_shapes(model_patcher, monkeypatch, shape_buckets, dynamic):
+    import comfy.torch_compile
+    from comfy_extras.nodes_torch_compile import TorchCompileModel
+    calls = []
+
+    def get(m, backend, dynamic=None):
+        calls.append(dynamic)
+        return "key", torch.nn.Identity()
+
+    monkeypatch.setattr(comfy.torch_compile.compiled_models, "get", get)
+    patcher = model_patcher.ModelPatcher(torch.nn.Module(), torch.device("cpu"), torch.device("cpu"))
+    TorchCompileModel().patch(patcher, "eager", shape_buckets)
+    assert calls == [dynamic]
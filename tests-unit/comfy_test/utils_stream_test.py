@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import comfy.utils  # noqa: E402
+
+
+def test_images_to_uint8_matches_numpy():
+    images = torch.rand(5, 4, 6, 3) * 1.2 - 0.1
+    chunks = list(comfy.utils.images_to_uint8(images, chunk_size=2))
+    assert [c.shape[0] for c in chunks] == [2, 2, 1]
+    expected = np.clip(255. * images.numpy(), 0, 255).astype(np.uint8)
+    np.testing.assert_array_equal(np.concatenate(chunks), expected)
+
+
+def test_images_to_uint8_accepts_chunks():
+    chunks = (torch.rand(3, 2, 2, 3) for _ in range(2))
+    assert [c.shape[0] for c in comfy.utils.images_to_uint8(chunks, chunk_size=2)] == [2, 1, 2, 1]
+
+
+def test_consume_in_background():
+    consumed = []
+    threads = set()
+
+    def consume(item):
+        threads.add(threading.get_ident())
+        consumed.append(item)
+
+    comfy.utils.consume_in_background(range(10), consume, max_pending=1)
+    assert consumed == list(range(10))
+    assert threads != {threading.get_ident()}
+
+
+def test_consume_in_background_raises_and_stops():
+    produced = []
+
+    def items():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    def consume(item):
+        if item == 1:
+            raise ValueError("encode failed")
+
+    with pytest.raises(ValueError):
+        comfy.utils.consume_in_background(items(), consume, max_pending=1)
+    assert len(produced) < 100
+
+
+@pytest.mark.parametrize("length,tile_t,overlap_t", [(9, 4, 1), (9, 5, 2), (4, 8, 1)])
+def test_tiled_scale_temporal_matches_tiled_scale(length, tile_t, overlap_t):
+    samples = torch.randn(1, 2, length, 3, 3)
+    upscale = lambda a: max(0, a * 4 - 3)  # noqa: E731
+
+    def function(s):
+        # stands in for a causal video decoder
+        return torch.nn.functional.interpolate(s, size=(upscale(s.shape[2]), 6, 6)) * 2 + 1
+
+    chunks = list(comfy.utils.tiled_scale_temporal(samples, function, tile_t, overlap_t, upscale, 4))
+    expected = comfy.utils.tiled_scale_multidim(samples, function, tile=(tile_t, 3, 3), overlap=(overlap_t, 0, 0),
+                                                upscale_amount=(upscale, 2, 2), out_channels=2, index_formulas=(4, 2, 2))
+    assert len(chunks) == max(1, len(range(0, length - overlap_t, tile_t - overlap_t)))
+    torch.testing.assert_close(torch.cat(chunks, dim=2), expected)
@@ -0,0 +1,25 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+
+@pytest.fixture
+def wan_vae(cpu):
+    from comfy.ldm.wan.vae import WanVAE
+
+    torch.manual_seed(0)
+    vae = WanVAE(dim=8, z_dim=4, dim_mult=[1, 2, 2, 2], num_res_blocks=1, attn_scales=[],
+                 temperal_downsample=[False, True, True], dropout=0.0).eval()
+    for p in vae.parameters():
+        torch.nn.init.normal_(p, std=0.1)
+    return vae
+
+
+def test_wan_decode_stream_matches_decode(wan_vae):
+    z = torch.randn(1, 4, 3, 4, 4)
+    with torch.no_grad():
+        chunks = list(wan_vae.decode_stream(z))
+        full = wan_vae.decode(z)
+    assert [c.shape[2] for c in chunks] == [1, 4, 4]
+    torch.testing.assert_close(torch.cat(chunks, dim=2), full)
+    assert all(f is None for f in wan_vae._feat_map)
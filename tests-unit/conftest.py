@@ -0,0 +1,11 @@
+import pytest
+
+import comfy.cli_args
+
+
+@pytest.fixture(scope="module")
+def cpu():
+    """Runs the comfy modules the test imports on the cpu, model_management picks the device when it is first imported."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(comfy.cli_args.args, "cpu", True)
+        yield
@@ -0,0 +1,61 @@
+from comfy_execution.history_store import HistoryStore
+
+
+def entry(i):
+    return {"prompt": [i, "p{}".format(i), {"1": {}}, {}, ["1"]], "outputs": {"1": {"images": [i]}}, "status": None, "meta": {}, "custom": i}
+
+
+def store_with(count, max_items=None):
+    store = HistoryStore(max_items=max_items)
+    for i in range(count):
+        store.add("p{}".format(i), entry(i))
+    return store
+
+
+def test_roundtrip():
+    store = store_with(2)
+    assert store.get("p1") == entry(1)
+    assert store.get("missing") is None
+    assert len(store) == 2
+
+
+def test_page_newest():
+    store = store_with(10)
+    assert list(store.page(max_items=3)) == ["p7", "p8", "p9"]
+    assert list(store.page(max_items=3, offset=2)) == ["p2", "p3", "p4"]
+    assert len(store.page()) == 10
+
+
+def test_page_cursor():
+    store = store_with(10)
+    page = store.page(max_items=4)
+    pages = [list(page)]
+    while len(page) > 0:
+        page = store.page(max_items=4, before=next(iter(page)))
+        pages.append(list(page))
+    assert pages == [["p6", "p7", "p8", "p9"], ["p2", "p3", "p4", "p5"], ["p0", "p1"], []]
+
+
+def test_projection():
+    store = store_with(1)
+    assert store.get("p0", fields=["outputs"]) == {"outputs": {"1": {"images": [0]}}}
+    assert store.get("p0", fields=["status", "custom"]) == {"status": None, "custom": 0}
+
+
+def test_max_items_and_replace():
+    store = store_with(5, max_items=3)
+    assert list(store.page()) == ["p2", "p3", "p4"]
+    store.add("p2", entry(2))
+    assert list(store.page()) == ["p3", "p4", "p2"]
+    store.delete("p3")
+    assert list(store.page()) == ["p4", "p2"]
+    store.clear()
+    assert len(store) == 0
+
+
+def test_persistent(tmp_path):
+    path = str(tmp_path / "history.db")
+    store = HistoryStore(path)
+    store.add("p0", entry(0))
+    store.db.close()
+    assert HistoryStore(path).get("p0") == entry(0)
@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+from comfy_execution import model_prefetch
+
+
+def loader(ckpt):
+    return {"1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": ckpt}},
+            "2": {"class_type": "LoraLoader", "inputs": {"lora_name": "lora.safetensors", "model": ["1", 0]}}}
+
+
+@pytest.fixture
+def model_files(tmp_path, monkeypatch):
+    for name, size in [("a.safetensors", 1000), ("b.safetensors", 3000), ("lora.safetensors", 500)]:
+        with open(tmp_path / name, "wb") as f:
+            f.write(os.urandom(size))
+
+    def get_full_path(folder, filename):
+        path = tmp_path / filename
+        return str(path) if path.exists() else None
+    monkeypatch.setattr(model_prefetch.folder_paths, "get_full_path", get_full_path)
+    return tmp_path
+
+
+def wait_for(prefetcher, count):
+    for _ in range(500):
+        if len(prefetcher.prefetched) >= count and prefetcher.request is None:
+            return
+        time.sleep(0.01)
+
+
+def test_prefetch_upcoming_skips_current(model_files):
+    prefetcher = model_prefetch.ModelPrefetcher(budget=1 << 30)
+    prefetcher.prefetch([loader("b.safetensors"), loader("missing.safetensors")], current_prompt=loader("a.safetensors"))
+    wait_for(prefetcher, 1)
+    time.sleep(0.05)
+    assert sorted(os.path.basename(p) for p in prefetcher.prefetched) == ["b.safetensors"]
+
+
+def test_prefetch_budget(model_files):
+    prefetcher = model_prefetch.ModelPrefetcher(budget=2000)
+    prefetcher.prefetch([loader("a.safetensors"), loader("b.safetensors")])
+    wait_for(prefetcher, 2)
+    time.sleep(0.05)
+    assert sorted(os.path.basename(p) for p in prefetcher.prefetched) == ["a.safetensors", "lora.safetensors"]
+
+
+def test_prefetch_disabled(model_files):
+    for prefetcher in (model_prefetch.ModelPrefetcher(budget=0), model_prefetch.ModelPrefetcher()):
+        prefetcher.prefetch([loader("a.safetensors")])
+        assert prefetcher.thread is None
+
+
+def test_prefetch_expires(model_files, monkeypatch):
+    prefetcher = model_prefetch.ModelPrefetcher(budget=1 << 30)
+    prefetcher.prefetch([loader("a.safetensors")])
+    wait_for(prefetcher, 2)
+    path = str(model_files / "a.safetensors")
+    first = prefetcher.prefetched[path]
+
+    # read files are skipped while they are fresh
+    prefetcher.prefetch([loader("a.safetensors")])
+    wait_for(prefetcher, 2)
+    time.sleep(0.05)
+    assert prefetcher.prefetched[path] == first
+
+    # and read again once they expired
+    monkeypatch.setattr(model_prefetch, "PREFETCH_EXPIRY", 0)
+    prefetcher.prefetch([loader("a.safetensors")])
+    for _ in range(500):
+        if prefetcher.bytes_read == 2 * (1000 + 500):
+            break
+        time.sleep(0.01)
+    assert prefetcher.bytes_read == 2 * (1000 + 500)
+    assert prefetcher.prefetched[path][2] > first[2]
@@ -0,0 +1,111 @@
+import os
+import tempfile
+from importlib import reload
+
+import pytest
+
+import folder_paths
+from comfy_execution.node_metadata import NodeMetadataCache
+
+
+@pytest.fixture
+def model_dir():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        folder_paths.add_model_folder_path("metadata_test", tmpdirname)
+        yield tmpdirname
+    reload(folder_paths)
+
+
+def make_loader_class(counter):
+    class Loader:
+        @classmethod
+        def INPUT_TYPES(s):
+            counter.append(1)
+            return {"required": {"name": (folder_paths.get_filename_list("metadata_test"),)},
+                    "optional": {"strength": ("FLOAT", {"default": 1.0})}}
+
+        @classmethod
+        def VALIDATE_INPUTS(s, name, **kwargs):
+            return True
+
+        RETURN_TYPES = ("MODEL",)
+        OUTPUT_NODE = True
+    return Loader
+
+
+def test_metadata_contents(model_dir):
+    cache = NodeMetadataCache()
+    cache.refresh()
+    metadata = cache.get(make_loader_class([]))
+    assert metadata.valid_inputs == frozenset({"name", "strength"})
+    assert metadata.validate_function_inputs == ["s", "name"]
+    assert metadata.validate_has_kwargs
+    assert metadata.return_types == ("MODEL",)
+    assert metadata.output_node
+
+
+def test_input_types_memoized(model_dir):
+    calls = []
+    loader = make_loader_class(calls)
+    cache = NodeMetadataCache()
+    cache.refresh()
+    cache.get(loader)
+    cache.refresh()
+    for _ in range(10):
+        cache.get(loader)
+    cache.refresh()
+    cache.get(loader)
+    # listing the folder for the first time doesn't drop the entry
+    assert len(calls) == 1
+    assert cache.hits >= 11
+
+
+def test_invalidated_when_folder_changes(model_dir):
+    calls = []
+    loader = make_loader_class(calls)
+    cache = NodeMetadataCache()
+    cache.refresh()
+    cache.get(loader)
+    cache.refresh()
+    assert cache.get(loader).input_types["required"]["name"][0] == []
+
+    with open(os.path.join(model_dir, "model.safetensors"), "wb") as f:
+        f.write(b"0")
+    os.utime(model_dir, (0, 12345))
+
+    cache.refresh()
+    assert cache.get(loader).input_types["required"]["name"][0] == ["model.safetensors"]
+
+
+def test_invalidated_when_folder_registered(model_dir):
+    loader = make_loader_class([])
+    cache = NodeMetadataCache()
+    cache.refresh()
+    cache.get(loader)
+    cache.refresh()
+    first = cache.get(loader)
+    cache.refresh()
+    assert cache.get(loader) is first
+    with tempfile.TemporaryDirectory() as other:
+        folder_paths.add_model_folder_path("metadata_test", other)
+        cache.refresh()
+        assert cache.get(loader) is not first
+
+
+def test_input_directory_listed_only_when_changed(tmp_path, monkeypatch):
+    monkeypatch.setattr(folder_paths, "input_directory", str(tmp_path))
+    (tmp_path / "3d").mkdir()
+    mtimes = folder_paths.get_input_directory_mtimes({})
+    assert set(mtimes) == {str(tmp_path), str(tmp_path / "3d")}
+
+    def scandir(path):
+        raise AssertionError("input directory listed")
+    with monkeypatch.context() as m:
+        m.setattr(os, "scandir", scandir)
+        assert folder_paths.get_input_directory_mtimes(mtimes) == mtimes
+        os.utime(tmp_path / "3d", (0, 12345))
+        assert folder_paths.get_input_directory_mtimes(mtimes)[str(tmp_path / "3d")] == 12345
+
+    os.utime(tmp_path, (0, 12345))
+    (tmp_path / "other").mkdir()
+    assert set(folder_paths.get_input_directory_mtimes(mtimes)) == {str(tmp_path), str(tmp_path / "3d"), str(tmp_path / "other")}
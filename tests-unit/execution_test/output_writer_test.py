@@ -0,0 +1,116 @@
+import threading
+import concurrent.futures
+
+import pytest
+
+from comfy_execution.output_writer import OutputWriter, write_failed
+
+
+@pytest.fixture(params=[0, 2], ids=["sync", "pool"])
+def writer(request):
+    return OutputWriter(request.param)
+
+
+def test_collect_nested(writer):
+    with writer.collect() as outer:
+        writer.submit(lambda: 1)
+        with writer.collect() as inner:
+            writer.submit(lambda: 2)
+    writer.submit(lambda: 3)
+    assert len(outer) == 2
+    assert len(inner) == 1
+    assert [f.result() for f in outer] == [1, 2]
+
+
+def test_collect_is_per_thread(writer):
+    with writer.collect() as pending:
+        thread = threading.Thread(target=writer.submit, args=(lambda: None,))
+        thread.start()
+        thread.join()
+    assert pending == []
+
+
+def test_when_done_waits_for_writes():
+    writer = OutputWriter(2)
+    release = threading.Event()
+    published = threading.Event()
+    with writer.collect() as pending:
+        writer.submit(release.wait)
+        writer.submit(lambda: None)
+
+    writer.when_done(pending, published.set)
+    assert not published.is_set()
+    release.set()
+    assert published.wait(5)
+
+
+def test_when_done_runs_immediately_without_writes(writer):
+    calls = []
+    writer.when_done([], lambda: calls.append(1))
+    assert calls == [1]
+
+
+def test_write_failed(writer):
+    def fail():
+        raise OSError("disk full")
+
+    with writer.collect() as pending:
+        writer.submit(fail)
+        writer.submit(lambda: None)
+
+    published = threading.Event()
+    writer.when_done(pending, published.set)
+    assert published.wait(5)
+    assert write_failed(pending)
+
+
+
+def test_failed_file_write_removes_file(writer, tmp_path):
+    def write(path, data):
+        with open(path, "wb") as f:
+            f.write(data[:2])
+            data.decode("ascii")
+
+    for name, data in (("good.bin", b"ok"), ("bad.bin", b"\xff\xff\xff")):
+        (tmp_path / name).touch()
+        with writer.collect() as pending:
+            writer.submit_file(write, str(tmp_path / name), data)
+        concurrent.futures.wait(pending)
+    assert [p.name for p in tmp_path.iterdir()] == ["good.bin"]
+
+class Server:
+    def __init__(self):
+        self.sent = []
+
+    def send_sync(self, event, data, sid=None):
+        self.sent.append((event, data, sid))
+
+
+@pytest.mark.parametrize("fails", [False, True])
+def test_executed_only_announces_written_files(cpu, writer, fails):
+    import execution
+
+    def write():
+        if fails:
+            raise OSError("disk full")
+
+    with writer.collect() as pending:
+        writer.submit(write)
+    server = Server()
+    message = {"node": "9", "display_node": "9", "output": {"images": []}, "prompt_id": "p"}
+    published = threading.Event()
+
+    def publish():
+        execution.send_executed(server, message, "client", pending, "SaveImage", ["9"])
+        published.set()
+
+    writer.when_done(pending, publish)
+    assert published.wait(5)
+    [(event, data, sid)] = server.sent
+    assert sid == "client"
+    if fails:
+        assert event == "execution_error"
+        assert data["node_id"] == "9" and data["prompt_id"] == "p"
+        assert data["exception_type"] == "OSError" and "disk full" in data["exception_message"]
+    else:
+        assert (event, data) == ("executed", message)
@@ -0,0 +1,101 @@
+import pytest
+
+
+class Server:
+    def queue_updated(self):
+        pass
+
+
+@pytest.fixture
+def execution(cpu):
+    import execution
+    return execution
+
+
+def item(number, client=None, priority=None, ckpt=None):
+    extra_data = {}
+    if client is not None:
+        extra_data["client_id"] = client
+    if priority is not None:
+        extra_data["priority"] = priority
+    prompt = {}
+    if ckpt is not None:
+        prompt["1"] = {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": ckpt}}
+    return (number, "p{}".format(number), prompt, extra_data, [])
+
+
+def run_all(queue):
+    order = []
+    while queue.get_tasks_remaining() - len(queue.currently_running) > 0:
+        order.append(queue.get()[0][0])
+    return order
+
+
+def test_fifo_by_default(execution):
+    queue = execution.PromptQueue(Server())
+    for i in [3, 1, 2]:
+        queue.put(item(i, ckpt="a" if i % 2 else "b"))
+    queue.put(item(-4))
+    assert run_all(queue) == [-4, 1, 2, 3]
+
+
+def test_priority_lanes(execution):
+    queue = execution.PromptQueue(Server())
+    queue.put(item(1, priority="batch"))
+    queue.put(item(2))
+    queue.put(item(3, priority="interactive"))
+    assert run_all(queue) == [3, 2, 1]
+
+
+def test_fair_between_clients(execution):
+    queue = execution.PromptQueue(Server())
+    for i in range(4):
+        queue.put(item(i, client="a"))
+    assert queue.get()[0][0] == 0
+    queue.put(item(10, client="b"))
+    queue.put(item(11, client="b"))
+    assert run_all(queue) == [1, 10, 2, 11, 3]
+    assert queue.queued_count("a") == 0
+
+
+def test_weighted_clients(execution, tmp_path):
+    path = tmp_path / "weights.json"
+    path.write_text('{"a": 2, "c": 0}')
+    weights = execution.load_client_weights(str(path))
+    assert weights == {"a": 2.0}
+    assert execution.load_client_weights(str(tmp_path / "missing.json")) == {}
+
+    queue = execution.PromptQueue(Server(), client_weights=weights)
+    for i in range(4):
+        queue.put(item(i, client="a"))
+        queue.put(item(10 + i, client="b"))
+    # a gets two prompts for every one of b
+    assert run_all(queue) == [0, 10, 1, 2, 11, 3, 12, 13]
+
+
+def test_client_service_is_pruned(execution):
+    queue = execution.PromptQueue(Server())
+    for i in range(3):
+        queue.put(item(i, client="a"))
+    for i in range(10):
+        queue.put(item(10 + i, client="c{}".format(i)))
+        item_id = queue.get()[1]
+        assert "c{}".format(i) in queue.client_service
+        queue.task_done(item_id, {}, None)
+    # clients with nothing queued or running are dropped
+    assert set(queue.client_service) == {execution.queue_client(x) for x in queue.queue}
+    assert len(queue.client_service) <= 2
+    while queue.get_tasks_remaining() > 0:
+        queue.task_done(queue.get()[1], {}, None)
+    assert queue.client_service == {}
+
+
+def test_model_affinity(execution):
+    queue = execution.PromptQueue(Server(), model_affinity=1)
+    queue.put(item(1, ckpt="a"))
+    queue.put(item(2, ckpt="b"))
+    queue.put(item(3, ckpt="a"))
+    queue.put(item(4, ckpt="b"))
+    queue.put(item(5, ckpt="a"))
+    # 2 is only overtaken once
+    assert run_all(queue) == [1, 3, 2, 4, 5]
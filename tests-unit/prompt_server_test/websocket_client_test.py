@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app.websocket_client import WebSocketClient
+
+pytestmark = (
+    pytest.mark.asyncio
+)  # This applies the asyncio mark to all test functions in the module
+
+
+class WebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+        self.unblocked = asyncio.Event()
+        self.unblocked.set()
+
+    async def send_str(self, message):
+        await self.unblocked.wait()
+        self.sent.append(message)
+
+    async def send_bytes(self, message):
+        await self.unblocked.wait()
+        self.sent.append(message)
+
+    async def close(self):
+        self.closed = True
+
+
+async def drain(client):
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert len(client.pending) == 0
+
+
+async def test_messages_sent_in_order():
+    ws = WebSocket()
+    client = WebSocketClient(ws)
+    client.start()
+    client.put("a")
+    client.put(b"b")
+    client.put("c")
+    await drain(client)
+    assert ws.sent == ["a", b"b", "c"]
+    client.close()
+
+
+async def test_superseded_messages_coalesced():
+    ws = WebSocket()
+    ws.unblocked.clear()
+    client = WebSocketClient(ws)
+    client.start()
+    client.put("progress 1", "progress")
+    client.put("executing", None)
+    client.put("progress 2", "progress")
+    ws.unblocked.set()
+    await drain(client)
+    assert ws.sent == ["executing", "progress 2"]
+    client.close()
+
+
+async def test_slow_client_drops_then_disconnects():
+    ws = WebSocket()
+    ws.unblocked.clear()
+    client = WebSocketClient(ws, max_pending=2)
+    client.put("preview 1", "preview")
+    client.put("executed", None)
+    client.put("executing", None)
+    assert [m for _, m in client.pending] == ["executed", "executing"]
+    assert client.dropped == 1
+
+    client.put("execution_success", None)
+    await asyncio.sleep(0)
+    assert ws.closed
+    assert len(client.pending) == 0